@@ -0,0 +1,210 @@
+# analysis/backtesting.py
+"""
+予測モデルのローリング・オリジン検証モジュール
+拡張ウィンドウで予測起点を1ヶ月ずつずらし、全候補モデルをホライズン別に評価する
+"""
+
+import pandas as pd
+import numpy as np
+import hashlib
+import logging
+import warnings
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+
+from analysis import forecasting
+
+logger = logging.getLogger(__name__)
+
+# 最初の予測起点までに必要な学習データの月数
+MIN_TRAIN_MONTHS = 24
+
+# 検証結果のキャッシュ（系列の指紋・検証条件ごと）
+_BACKTEST_CACHE: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+_BACKTEST_CACHE_SIZE = 64
+
+
+def run_backtest(df: pd.DataFrame, department: Optional[str] = None,
+                 model_types: Optional[List[str]] = None, horizon: int = 6,
+                 min_train: int = MIN_TRAIN_MONTHS, max_origins: int = 12,
+                 max_workers: Optional[int] = None, engine: Optional[str] = None) -> Dict[str, Any]:
+    """
+    1つの対象（病院全体または診療科）についてローリング・オリジン検証を行う
+
+    Args:
+        df: 手術データ
+        department: 診療科名（Noneの場合は病院全体）
+        model_types: 評価するモデル種別
+        horizon: 各起点からの予測月数
+        min_train: 最初の起点までの学習月数
+        max_origins: 評価する起点の最大数（直近から遡る）
+        max_workers: 並列ワーカー数
+        engine: 計算エンジン（'fast' または 'precise'）
+
+    Returns:
+        {'errors': 起点×ホライズン×モデルの誤差, 'summary': ホライズン別指標, 'recommendation': 推奨メッセージ}
+    """
+    result = run_backtest_batch(df, [department], model_types, horizon, min_train, max_origins,
+                                max_workers, engine)
+    label = department or forecasting.HOSPITAL_LABEL
+    errors = result['errors']
+    errors = errors[errors['対象'] == label].reset_index(drop=True) if not errors.empty else errors
+    summary = result['summary']
+    summary = summary[summary['対象'] == label].reset_index(drop=True) if not summary.empty else summary
+    recommendation = result['recommendations'].get(label, "推奨モデルを決定できませんでした。")
+    return {'errors': errors, 'summary': summary, 'recommendation': recommendation}
+
+
+def run_backtest_batch(df: pd.DataFrame, departments: Optional[List[Optional[str]]] = None,
+                       model_types: Optional[List[str]] = None, horizon: int = 6,
+                       min_train: int = MIN_TRAIN_MONTHS, max_origins: int = 12,
+                       max_workers: Optional[int] = None, engine: Optional[str] = None) -> Dict[str, Any]:
+    """
+    複数の対象についてローリング・オリジン検証を一括実行する
+
+    対象ごとの検証はプロセスプールで並列実行する。各起点の学習は horizon ヶ月分を1回だけ予測し、
+    全ホライズンの評価に使い回す（学習結果は forecasting の学習キャッシュにも保存される）。
+    同じ系列・同じ検証条件の結果はメモリ上にキャッシュする。
+    NumPy実装のモデルのみの場合は学習が軽いため、プロセスプールを使わず逐次実行する。
+
+    Args:
+        departments: 対象の診療科リスト（Noneは病院全体。省略時は病院全体＋全診療科）
+
+    Returns:
+        {'errors': 誤差の縦持ちDataFrame, 'summary': 対象×モデル×ホライズンの指標,
+         'recommendations': {対象: 推奨メッセージ}}
+    """
+    engine = engine or forecasting.DEFAULT_ENGINE
+    if model_types is None:
+        model_types = forecasting.DEFAULT_MODEL_TYPES[engine]
+    if departments is None:
+        departments = [None] + sorted(df['実施診療科'].dropna().unique())
+
+    cached_errors = []
+    tasks = []
+    for department in departments:
+        ts_data = forecasting._get_monthly_timeseries(df, department)
+        label = department or forecasting.HOSPITAL_LABEL
+        origins = _get_origins(len(ts_data), min_train, max_origins, horizon)
+        if not origins:
+            logger.info(f"ローリング検証の対象外（データ不足）: {label}")
+            continue
+
+        cache_key = (_series_fingerprint(ts_data), tuple(model_types), horizon, tuple(origins), engine)
+        if cache_key in _BACKTEST_CACHE:
+            _BACKTEST_CACHE.move_to_end(cache_key)
+            cached_errors.append(_BACKTEST_CACHE[cache_key].assign(対象=label))
+            continue
+
+        for model_type in model_types:
+            tasks.append((cache_key, label, ts_data.to_numpy(dtype=float), ts_data.index,
+                          model_type, horizon, origins, engine))
+
+    # 対象×モデルの単位で並列実行し、対象ごとにまとめてキャッシュする
+    uses_statsmodels = 'arima' in model_types or (engine == 'precise' and 'hwes' in model_types)
+    workers = max_workers if uses_statsmodels else 1
+    new_errors: Dict[Tuple, List[pd.DataFrame]] = {}
+    for task, rows in zip(tasks, forecasting._parallel_map(_backtest_series_task, tasks, workers)):
+        new_errors.setdefault(task[0], []).append(rows)
+    for cache_key, frames in new_errors.items():
+        errors = pd.concat(frames, ignore_index=True)
+        _BACKTEST_CACHE[cache_key] = errors
+        while len(_BACKTEST_CACHE) > _BACKTEST_CACHE_SIZE:
+            _BACKTEST_CACHE.popitem(last=False)
+        cached_errors.append(errors)
+
+    if not cached_errors:
+        return {'errors': pd.DataFrame(), 'summary': pd.DataFrame(), 'recommendations': {}}
+
+    errors = pd.concat(cached_errors, ignore_index=True)
+    summary = summarize_backtest(errors)
+    logger.info(f"ローリング検証完了: {errors['対象'].nunique()}対象")
+    return {'errors': errors, 'summary': summary, 'recommendations': recommend_models(summary)}
+
+
+def summarize_backtest(errors: pd.DataFrame) -> pd.DataFrame:
+    """
+    誤差の縦持ちデータから対象×モデル×ホライズンごとの指標を集計する
+
+    Returns:
+        (対象, モデル, ホライズン, 起点数, RMSE, MAE, MAPE(%), 絶対誤差P50, 絶対誤差P90)
+    """
+    if errors.empty:
+        return pd.DataFrame()
+
+    errors = errors.assign(
+        二乗誤差=errors['誤差'] ** 2,
+        絶対誤差=errors['誤差'].abs(),
+        絶対誤差率=np.where(errors['実績'] != 0, errors['誤差'].abs() / errors['実績'].abs(), np.nan) * 100,
+    )
+    grouped = errors.groupby(['対象', 'モデル', 'ホライズン'], sort=False)
+    summary = grouped.agg(
+        起点数=('誤差', 'count'),
+        RMSE=('二乗誤差', 'mean'),
+        MAE=('絶対誤差', 'mean'),
+        **{'MAPE(%)': ('絶対誤差率', 'mean')},
+        絶対誤差P50=('絶対誤差', 'median'),
+        絶対誤差P90=('絶対誤差', lambda values: values.quantile(0.9)),
+    ).reset_index()
+    summary['RMSE'] = np.sqrt(summary['RMSE'])
+    return summary
+
+
+def recommend_models(summary: pd.DataFrame) -> Dict[str, str]:
+    """対象ごとに全ホライズン平均RMSEが最小のモデルを推奨する"""
+    if summary.empty:
+        return {}
+
+    mean_rmse = summary.groupby(['対象', 'モデル'], sort=False)['RMSE'].mean().reset_index()
+    recommendations = {}
+    for label, group in mean_rmse.groupby('対象', sort=False):
+        best = group.sort_values('RMSE', kind='stable').iloc[0]
+        recommendations[label] = f"推奨モデル (ローリング検証の平均RMSE最小): {best['モデル']} (RMSE {best['RMSE']:.2f})"
+    return recommendations
+
+
+def clear_backtest_cache() -> None:
+    """ローリング検証結果のキャッシュをクリア"""
+    _BACKTEST_CACHE.clear()
+
+
+def _get_origins(n_points: int, min_train: int, max_origins: int, horizon: int) -> List[int]:
+    """
+    予測起点（学習データの長さ）のリストを直近から max_origins 個作成
+
+    全ホライズンの実績がそろう起点のみを使い、ホライズン間で起点数をそろえる。
+    """
+    origins = list(range(max(min_train, 12), n_points - horizon + 1))
+    return origins[-max_origins:] if max_origins else origins
+
+
+def _series_fingerprint(ts_data: pd.Series) -> str:
+    """系列の値と日付から指紋を作成（データ更新の検知用）"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(ts_data, dtype=float).tobytes())
+    digest.update(np.asarray(ts_data.index.asi8).tobytes())
+    return digest.hexdigest()
+
+
+def _backtest_series_task(task) -> pd.DataFrame:
+    """1つの対象・モデルについて全起点を評価する（プロセスプールのワーカー）"""
+    _, label, values, index, model_type, horizon, origins, engine = task
+    ts_data = pd.Series(values, index=index).asfreq('MS')
+    model_name = forecasting.MODEL_NAMES.get(model_type, model_type)
+
+    rows = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for origin in origins:
+            train = ts_data.iloc[:origin]
+            actual = ts_data.iloc[origin:origin + horizon].to_numpy(dtype=float)
+            try:
+                forecast, _, _ = forecasting._fit_forecast(train, model_type, horizon, engine=engine,
+                                                             persist=False)
+            except Exception:
+                continue
+            predicted = forecast.to_numpy(dtype=float)[:len(actual)]
+            for step, (act, pred) in enumerate(zip(actual, predicted), start=1):
+                rows.append((label, model_name, ts_data.index[origin], step, act, pred, pred - act))
+
+    return pd.DataFrame(rows, columns=['対象', 'モデル', '起点', 'ホライズン', '実績', '予測', '誤差'])
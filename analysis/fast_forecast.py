@@ -0,0 +1,256 @@
+# analysis/fast_forecast.py
+"""
+NumPyによる軽量な時系列予測モジュール
+加法Holt-Winters（減衰トレンド対応）と季節ナイーブを、複数系列を2次元配列としてまとめて学習する
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 平滑化パラメータの探索グリッド（全系列・全組み合わせを同時に評価する）
+ALPHA_GRID = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETA_GRID = (0.01, 0.05, 0.1, 0.2)
+GAMMA_GRID = (0.01, 0.05, 0.1, 0.2, 0.4)
+DAMPING_PHI = 0.98
+
+
+def holt_winters_forecast(values: np.ndarray, steps: int, season_length: int = 12,
+                          trend: bool = True, damped: bool = False,
+                          seasonal: bool = True) -> Dict[str, np.ndarray]:
+    """
+    同じ長さの複数系列に加法Holt-Wintersモデルを当てはめて予測する
+
+    平滑化パラメータ (α, β, γ) はグリッド上の全組み合わせを系列×組み合わせの2次元で
+    同時に漸化計算し、1期先予測の二乗誤差和が最小のものを系列ごとに選ぶ。
+    初期値は先頭1周期の平均（レベル）・先頭2周期の平均差（トレンド）から求める。
+
+    Args:
+        values: 実績値 (系列数, 時点数)。欠損は0として扱う
+        steps: 予測期間
+        season_length: 季節周期
+        trend: トレンド成分を含めるか
+        damped: 減衰トレンドにするか
+        seasonal: 季節成分を含めるか（Falseの場合はHoltの線形トレンド法）
+
+    Returns:
+        {'forecast': (系列数, steps), 'sigma': 1期先予測誤差の標準偏差 (系列数,),
+         'aic': 1期先予測誤差に基づくAIC (系列数,), 'alpha', 'beta', 'gamma': 選ばれたパラメータ (系列数,)}
+    """
+    y = np.nan_to_num(np.atleast_2d(np.asarray(values, dtype=float)))
+    n_series, n_obs = y.shape
+    m = season_length if seasonal else 1
+    if n_obs < m + 1:
+        raise ValueError(f"Holt-Wintersには最低{m + 1}時点のデータが必要です")
+
+    betas = BETA_GRID if trend else (0.0,)
+    gammas = GAMMA_GRID if seasonal else (0.0,)
+    grid = np.array([(a, b, g) for a in ALPHA_GRID for b in betas for g in gammas])
+    alpha, beta, gamma = (grid[:, i][np.newaxis, :] for i in range(3))
+    phi = DAMPING_PHI if (trend and damped) else 1.0
+
+    # 初期値（系列ごと、全組み合わせ共通）
+    if seasonal:
+        level0 = y[:, :m].mean(axis=1)
+        if trend and n_obs >= 2 * m:
+            trend0 = (y[:, m:2 * m].mean(axis=1) - level0) / m
+        else:
+            trend0 = np.zeros(n_series)
+    else:
+        # 季節なしの場合は先頭の数時点の回帰直線から初期値を求める
+        k = min(n_obs, 8)
+        x = np.arange(k) - (k - 1) / 2
+        head_mean = y[:, :k].mean(axis=1)
+        trend0 = (y[:, :k] - head_mean[:, np.newaxis]) @ x / (x @ x) if trend else np.zeros(n_series)
+        level0 = head_mean - trend0 * (k + 1) / 2    # 最初の時点の1期前
+    season0 = y[:, :m] - level0[:, np.newaxis] if seasonal else np.zeros((n_series, 1))
+
+    n_combos = len(grid)
+    level = np.repeat(level0[:, np.newaxis], n_combos, axis=1)
+    slope = np.repeat(trend0[:, np.newaxis], n_combos, axis=1)
+    season = np.repeat(season0[:, np.newaxis, :], n_combos, axis=1)    # (系列, 組み合わせ, 周期)
+    level, slope, season, errors = _smooth(y, alpha, beta, gamma, phi, level, slope, season)
+
+    sse = (errors ** 2).sum(axis=2)
+    best = np.argmin(sse, axis=1)
+    rows = np.arange(n_series)
+    level, slope, season = level[rows, best], slope[rows, best], season[rows, best]
+
+    horizon = np.arange(1, steps + 1)
+    damp_sum = horizon.astype(float) if phi == 1.0 else np.cumsum(phi ** horizon)
+    season_index = (n_obs + horizon - 1) % m
+    forecast = level[:, np.newaxis] + damp_sum[np.newaxis, :] * slope[:, np.newaxis] + season[:, season_index]
+
+    n_params = 2 + (1 if trend else 0) + (1 if seasonal else 0)
+    dof = max(n_obs - n_params, 1)
+    best_sse = sse[rows, best]
+    return {
+        'forecast': forecast,
+        'sigma': np.sqrt(best_sse / dof),
+        'aic': n_obs * np.log(np.maximum(best_sse, 1e-12) / n_obs) + 2 * n_params,
+        'alpha': grid[best, 0],
+        'beta': grid[best, 1],
+        'gamma': grid[best, 2],
+        # シミュレーション用の最終状態と1期先予測誤差
+        'phi': phi,
+        'level': level,
+        'slope': slope,
+        'season': season,
+        'residuals': errors[rows, best],
+    }
+
+
+def _smooth(y: np.ndarray, alpha, beta, gamma, phi: float,
+            level: np.ndarray, slope: np.ndarray, season: np.ndarray):
+    """
+    各レーン（系列×パラメータ組み合わせ）で加法Holt-Wintersの漸化式を計算する
+
+    Returns:
+        (最終レベル, 最終トレンド, 最終季節成分, 1期先予測誤差 (系列, 組み合わせ, 時点))
+    """
+    n_obs = y.shape[1]
+    m = season.shape[-1]
+    season = season.copy()
+    errors = np.empty(level.shape + (n_obs,))
+
+    for t in range(n_obs):
+        obs = y[:, t:t + 1]
+        s_prev = season[:, :, t % m]
+        damped_slope = phi * slope
+        errors[:, :, t] = obs - (level + damped_slope + s_prev)
+
+        new_level = alpha * (obs - s_prev) + (1 - alpha) * (level + damped_slope)
+        slope = beta * (new_level - level) + (1 - beta) * damped_slope
+        season[:, :, t % m] = gamma * (obs - new_level) + (1 - gamma) * s_prev
+        level = new_level
+
+    return level, slope, season, errors
+
+
+def simulate_holt_winters_paths(fitted: Dict[str, np.ndarray], steps: int, n_paths: int = 2000,
+                                seed: Optional[int] = None) -> np.ndarray:
+    """
+    holt_winters_forecast の結果から将来の標本経路をシミュレーションする
+
+    1期先予測誤差を系列ごとに復元抽出（ブートストラップ）し、誤差修正形式の漸化式で
+    全系列×全経路を同時に進める。経路方向のループはなく、予測期間分だけ反復する。
+
+    Args:
+        fitted: holt_winters_forecast の戻り値
+        steps: 予測期間
+        n_paths: 経路数
+        seed: 乱数シード
+
+    Returns:
+        標本経路 (系列数, n_paths, steps)
+    """
+    rng = np.random.default_rng(seed)
+    residuals = fitted['residuals']
+    residuals = residuals - residuals.mean(axis=1, keepdims=True)
+    n_series, n_obs = residuals.shape
+    m = fitted['season'].shape[1]
+
+    draws = rng.integers(0, n_obs, size=(n_series, n_paths, steps))
+    shocks = np.take_along_axis(residuals[:, np.newaxis, :], draws, axis=2)
+
+    alpha = fitted['alpha'][:, np.newaxis]
+    beta = fitted['beta'][:, np.newaxis]
+    gamma = fitted['gamma'][:, np.newaxis]
+    phi = fitted['phi']
+    level = np.repeat(fitted['level'][:, np.newaxis], n_paths, axis=1)
+    slope = np.repeat(fitted['slope'][:, np.newaxis], n_paths, axis=1)
+    season = np.repeat(fitted['season'][:, np.newaxis, :], n_paths, axis=1)
+
+    paths = np.empty((n_series, n_paths, steps))
+    for h in range(steps):
+        position = (n_obs + h) % m
+        s_prev = season[:, :, position]
+        damped_slope = phi * slope
+        error = shocks[:, :, h]
+        paths[:, :, h] = level + damped_slope + s_prev + error
+
+        level = level + damped_slope + alpha * error
+        slope = damped_slope + alpha * beta * error
+        season[:, :, position] = s_prev + gamma * (1 - alpha) * error
+
+    return paths
+
+
+def residual_bootstrap_paths(point: np.ndarray, residuals: Sequence[np.ndarray], n_paths: int = 2000,
+                             seed: Optional[int] = None) -> np.ndarray:
+    """
+    点予測に残差のブートストラップ標本を加えて標本経路を作成する（Holt-Winters以外のモデル用）
+
+    h期先の誤差は1期先残差の復元抽出を √h 倍して近似する。
+
+    Args:
+        point: 点予測 (系列数, steps)
+        residuals: 系列ごとの残差（長さは系列ごとに異なってよい。欠損は除外）
+        n_paths: 経路数
+        seed: 乱数シード
+
+    Returns:
+        標本経路 (系列数, n_paths, steps)
+    """
+    rng = np.random.default_rng(seed)
+    point = np.atleast_2d(np.asarray(point, dtype=float))
+    n_series, steps = point.shape
+    scale = np.sqrt(np.arange(1, steps + 1))
+
+    shocks = np.zeros((n_series, n_paths, steps))
+    for i, resid in enumerate(residuals):
+        resid = np.asarray(resid, dtype=float)
+        resid = resid[np.isfinite(resid)]
+        if len(resid) > 1:
+            resid = resid - resid.mean()
+            shocks[i] = rng.choice(resid, size=(n_paths, steps)) * scale
+    return point[:, np.newaxis, :] + shocks
+
+
+def seasonal_naive_forecast(values: np.ndarray, steps: int, season_length: int = 12) -> Dict[str, np.ndarray]:
+    """
+    季節ナイーブ予測（直近1周期の値を繰り返す）
+
+    Returns:
+        {'forecast': (系列数, steps), 'sigma': 季節差分の標準偏差 (系列数,)}
+    """
+    y = np.nan_to_num(np.atleast_2d(np.asarray(values, dtype=float)))
+    n_obs = y.shape[1]
+    m = season_length
+    if n_obs < m:
+        raise ValueError(f"季節ナイーブには最低{m}時点のデータが必要です")
+
+    forecast = y[:, n_obs - m + (np.arange(steps) % m)]
+    diffs = y[:, m:] - y[:, :-m]
+    sigma = diffs.std(axis=1, ddof=1) if diffs.shape[1] > 1 else np.zeros(len(y))
+    return {'forecast': forecast, 'sigma': sigma}
+
+
+def forecast_many(series: Sequence[np.ndarray], model: str, steps: int,
+                  season_length: int = 12, **kwargs) -> List[Tuple[np.ndarray, float]]:
+    """
+    長さの異なる複数系列をまとめて予測する
+
+    同じ長さの系列ごとに2次元配列へまとめ、1回の計算で予測する。
+
+    Args:
+        series: 系列のリスト
+        model: 'hwes' または 'snaive'
+        steps: 予測期間
+
+    Returns:
+        入力順の (予測値, 予測誤差の標準偏差) のリスト（データ不足の系列は None）
+    """
+    fit = holt_winters_forecast if model == 'hwes' else seasonal_naive_forecast
+    results: List[Tuple[np.ndarray, float]] = [None] * len(series)
+
+    lengths = np.array([len(s) for s in series])
+    for length in np.unique(lengths):
+        members = np.flatnonzero(lengths == length)
+        block = np.vstack([np.asarray(series[i], dtype=float) for i in members])
+        try:
+            fitted = fit(block, steps, season_length=season_length, **kwargs)
+        except ValueError:
+            continue
+        for row, i in enumerate(members):
+            results[i] = (fitted['forecast'][row], float(fitted['sigma'][row]))
+    return results
@@ -1,11 +1,53 @@
 # analysis/forecasting.py
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
-from statsmodels.tsa.arima.model import ARIMA
-from sklearn.metrics import mean_squared_error, mean_absolute_error, mean_absolute_percentage_error
 import calendar
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from utils import date_helpers
+from analysis import fast_forecast
+from config.hospital_targets import HospitalTargets
+from utils.perf_metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# モデル種別と表示名の対応
+MODEL_NAMES = {'hwes': 'Holt-Winters', 'arima': 'ARIMA', 'moving_avg': '移動平均', 'snaive': '季節ナイーブ'}
+
+# 計算エンジン（fast: NumPy実装を既定とし、precise: statsmodels を任意で利用）
+FORECAST_ENGINES = {'fast': '高速 (NumPy)', 'precise': '精密 (statsmodels)'}
+DEFAULT_ENGINE = 'fast'
+DEFAULT_MODEL_TYPES = {
+    'fast': ['hwes', 'snaive', 'moving_avg'],
+    'precise': ['hwes', 'arima', 'moving_avg'],
+}
+
+# 一括予測で病院全体を表すラベル
+HOSPITAL_LABEL = '病院全体'
+
+# 学習結果キャッシュ（系列・モデル・パラメータごと）
+FORECAST_CACHE_DIR = os.path.join("saved_data", "forecast_cache")
+FORECAST_CACHE_MAX_FILES = 2000
+_FIT_CACHE_VERSION = 2
+_FIT_CACHE: "OrderedDict[str, dict]" = OrderedDict()
+_FIT_CACHE_SIZE = 256
+# ディスクキャッシュのファイル数（未計測は None）
+_DISK_CACHE_FILES: "int | None" = None
+
+# 予測区間の信頼水準（95%）に対応する正規分位点
+INTERVAL_Z = 1.959963984540054
+
+# シミュレーションによる予測区間・目標達成確率の標本経路数と乱数シード
+N_SIMULATION_PATHS = 2000
+SIMULATION_SEED = 0
 
 def _get_monthly_timeseries(df, department=None):
     """予測用の月次時系列データを生成する内部関数"""
@@ -45,59 +87,591 @@ def _get_monthly_timeseries(df, department=None):
     return ts_data.asfreq('MS') # 月初(Month Start)の頻度に変換
 
 
-def predict_future(df, latest_date, department=None, model_type='hwes', prediction_period='fiscal_year', custom_params=None):
+@timed()
+def predict_future(df, latest_date, department=None, model_type='hwes', prediction_period='fiscal_year', custom_params=None,
+                   engine=None, target_dict=None, n_paths=N_SIMULATION_PATHS):
     """
     将来の手術件数を予測する。
 
+    engine='fast'（既定）はNumPy実装のHolt-Winters、'precise' は statsmodels を使う。
+    予測行の下限・上限は標本経路のシミュレーションによる95%予測区間。
+    target_dict を渡すと、年度目標の達成確率も予測指標に含める。
+
     :return: (予測結果DataFrame, Plotly Figure, 予測指標辞書)
     """
     ts_data = _get_monthly_timeseries(df, department)
     if len(ts_data) < 12:
         return pd.DataFrame(), None, {"message": "予測には最低12ヶ月分のデータが必要です。"}
 
-    # 予測期間の決定
-    if prediction_period == 'fiscal_year':
-        end_date = pd.Timestamp(date_helpers.get_fiscal_year(latest_date) + 1, 3, 31)
-    elif prediction_period == 'calendar_year':
-        end_date = pd.Timestamp(latest_date.year, 12, 31)
-    else: # 'six_months'
-        end_date = latest_date + pd.DateOffset(months=6)
-
-    forecast_steps = (end_date.year - ts_data.index[-1].year) * 12 + (end_date.month - ts_data.index[-1].month)
+    forecast_steps = _get_forecast_steps(ts_data, latest_date, prediction_period)
     if forecast_steps <= 0:
         return pd.DataFrame(ts_data).reset_index(), None, {"message": "予測期間が過去の日付です。"}
 
     # 予測モデルの選択と実行
-    model_name = "移動平均"
+    model_name = MODEL_NAMES.get(model_type, "移動平均")
     try:
-        if model_type == 'hwes':
-            params = {'seasonal_periods': 12, 'trend': 'add', 'seasonal': 'add', 'use_boxcox': True, **(custom_params or {})}
-            model = ExponentialSmoothing(ts_data, **params, initialization_method="estimated").fit()
-            forecast = model.forecast(forecast_steps)
-            model_name = "Holt-Winters"
-        elif model_type == 'arima':
-            model = ARIMA(ts_data, order=(1, 1, 1), seasonal_order=(1, 1, 1, 12)).fit()
-            forecast = model.forecast(forecast_steps)
-            model_name = "ARIMA"
-        else: # moving_avg
-            last_avg = ts_data.rolling(window=min(6, len(ts_data))).mean().iloc[-1]
-            forecast = pd.Series([last_avg] * forecast_steps, index=pd.date_range(start=ts_data.index[-1] + pd.DateOffset(months=1), periods=forecast_steps, freq='MS'))
+        forecast, _, _ = _fit_forecast(ts_data, model_type, forecast_steps, custom_params, engine)
+        paths = simulate_forecast_paths([ts_data], model_type, forecast_steps, custom_params, engine, n_paths)[0]
     except Exception as e:
         return pd.DataFrame(), None, {"message": f"{model_type}モデルの学習に失敗しました: {e}"}
 
     # 結果を結合
     result_df = pd.DataFrame({'値': ts_data}).reset_index()
     result_df['種別'] = '実績'
-    forecast_df = pd.DataFrame({'値': forecast, '種別': '予測'}).reset_index()
+    lower, upper = np.percentile(paths, [2.5, 97.5], axis=0)
+    forecast_df = pd.DataFrame({'値': forecast, '種別': '予測', '下限': lower, '上限': upper}).reset_index()
     combined_df = pd.concat([result_df, forecast_df]).rename(columns={'index': '月'})
     
     # 指標計算
     metrics = {"予測モデル": model_name}
+    # 計算エンジンで実装が変わるのは Holt-Winters と ARIMA のみ（季節ナイーブ・移動平均は常に同じ計算）
+    if model_type in ('hwes', 'arima'):
+        metrics["計算エンジン"] = FORECAST_ENGINES[_resolve_engine(model_type, custom_params, engine)]
+
+    if target_dict is not None and (department is None or department in target_dict):
+        probabilities = calculate_target_probabilities(
+            df, latest_date, target_dict, departments=[department], model_type=model_type,
+            custom_params=custom_params, engine=engine, n_paths=n_paths
+        )
+        if not probabilities.empty:
+            row = probabilities.iloc[0]
+            metrics["年度目標"] = round(float(row['年度目標']), 1)
+            metrics["年度予測中央値"] = round(float(row['予測中央値']), 1)
+            metrics["年度目標達成確率(%)"] = round(float(row['達成確率(%)']), 1)
 
     return combined_df, metrics
 
 
-def validate_model(df, department=None, model_types=None, validation_period=6):
+def _get_forecast_steps(ts_data, latest_date, prediction_period):
+    """予測期間の終端までの月数を求める"""
+    if prediction_period == 'fiscal_year':
+        end_date = pd.Timestamp(date_helpers.get_fiscal_year(latest_date) + 1, 3, 31)
+    elif prediction_period == 'calendar_year':
+        end_date = pd.Timestamp(latest_date.year, 12, 31)
+    else: # 'six_months'
+        end_date = latest_date + pd.DateOffset(months=6)
+
+    return (end_date.year - ts_data.index[-1].year) * 12 + (end_date.month - ts_data.index[-1].month)
+
+
+def _resolve_engine(model_type, custom_params=None, engine=None):
+    """
+    実際に使う計算エンジンを決める
+
+    ARIMA と、最適化結果などの statsmodels 固有パラメータを指定した場合は precise を使う。
+    """
+    if model_type == 'arima' or custom_params:
+        return 'precise'
+    return engine or DEFAULT_ENGINE
+
+
+def _fit_forecast(ts_data, model_type, steps, custom_params=None, engine=None, persist=True):
+    """
+    モデルを学習して予測する（学習結果キャッシュ経由）
+
+    系列の値・モデル種別・パラメータ・予測月数が同じ場合は、メモリまたは
+    saved_data/ 配下のキャッシュから予測結果を返し、再学習しない。
+    検証・バックテストの学習は persist=False としてメモリ上のキャッシュだけを使い、
+    ディスクキャッシュの上限を本番の予測に残す。
+
+    :return: (予測値, 95%予測区間下限, 95%予測区間上限) の各Series
+    """
+    cached = _get_fit(ts_data, model_type, steps, custom_params, engine, persist)
+    return cached['forecast'].copy(), cached['lower'].copy(), cached['upper'].copy()
+
+
+def _get_fit(ts_data, model_type, steps, custom_params=None, engine=None, persist=True):
+    """学習結果（予測値・区間・学習済みパラメータ・学習期間の1期先誤差）をキャッシュ経由で取得"""
+    engine = _resolve_engine(model_type, custom_params, engine)
+    cache_key = _fit_cache_key(ts_data, model_type, steps, custom_params, engine)
+    cached = _load_cached_fit(cache_key, persist)
+    if cached is None:
+        # 学習の失敗は一時的なもの（依存ライブラリ未導入・収束失敗など）もあるためキャッシュしない
+        forecast, lower, upper, fitted_params, residuals = _fit_forecast_uncached(
+            ts_data, model_type, steps, custom_params, engine)
+        cached = {'forecast': forecast, 'lower': lower, 'upper': upper, 'fitted_params': fitted_params,
+                  'residuals': residuals}
+        if persist:
+            _store_cached_fit(cache_key, cached)
+        else:
+            _remember_fit(cache_key, cached)
+    return cached
+
+
+def _fit_forecast_uncached(ts_data, model_type, steps, custom_params=None, engine='fast'):
+    """モデルを学習して予測する（予測値・区間・学習済みパラメータ・学習期間の1期先誤差を返す）"""
+    future_index = pd.date_range(start=ts_data.index[-1] + pd.DateOffset(months=1), periods=steps, freq='MS')
+
+    # 季節ナイーブは常にNumPy実装
+    if model_type == 'snaive' or (model_type == 'hwes' and engine == 'fast'):
+        values = ts_data.to_numpy(dtype=float)
+        if model_type == 'hwes':
+            fitted = fast_forecast.holt_winters_forecast(values, steps)
+            fitted_params = {key: float(fitted[key][0]) for key in ('alpha', 'beta', 'gamma')}
+            residuals = fitted['residuals'][0]
+        else:
+            fitted = fast_forecast.seasonal_naive_forecast(values, steps)
+            fitted_params = {'season_length': 12}
+            residuals = values[12:] - values[:-12]
+        forecast, lower, upper = _with_intervals(fitted['forecast'][0], float(fitted['sigma'][0]), future_index)
+        return forecast, lower, upper, fitted_params, residuals
+
+    if model_type == 'hwes':
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+        params = {'seasonal_periods': 12, 'trend': 'add', 'seasonal': 'add', 'use_boxcox': True,
+                  'initialization_method': 'estimated', **(custom_params or {})}
+        # 最適化結果（optimize_hwes_params）の評価指標はモデル引数から除く
+        params = {k: v for k, v in params.items() if k not in ('rmse', 'n_origins')}
+        model = ExponentialSmoothing(ts_data, **params).fit()
+        residuals = np.asarray(ts_data, dtype=float) - np.asarray(model.fittedvalues, dtype=float)
+        sigma = np.nanstd(residuals, ddof=1)
+        forecast, lower, upper = _with_intervals(np.asarray(model.forecast(steps), dtype=float), sigma, future_index)
+        return forecast, lower, upper, _to_plain_params(model.params), residuals
+
+    if model_type == 'arima':
+        from statsmodels.tsa.arima.model import ARIMA
+
+        model = ARIMA(ts_data, order=(1, 1, 1), seasonal_order=(1, 1, 1, 12)).fit()
+        result = model.get_forecast(steps)
+        conf_int = np.asarray(result.conf_int(alpha=0.05), dtype=float)
+        forecast = pd.Series(np.asarray(result.predicted_mean, dtype=float), index=future_index)
+        # 季節差分の初期化期間（先頭13ヶ月）の残差は除く
+        residuals = np.asarray(model.resid, dtype=float)[13:]
+        return (forecast, pd.Series(conf_int[:, 0], index=future_index).clip(lower=0),
+                pd.Series(conf_int[:, 1], index=future_index), _to_plain_params(model.params), residuals)
+
+    # moving_avg
+    window = min(6, len(ts_data))
+    rolling = ts_data.rolling(window=window).mean()
+    residuals = (ts_data - rolling.shift(1)).to_numpy(dtype=float)
+    sigma = np.nanstd(residuals, ddof=1)
+    forecast, lower, upper = _with_intervals(np.repeat(rolling.iloc[-1], steps), sigma, future_index)
+    return forecast, lower, upper, {'window': window}, residuals[np.isfinite(residuals)]
+
+
+def _with_intervals(point, sigma, index):
+    """点予測と1期先誤差の標準偏差から95%予測区間を作成（下限は0で打ち切り）"""
+    forecast = pd.Series(point, index=index, dtype=float)
+    spread = INTERVAL_Z * sigma * np.sqrt(np.arange(1, len(index) + 1))
+    return forecast, (forecast - spread).clip(lower=0), forecast + spread
+
+
+def simulate_forecast_paths(series, model_type, steps, custom_params=None, engine=None,
+                            n_paths=N_SIMULATION_PATHS, seed=SIMULATION_SEED):
+    """
+    複数系列の将来の標本経路をまとめてシミュレーションする
+
+    高速エンジンのHolt-Wintersは、同じ長さの系列を2次元配列にまとめて学習し、
+    1期先誤差のブートストラップで状態空間の漸化式を全系列×全経路同時に進める。
+    その他のモデルは学習キャッシュの点予測に残差のブートストラップ標本を加える。
+    件数のため負の値は0に打ち切る。
+
+    :param series: 月次系列のリスト
+    :return: 系列ごとの標本経路 (n_paths, steps) のリスト（学習できない系列は None）
+    """
+    engine = _resolve_engine(model_type, custom_params, engine)
+    results = [None] * len(series)
+    if steps <= 0:
+        return results
+
+    if model_type == 'hwes' and engine == 'fast':
+        lengths = np.array([len(ts) for ts in series])
+        for length in np.unique(lengths):
+            members = np.flatnonzero(lengths == length)
+            block = np.vstack([series[i].to_numpy(dtype=float) for i in members])
+            try:
+                fitted = fast_forecast.holt_winters_forecast(block, steps)
+            except ValueError:
+                continue
+            paths = fast_forecast.simulate_holt_winters_paths(fitted, steps, n_paths, seed)
+            for row, i in enumerate(members):
+                results[i] = np.maximum(paths[row], 0)
+        return results
+
+    for i, ts_data in enumerate(series):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                cached = _get_fit(ts_data, model_type, steps, custom_params, engine)
+        except Exception as e:
+            logger.warning(f"予測経路のシミュレーションに失敗しました ({model_type}): {e}")
+            continue
+        paths = fast_forecast.residual_bootstrap_paths(
+            cached['forecast'].to_numpy(dtype=float), [cached['residuals']], n_paths, seed)
+        results[i] = np.maximum(paths[0], 0)
+    return results
+
+
+@timed()
+def calculate_target_probabilities(df, latest_date, target_dict, departments=None, model_type='hwes',
+                                   custom_params=None, engine=None, n_paths=N_SIMULATION_PATHS):
+    """
+    年度目標の達成確率を対象ごとに求める
+
+    年度末までの標本経路を全対象まとめてシミュレーションし、年度内の実績と合わせた
+    年度値の分布から目標以上となる割合を達成確率とする。
+    診療科は年度合計件数を年間目標（週目標×52）と比べ、病院全体は年度内の月別
+    平日1日平均件数の平均を平日1日目標と比べる（年度実績も診療科は累計、病院全体は平均）。
+
+    :param departments: 対象（None は病院全体。省略時は病院全体＋目標設定済みの全診療科）
+    :return: (対象, 指標, 年度目標, 年度実績, 予測中央値, 予測下限, 予測上限, 達成確率(%))
+        予測下限・上限は年度値の95%予測区間
+    """
+    columns = ['対象', '指標', '年度目標', '年度実績', '予測中央値', '予測下限', '予測上限', '達成確率(%)']
+    try:
+        target_dict = target_dict or {}
+        if departments is None:
+            departments = [None] + list(target_dict)
+
+        fiscal_start = pd.Timestamp(date_helpers.get_fiscal_year(latest_date), 4, 1)
+        targets = []
+        for department in departments:
+            if department is not None and department not in target_dict:
+                continue
+            ts_data = _get_monthly_timeseries(df, department)
+            if len(ts_data) < 12:
+                continue
+            targets.append((department, ts_data, _get_forecast_steps(ts_data, latest_date, 'fiscal_year')))
+        if not targets:
+            return pd.DataFrame(columns=columns)
+
+        max_steps = max(steps for _, _, steps in targets)
+        all_paths = simulate_forecast_paths([ts for _, ts, _ in targets], model_type, max_steps,
+                                            custom_params, engine, n_paths)
+
+        rows = []
+        for (department, ts_data, steps), paths in zip(targets, all_paths):
+            if paths is None and steps > 0:
+                continue
+            actual = np.nan_to_num(ts_data[ts_data.index >= fiscal_start].to_numpy(dtype=float))
+            future = paths[:, :steps] if steps > 0 else np.zeros((n_paths, 0))
+            if department is None:
+                label, measure = HOSPITAL_LABEL, '平日1日平均件数'
+                target = HospitalTargets.get_daily_target()
+                n_months = len(actual) + future.shape[1]
+                totals = (actual.sum() + future.sum(axis=1)) / max(n_months, 1)
+                to_date = actual.mean() if len(actual) else np.nan
+            else:
+                label, measure = department, '年度合計件数'
+                target = float(target_dict[department]) * 52
+                totals = actual.sum() + future.sum(axis=1)
+                to_date = actual.sum()
+            low, median, high = np.percentile(totals, [2.5, 50, 97.5])
+            rows.append((label, measure, target, to_date, median, low, high, float(np.mean(totals >= target)) * 100))
+
+        return pd.DataFrame(rows, columns=columns)
+
+    except Exception as e:
+        logger.error(f"年度目標達成確率の計算エラー: {e}")
+        return pd.DataFrame(columns=columns)
+
+
+def _to_plain_params(params):
+    """学習済みパラメータをキャッシュ保存用の辞書（スカラー・リスト）に変換"""
+    items = params.items() if hasattr(params, 'items') else enumerate(params)
+    plain = {}
+    for key, value in items:
+        if isinstance(value, np.ndarray):
+            plain[str(key)] = value.tolist()
+        elif isinstance(value, (np.generic, int, float, bool, str)) or value is None:
+            plain[str(key)] = value.item() if isinstance(value, np.generic) else value
+    return plain
+
+
+def _fit_cache_key(ts_data, model_type, steps, custom_params, engine='precise'):
+    """系列の値・モデル種別・パラメータ・予測月数・計算エンジンからキャッシュキーを作成"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(np.asarray(ts_data, dtype=float).tobytes())
+    digest.update(np.asarray(ts_data.index.asi8).tobytes())
+    spec = {'v': _FIT_CACHE_VERSION, 'model': model_type, 'steps': int(steps), 'engine': engine,
+            'params': sorted((str(k), repr(v)) for k, v in (custom_params or {}).items())}
+    digest.update(json.dumps(spec, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _load_cached_fit(cache_key, use_disk=True):
+    """キャッシュ済みの学習結果を取得（メモリ → ディスクの順に参照）"""
+    if cache_key in _FIT_CACHE:
+        _FIT_CACHE.move_to_end(cache_key)
+        return _FIT_CACHE[cache_key]
+    if not use_disk:
+        return None
+
+    path = os.path.join(FORECAST_CACHE_DIR, f"{cache_key}.pkl")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"予測キャッシュの読み込みに失敗しました: {e}")
+        return None
+    if 'error' in cached:
+        # 以前の版が記録した学習失敗は使わずに削除する
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    _remember_fit(cache_key, cached)
+    return cached
+
+
+def _store_cached_fit(cache_key, cached):
+    """学習結果をメモリとディスクに保存（一時ファイル経由で置き換え）"""
+    _remember_fit(cache_key, cached)
+    try:
+        os.makedirs(FORECAST_CACHE_DIR, exist_ok=True)
+        path = os.path.join(FORECAST_CACHE_DIR, f"{cache_key}.pkl")
+        is_new = not os.path.exists(path)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        if is_new:
+            _count_cache_file()
+    except Exception as e:
+        logger.warning(f"予測キャッシュの保存に失敗しました: {e}")
+
+
+def _remember_fit(cache_key, cached):
+    """メモリ上のLRUに学習結果を登録"""
+    _FIT_CACHE[cache_key] = cached
+    _FIT_CACHE.move_to_end(cache_key)
+    while len(_FIT_CACHE) > _FIT_CACHE_SIZE:
+        _FIT_CACHE.popitem(last=False)
+
+
+def _count_cache_file():
+    """
+    ディスクキャッシュのファイル数を数え、上限を超えたときだけ削除する
+
+    ファイル数は初回だけディレクトリを走査して求め、以降は保存のたびに加算する
+    （他プロセスの保存分は次の削除時の走査で反映される）。
+    """
+    global _DISK_CACHE_FILES
+    if _DISK_CACHE_FILES is None:
+        _DISK_CACHE_FILES = sum(1 for entry in os.scandir(FORECAST_CACHE_DIR) if entry.name.endswith('.pkl'))
+    else:
+        _DISK_CACHE_FILES += 1
+    if _DISK_CACHE_FILES > FORECAST_CACHE_MAX_FILES:
+        _DISK_CACHE_FILES = _prune_fit_cache_dir()
+
+
+def _prune_fit_cache_dir():
+    """
+    ディスクキャッシュを古いものから上限の9割まで削除（毎回の保存で削除しないよう余裕を残す）
+
+    :return: 削除後のファイル数
+    """
+    entries = [entry for entry in os.scandir(FORECAST_CACHE_DIR) if entry.name.endswith('.pkl')]
+    if len(entries) <= FORECAST_CACHE_MAX_FILES:
+        return len(entries)
+    keep = FORECAST_CACHE_MAX_FILES * 9 // 10
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    removed = 0
+    for entry in entries[:len(entries) - keep]:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    return len(entries) - removed
+
+
+def clear_forecast_cache():
+    """予測の学習結果キャッシュ（メモリ・ディスク）を削除"""
+    global _DISK_CACHE_FILES
+    _FIT_CACHE.clear()
+    _DISK_CACHE_FILES = None
+    if os.path.exists(FORECAST_CACHE_DIR):
+        shutil.rmtree(FORECAST_CACHE_DIR, ignore_errors=True)
+    logger.info("予測キャッシュをクリアしました")
+
+
+def predict_future_batch(df, latest_date, target_dict=None, model_types=None,
+                         prediction_period='fiscal_year', validation_period=6, max_workers=None,
+                         engine=None):
+    """
+    病院全体と全診療科の将来予測を一括実行する
+
+    対象ごとに各モデルを直近 validation_period ヶ月でホールドアウト検証し、
+    RMSEが最小のモデルを採用モデルとする。
+    engine='fast'（既定）では全対象の系列を2次元配列にまとめてNumPy実装で一度に学習し、
+    statsmodels を使うモデル（precise の Holt-Winters、ARIMA）は対象ごとにプロセスプールで並列実行する
+    （移動平均はこのプロセスで計算する）。
+
+    :param target_dict: 診療科別目標値辞書（キーの診療科を対象とする。空の場合はデータ内の全診療科）
+    :return: 対象・月・モデルごとの予測値と95%予測区間（縦持ちDataFrame）
+        (対象, 月, モデル, 予測値, 下限, 上限, 検証RMSE, 採用)
+    """
+    engine = engine or DEFAULT_ENGINE
+    if model_types is None:
+        model_types = DEFAULT_MODEL_TYPES[engine]
+
+    departments = list(target_dict) if target_dict else sorted(df['実施診療科'].dropna().unique())
+    targets = []
+    for department in [None] + departments:
+        ts_data = _get_monthly_timeseries(df, department)
+        if len(ts_data) < 12:
+            logger.info(f"一括予測の対象外（データ不足）: {department or HOSPITAL_LABEL}")
+            continue
+        steps = _get_forecast_steps(ts_data, latest_date, prediction_period)
+        if steps <= 0:
+            continue
+        targets.append((department or HOSPITAL_LABEL, ts_data, steps))
+
+    columns = ['対象', '月', 'モデル', '予測値', '下限', '上限', '検証RMSE', '採用']
+    if not targets:
+        return pd.DataFrame(columns=columns)
+
+    # NumPy実装で一括学習できるモデルと、系列ごとに学習するモデルに分ける
+    vectorized = [m for m in model_types if m == 'snaive' or (m == 'hwes' and engine == 'fast')]
+    per_series = [m for m in model_types if m not in vectorized]
+
+    fitted = {label: {} for label, _, _ in targets}
+    for model_type in vectorized:
+        for label, result in _fit_forecast_vectorized(targets, model_type, validation_period).items():
+            fitted[label][model_type] = result
+
+    if per_series:
+        tasks = [(label, ts_data.to_numpy(dtype=float), ts_data.index, tuple(per_series), steps,
+                  validation_period, engine) for label, ts_data, steps in targets]
+        # 移動平均だけならプロセスプールを起動せずにこのプロセスで計算する
+        uses_statsmodels = 'arima' in per_series or (engine == 'precise' and 'hwes' in per_series)
+        workers = max_workers if uses_statsmodels else 1
+        for (label, *_), results in zip(tasks, _parallel_map(_forecast_series_task, tasks, workers)):
+            fitted[label].update(results)
+
+    records = []
+    for label, _, _ in targets:
+        # モデル指定順に並べ替えてから採用モデルを決める
+        ordered = {m: fitted[label][m] for m in model_types if m in fitted[label]}
+        records.extend(_build_forecast_rows(label, ordered))
+    if not records:
+        return pd.DataFrame(columns=columns)
+
+    logger.info(f"一括予測完了: {len(targets)}対象")
+    return pd.DataFrame.from_records(records, columns=columns)
+
+
+def _fit_forecast_vectorized(targets, model_type, validation_period):
+    """
+    全対象の系列をNumPy実装でまとめて検証・予測する
+
+    :return: {対象: ((予測値, 下限, 上限), 検証RMSE)}
+    """
+    max_steps = max(steps for _, _, steps in targets)
+    full = fast_forecast.forecast_many([ts.to_numpy(dtype=float) for _, ts, _ in targets], model_type, max_steps)
+
+    validatable = [i for i, (_, ts, _) in enumerate(targets) if len(ts) >= 12 + validation_period]
+    holdout = fast_forecast.forecast_many(
+        [targets[i][1].to_numpy(dtype=float)[:-validation_period] for i in validatable],
+        model_type, validation_period
+    )
+    rmses = {}
+    for i, result in zip(validatable, holdout):
+        if result is not None:
+            actual = np.nan_to_num(targets[i][1].to_numpy(dtype=float)[-validation_period:])
+            rmses[i] = float(np.sqrt(np.mean((actual - result[0]) ** 2)))
+
+    results = {}
+    for i, ((label, ts_data, steps), result) in enumerate(zip(targets, full)):
+        if result is None:
+            continue
+        point, sigma = result
+        future_index = pd.date_range(start=ts_data.index[-1] + pd.DateOffset(months=1), periods=steps, freq='MS')
+        results[label] = (_with_intervals(point[:steps], sigma, future_index), rmses.get(i, np.nan))
+    return results
+
+
+def _build_forecast_rows(label, fitted):
+    """1つの対象の全モデルの予測を縦持ちの行にする（検証RMSE最小のモデルを採用）"""
+    if not fitted:
+        return []
+
+    # 検証RMSEが最小のモデルを採用（検証できない場合はモデル指定順で先頭）
+    rmses = {model_type: rmse for model_type, (_, rmse) in fitted.items() if np.isfinite(rmse)}
+    chosen = min(rmses, key=rmses.get) if rmses else next(iter(fitted))
+
+    rows = []
+    for model_type, ((forecast, lower, upper), rmse) in fitted.items():
+        for month, value, low, high in zip(forecast.index, forecast.to_numpy(), lower.to_numpy(), upper.to_numpy()):
+            rows.append((label, month, MODEL_NAMES[model_type], value, low, high, rmse, model_type == chosen))
+    return rows
+
+
+def summarize_batch_forecast(batch_df, df=None, engine=None, n_paths=N_SIMULATION_PATHS):
+    """
+    一括予測結果から対象ごとの採用モデルの予測サマリーを作成する
+
+    予測合計の下限・上限は、採用モデルの標本経路を予測期間で合計した分布の95%予測区間
+    （月別の下限・上限の合計は全月が同時に端の値をとる場合になり、区間が広すぎるため使わない）。
+    df を省略した場合は予測合計の区間を求めない。
+    病院全体は平日1日平均件数の系列で合計に意味がないため、予測合計は空欄とする。
+    """
+    chosen = batch_df[batch_df['採用']]
+    if chosen.empty:
+        return pd.DataFrame()
+
+    summary = chosen.groupby('対象', sort=False).agg(
+        採用モデル=('モデル', 'first'),
+        検証RMSE=('検証RMSE', 'first'),
+        予測月数=('月', 'count'),
+        予測平均=('予測値', 'mean'),
+        予測合計=('予測値', 'sum'),
+    ).reset_index()
+    summary['予測合計下限'] = np.nan
+    summary['予測合計上限'] = np.nan
+    summary.loc[summary['対象'] == HOSPITAL_LABEL, '予測合計'] = np.nan
+
+    if df is not None:
+        # 採用モデルごとに診療科の系列をまとめてシミュレーションする
+        model_types = {name: model_type for model_type, name in MODEL_NAMES.items()}
+        groups = {}
+        for i, row in summary.iterrows():
+            if row['対象'] == HOSPITAL_LABEL or row['採用モデル'] not in model_types:
+                continue
+            groups.setdefault(model_types[row['採用モデル']], []).append(
+                (i, _get_monthly_timeseries(df, row['対象']), int(row['予測月数'])))
+        for model_type, members in groups.items():
+            all_paths = simulate_forecast_paths([ts for _, ts, _ in members], model_type,
+                                                max(steps for _, _, steps in members), engine=engine,
+                                                n_paths=n_paths)
+            for (i, _, steps), paths in zip(members, all_paths):
+                if paths is not None:
+                    totals = paths[:, :steps].sum(axis=1)
+                    summary.loc[i, ['予測合計下限', '予測合計上限']] = np.percentile(totals, [2.5, 97.5])
+    return summary.round(1)
+
+
+def _forecast_series_task(task):
+    """
+    1つの対象系列について指定モデルの検証・予測を行う（プロセスプールのワーカー）
+
+    :return: {モデル種別: ((予測値, 下限, 上限), 検証RMSE)}
+    """
+    label, values, index, model_types, steps, validation_period, engine = task
+    ts_data = pd.Series(values, index=index).asfreq('MS')
+
+    fitted = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for model_type in model_types:
+            try:
+                rmse = np.nan
+                if len(ts_data) >= 12 + validation_period:
+                    train, test = ts_data[:-validation_period], ts_data[-validation_period:]
+                    pred, _, _ = _fit_forecast(train, model_type, validation_period, engine=engine, persist=False)
+                    rmse = _rmse(test, pred)
+                fitted[model_type] = (_fit_forecast(ts_data, model_type, steps, engine=engine), rmse)
+            except Exception as e:
+                logger.warning(f"一括予測の学習失敗 ({label}, {model_type}): {e}")
+    return fitted
+
+
+def validate_model(df, department=None, model_types=None, validation_period=6, engine=None):
     """
     予測モデルの精度を検証（バックテスト）する。
     """
@@ -109,24 +683,20 @@ def validate_model(df, department=None, model_types=None, validation_period=6):
     test = ts_data[-validation_period:]
     
     if model_types is None:
-        model_types = ['hwes', 'arima', 'moving_avg']
+        model_types = DEFAULT_MODEL_TYPES[engine or DEFAULT_ENGINE]
     
     predictions = {}
     for model_type in model_types:
+        if model_type not in MODEL_NAMES:
+            continue
         try:
-            if model_type == 'hwes':
-                model = ExponentialSmoothing(train, seasonal_periods=12, trend='add', seasonal='add', use_boxcox=True).fit()
-                predictions['Holt-Winters'] = model.forecast(validation_period)
-            elif model_type == 'arima':
-                model = ARIMA(train, order=(1, 1, 1), seasonal_order=(1, 1, 1, 12)).fit()
-                predictions['ARIMA'] = model.forecast(validation_period)
-            elif model_type == 'moving_avg':
-                last_avg = train.rolling(window=6).mean().iloc[-1]
-                predictions['移動平均'] = pd.Series([last_avg] * validation_period, index=test.index)
+            predictions[MODEL_NAMES[model_type]], _, _ = _fit_forecast(train, model_type, validation_period,
+                                                                     engine=engine, persist=False)
         except Exception:
             continue
             
-    # 評価指標の計算
+    # 評価指標の計算（sklearn は起動時間を抑えるため使う時に読み込む）
+    from sklearn.metrics import mean_squared_error, mean_absolute_error, mean_absolute_percentage_error
     metrics = []
     for name, pred in predictions.items():
         rmse = np.sqrt(mean_squared_error(test, pred))
@@ -139,42 +709,157 @@ def validate_model(df, department=None, model_types=None, validation_period=6):
 
     return metrics_df, train, test, predictions, recommendation
 
-def optimize_hwes_params(df, department=None, validation_period=6):
-    """Holt-Wintersモデルの最適なパラメータを探索する"""
+# Holt-Winters パラメータ探索のグリッド
+HWES_PARAM_GRID = {
+    'trend': ['add', 'mul', None],
+    'damped_trend': [False, True],
+    'seasonal': ['add', 'mul'],
+    'use_boxcox': [True, False],
+    'seasonal_periods': [12, 6, 4],
+    'initialization_method': ['estimated', 'heuristic'],
+}
+
+
+def optimize_hwes_params(df, department=None, validation_period=6, n_origins=3, top_k=8, max_workers=None):
+    """
+    Holt-Wintersモデルの最適なパラメータを探索する（statsmodels を使用）
+
+    1段目で全組み合わせを直近の検証期間で評価し（学習に失敗した組み合わせはここで除外）、
+    2段目で上位 top_k 件のみをローリング・オリジン（予測起点を1ヶ月ずつずらした n_origins 回）の
+    平均RMSEで再評価する。2段目は候補ごとに学習データが足りる起点だけを使い、評価できた起点の
+    平均で比較する（1段目を通過した候補は2段目で除外しない）。各段の学習はプロセスプールで並列実行する。
+    """
     ts_data = _get_monthly_timeseries(df, department)
     if len(ts_data) < 12 + validation_period:
-        return {}, "パラメータ最適化には最低{12 + validation_period}ヶ月分のデータが必要です。"
-    
-    train = ts_data[:-validation_period]
-    test = ts_data[-validation_period:]
+        return {}, f"パラメータ最適化には最低{12 + validation_period}ヶ月分のデータが必要です。"
+
+    candidates = _build_hwes_candidates(ts_data, len(ts_data) - validation_period)
+    if not candidates:
+        return {}, "最適なパラメータを見つけられませんでした。"
+
+    cutoffs = [len(ts_data) - validation_period - i for i in range(max(1, n_origins))]
+    cutoffs = [c for c in cutoffs if c >= 12]
+    values, index = ts_data.to_numpy(dtype=float), ts_data.index
+
+    # 1段目: 直近の検証期間のみで全候補を評価
+    first_stage = _parallel_map(
+        _evaluate_hwes_candidate,
+        [(values, index, params, cutoffs[:1], validation_period, False) for params in candidates],
+        max_workers
+    )
+    scored = sorted(
+        ((rmses[0], i) for i, rmses in enumerate(first_stage) if rmses),
+        key=lambda item: item
+    )
+    if not scored:
+        return {}, "最適なパラメータを見つけられませんでした。"
+
+    # 2段目: 上位候補のみローリング・オリジンで再評価（1段目の結果は再利用）
+    finalists = [i for _, i in scored[:max(1, top_k)]]
+    second_stage = _parallel_map(
+        _evaluate_hwes_candidate,
+        [(values, index, candidates[i],
+          [c for c in cutoffs[1:] if c >= 2 * candidates[i]['seasonal_periods']],
+          validation_period, True) for i in finalists],
+        max_workers
+    ) if len(cutoffs) > 1 else [[] for _ in finalists]
 
-    best_rmse = float('inf')
     best_params = {}
-    
-    # 探索するパラメータの組み合わせ
-    param_grid = {
-        'trend': ['add', 'mul'],
-        'seasonal': ['add', 'mul'],
-        'use_boxcox': [True, False],
-        'seasonal_periods': [12, 6, 4]
-    }
-    
-    for trend in param_grid['trend']:
-        for seasonal in param_grid['seasonal']:
-            for use_boxcox in param_grid['use_boxcox']:
-                for sp in param_grid['seasonal_periods']:
-                    try:
-                        fit = ExponentialSmoothing(train, trend=trend, seasonal=seasonal, seasonal_periods=sp, use_boxcox=use_boxcox).fit()
-                        pred = fit.forecast(len(test))
-                        rmse = np.sqrt(mean_squared_error(test, pred))
-                        if rmse < best_rmse:
-                            best_rmse = rmse
-                            best_params = {'trend': trend, 'seasonal': seasonal, 'use_boxcox': use_boxcox, 'seasonal_periods': sp, 'rmse': rmse}
-                    except Exception:
-                        continue
-                        
+    best_rmse = float('inf')
+    for i, rmses in zip(finalists, second_stage):
+        fold_rmses = first_stage[i] + (rmses or [])
+        rmse = float(np.mean(fold_rmses))
+        if rmse < best_rmse:
+            best_rmse = rmse
+            best_params = {**candidates[i], 'rmse': rmse, 'n_origins': len(fold_rmses)}
+
     if not best_params:
         return {}, "最適なパラメータを見つけられませんでした。"
 
-    model_desc = f"トレンド:{best_params['trend']}, 季節:{best_params['seasonal']}, BoxCox:{best_params['use_boxcox']}, 周期:{best_params['seasonal_periods']}"
-    return best_params, model_desc
\ No newline at end of file
+    model_desc = (
+        f"トレンド:{best_params['trend']}{'(減衰)' if best_params['damped_trend'] else ''}, "
+        f"季節:{best_params['seasonal']}, BoxCox:{best_params['use_boxcox']}, "
+        f"周期:{best_params['seasonal_periods']}, 初期化:{best_params['initialization_method']}"
+    )
+    return best_params, model_desc
+
+
+def _build_hwes_candidates(ts_data, min_train_length):
+    """探索グリッドから学習可能な組み合わせだけを列挙する"""
+    positive = bool((ts_data > 0).all())
+    candidates = []
+    for trend in HWES_PARAM_GRID['trend']:
+        for damped in HWES_PARAM_GRID['damped_trend']:
+            if damped and trend is None:
+                continue
+            for seasonal in HWES_PARAM_GRID['seasonal']:
+                for use_boxcox in HWES_PARAM_GRID['use_boxcox']:
+                    # 乗法モデル・Box-Cox変換は正の値のみ
+                    if not positive and ('mul' in (trend, seasonal) or use_boxcox):
+                        continue
+                    for sp in HWES_PARAM_GRID['seasonal_periods']:
+                        # 季節成分の推定には最低2周期分の学習データが必要
+                        if min_train_length < 2 * sp:
+                            continue
+                        for init in HWES_PARAM_GRID['initialization_method']:
+                            candidates.append({
+                                'trend': trend, 'damped_trend': damped, 'seasonal': seasonal,
+                                'use_boxcox': use_boxcox, 'seasonal_periods': sp,
+                                'initialization_method': init,
+                            })
+    return candidates
+
+
+def _rmse(actual, pred):
+    """RMSE（ワーカーで sklearn を読み込まないよう NumPy で計算）"""
+    diff = np.asarray(actual, dtype=float) - np.asarray(pred, dtype=float)
+    return float(np.sqrt(np.mean(diff ** 2)))
+
+
+def _evaluate_hwes_candidate(task):
+    """
+    1つのパラメータ組み合わせを各予測起点で評価する（プロセスプールのワーカー）
+
+    いずれかの起点で学習に失敗した、または予測が有限値でない場合は
+    残りの起点を評価せずに None を返す。skip_failed が真の場合はその起点だけを除いて続ける。
+    """
+    values, index, params, cutoffs, horizon, skip_failed = task
+    ts_data = pd.Series(values, index=index).asfreq('MS')
+    rmses = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for cutoff in cutoffs:
+            train = ts_data.iloc[:cutoff]
+            test = ts_data.iloc[cutoff:cutoff + horizon]
+            try:
+                # 候補パラメータは使い捨てのため、キャッシュを経由せずに学習する
+                pred = _fit_forecast_uncached(train, 'hwes', len(test), params,
+                                              _resolve_engine('hwes', params))[0]
+                pred = pred.to_numpy(dtype=float)
+            except Exception:
+                if skip_failed:
+                    continue
+                return None
+            if not np.all(np.isfinite(pred)):
+                if skip_failed:
+                    continue
+                return None
+            rmses.append(_rmse(test, pred))
+    return rmses
+
+
+def _parallel_map(func, tasks, max_workers=None):
+    """
+    タスクをプロセスプールで並列実行し、入力順に結果を返す
+
+    CPUが1つの場合やプールを起動できない環境では逐次実行にフォールバックする。
+    """
+    tasks = list(tasks)
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(func, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"プロセスプールを利用できないため逐次実行します: {e}")
+    return [func(task) for task in tasks]
@@ -2,29 +2,40 @@
 import pandas as pd
 import numpy as np
 from utils import date_helpers
+from data_processing import analytic_store
+from utils.perf_metrics import timed
 import calendar
 
+@timed()
 def get_monthly_summary(df, department=None):
     """月単位でのサマリーを計算する"""
     if df.empty:
         return pd.DataFrame()
 
-    target_df = df[df['is_gas_20min']].copy()
-    if department:
-        target_df = target_df[target_df['実施診療科'] == department]
+    if analytic_store.is_active_for(df):
+        # 分析用SQLストアが同じデータから作られていれば月別件数をSQLで集計
+        summary = analytic_store.aggregate_cases(
+            ['month_start'], metrics=('件数', '平日件数'), departments=[department] if department else None
+        ).rename(columns={'件数': '月合計件数'})
+        if summary.empty:
+            return pd.DataFrame()
+    else:
+        target_df = df[df['is_gas_20min']].copy()
+        if department:
+            target_df = target_df[target_df['実施診療科'] == department]
 
-    if target_df.empty:
-        return pd.DataFrame()
+        if target_df.empty:
+            return pd.DataFrame()
 
-    # 月ごとの集計
-    monthly_counts = target_df.groupby('month_start').size().reset_index(name='月合計件数')
-    weekday_df = target_df[target_df['is_weekday']]
-    if not weekday_df.empty:
-        monthly_weekday_counts = weekday_df.groupby('month_start').size().reset_index(name='平日件数')
-        summary = pd.merge(monthly_counts, monthly_weekday_counts, on='month_start', how='left')
-    else:
-        summary = monthly_counts
-        summary['平日件数'] = 0
+        # 月ごとの集計
+        monthly_counts = target_df.groupby('month_start').size().reset_index(name='月合計件数')
+        weekday_df = target_df[target_df['is_weekday']]
+        if not weekday_df.empty:
+            monthly_weekday_counts = weekday_df.groupby('month_start').size().reset_index(name='平日件数')
+            summary = pd.merge(monthly_counts, monthly_weekday_counts, on='month_start', how='left')
+        else:
+            summary = monthly_counts
+            summary['平日件数'] = 0
     
     summary.fillna(0, inplace=True)
     
@@ -5,6 +5,7 @@ from datetime import datetime, time, timedelta
 import re
 import unicodedata
 from utils import date_helpers
+from utils.perf_metrics import timed
 from analysis import weekly
 
 def _normalize_room_name(series):
@@ -111,6 +112,7 @@ def _convert_to_datetime(time_series, date_series):
     except Exception:
         return pd.Series(pd.NaT, index=time_series.index)
 
+@timed()
 def calculate_operating_room_utilization(df, period_df):
     """
     手術室の稼働率を実計算する
@@ -244,6 +246,7 @@ def calculate_operating_room_utilization(df, period_df):
     except Exception as e:
         return 0.0
 
+@timed()
 def get_kpi_summary(df, latest_date):
     """
     ダッシュボード用の主要KPIサマリーを計算する（完全週単位）
@@ -297,6 +300,7 @@ def get_kpi_summary(df, latest_date):
         "手術室稼働率 (全手術、平日のみ)": f"{utilization_rate:.1f}%"
     }
 
+@timed()
 def get_department_performance_summary(df, target_dict, latest_date):
     """診療科別パフォーマンスサマリーを取得"""
     if df.empty or not target_dict:
@@ -347,6 +351,7 @@ def get_department_performance_summary(df, target_dict, latest_date):
     
     return pd.DataFrame(results)
 
+@timed()
 def calculate_achievement_rates(df, target_dict):
     """
     診療科ごとの目標達成率を計算する。
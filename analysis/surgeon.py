@@ -1,8 +1,8 @@
 # analysis/surgeon.py
 import pandas as pd
-import streamlit as st
+from utils.cache import cached
 
-@st.cache_data(ttl=3600)
+@cached(ttl=3600)
 def get_expanded_surgeon_df(df):
     """
     術者列を改行で分割し、行を展開する。この処理は重いためキャッシュする。
@@ -27,9 +27,10 @@ def get_expanded_surgeon_df(df):
     
     return expanded
 
+@cached(ttl=3600)
 def get_surgeon_summary(df):
     """
-    術者ごとの手術件数を集計する。
+    術者ごとの手術件数を集計する。（術者分析ページの部分再実行で使い回すためキャッシュする）
 
     :param df: 展開済みの術者DataFrame
     :return: 術者ごとの集計結果
@@ -6,23 +6,41 @@
 
 import pandas as pd
 import numpy as np
+import copy
 import logging
-from datetime import datetime, timedelta, time
-from typing import Dict, List, Tuple, Any, Optional
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Any, Optional, Iterable
+
+from utils.cache import derive_data_version, get_data_version, set_data_version
+from utils.perf_metrics import timed
 
 logger = logging.getLogger(__name__)
 
+# 評価期間と週数の対応
+PERIOD_WEEKS = {
+    "直近4週": 4,
+    "直近8週": 8,
+    "直近12週": 12,
+}
+
+DEFAULT_SURGERY_HOURS = 2.0
+MIN_ENTITY_RECORDS = 3
+
+# スコア計算結果のキャッシュ（種別・データ指紋・目標・期間ごと）
+_SCORE_CACHE: "OrderedDict[Tuple, Any]" = OrderedDict()
+_SCORE_CACHE_SIZE = 32
 
-def calculate_surgery_high_scores(df: pd.DataFrame, target_dict: Dict[str, float], 
+
+def calculate_surgery_high_scores(df: pd.DataFrame, target_dict: Dict[str, float],
                                 period: str = "直近12週") -> List[Dict[str, Any]]:
     """
     手術データから診療科別ハイスコアを計算
-    
+
     Args:
         df: 手術データ
         target_dict: 診療科別目標値辞書
         period: 分析期間
-    
+
     Returns:
         診療科スコアリスト（スコア順）
     """
@@ -30,90 +48,414 @@ def calculate_surgery_high_scores(df: pd.DataFrame, target_dict: Dict[str, float
         if df.empty:
             logger.warning("手術データが空です")
             return []
-        
+
         # 期間フィルタリング
         start_date, end_date = _get_period_dates(df, period)
         if not start_date or not end_date:
             logger.error("期間計算に失敗しました")
             return []
-        
+
         period_df = df[
-            (df['手術実施日_dt'] >= start_date) & 
+            (df['手術実施日_dt'] >= start_date) &
             (df['手術実施日_dt'] <= end_date)
-        ].copy()
-        
+        ]
+
         if period_df.empty:
             logger.warning(f"期間 {period} にデータがありません")
             return []
-        
+
         # 週次データ準備
         weekly_df = _prepare_weekly_data(period_df)
         if weekly_df.empty:
             logger.warning("週次データの準備に失敗しました")
             return []
-        
-        # 診療科別スコア計算
-        dept_scores = []
-        departments = weekly_df['実施診療科'].dropna().unique()
-        
-        for dept in departments:
-            dept_data = weekly_df[weekly_df['実施診療科'] == dept]
-            if len(dept_data) < 3:  # 最小データ数チェック
-                continue
-            
-            score_data = _calculate_department_score(
-                dept_data, dept, target_dict, start_date, end_date
-            )
-            
-            if score_data:
-                dept_scores.append(score_data)
-        
-        # スコア順でソート
-        dept_scores_sorted = sorted(dept_scores, key=lambda x: x['total_score'], reverse=True)
-        
+
+        # 全診療科のスコアを一括計算（スコア順）
+        dept_scores_sorted = _score_entities(weekly_df, '実施診療科', target_dict)
+
         logger.info(f"手術ハイスコア計算完了: {len(dept_scores_sorted)}診療科")
         return dept_scores_sorted
-        
+
     except Exception as e:
         logger.error(f"手術ハイスコア計算エラー: {e}")
         return []
 
 
-def _prepare_weekly_data(df: pd.DataFrame) -> pd.DataFrame:
-    """週次データを準備"""
+def calculate_surgery_high_scores_batch(df: pd.DataFrame, target_dict: Dict[str, float],
+                                        periods: Optional[Iterable[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    複数の評価期間のハイスコアを一括計算
+
+    週次データ（週キー・手術時間）の準備は最長期間に対して1回だけ行い、
+    各期間はその部分集合として集計する。
+
+    Args:
+        df: 手術データ
+        target_dict: 診療科別目標値辞書
+        periods: 分析期間のリスト（省略時は全評価期間）
+
+    Returns:
+        {期間: 診療科スコアリスト（スコア順）}
+    """
+    periods = list(periods) if periods is not None else list(PERIOD_WEEKS)
+    results: Dict[str, List[Dict[str, Any]]] = {period: [] for period in periods}
+
     try:
-        weekly_df = df.copy()
-        
-        # 週開始日を計算（月曜始まり）
-        weekly_df['week_start'] = weekly_df['手術実施日_dt'].dt.to_period('W-MON').dt.start_time
-        
+        if df.empty:
+            logger.warning("手術データが空です")
+            return results
+
+        period_dates = {}
+        for period in periods:
+            start_date, end_date = _get_period_dates(df, period)
+            if start_date and end_date:
+                period_dates[period] = (start_date, end_date)
+
+        if not period_dates:
+            logger.error("期間計算に失敗しました")
+            return results
+
+        earliest = min(start for start, _ in period_dates.values())
+        latest = max(end for _, end in period_dates.values())
+        base_df = df[(df['手術実施日_dt'] >= earliest) & (df['手術実施日_dt'] <= latest)]
+        if base_df.empty:
+            return results
+
+        weekly_df = _prepare_weekly_data(base_df)
+        if weekly_df.empty:
+            logger.warning("週次データの準備に失敗しました")
+            return results
+
+        for period, (start_date, end_date) in period_dates.items():
+            in_period = (
+                (weekly_df['手術実施日_dt'] >= start_date) &
+                (weekly_df['手術実施日_dt'] <= end_date)
+            )
+            if in_period.any():
+                results[period] = _score_entities(weekly_df[in_period], '実施診療科', target_dict)
+
+        logger.info(f"手術ハイスコア一括計算完了: {len(period_dates)}期間")
+        return results
+
+    except Exception as e:
+        logger.error(f"手術ハイスコア一括計算エラー: {e}")
+        return results
+
+
+def calculate_surgeon_high_scores(df: pd.DataFrame,
+                                  surgeon_targets: Optional[Dict[str, float]] = None,
+                                  period: str = "直近12週",
+                                  default_target: float = 0,
+                                  department: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    手術データから術者別ハイスコアを計算（診療科と同じ評価モデル）
+
+    Args:
+        df: 手術データ
+        surgeon_targets: 術者別の週次全身麻酔件数目標 {術者名: 目標件数}
+        period: 分析期間
+        default_target: 目標未設定の術者に適用する目標（0の場合は達成度評価なし）
+        department: 指定した場合はその診療科の手術のみを対象
+
+    Returns:
+        術者スコアリスト（スコア順、主な所属診療科 'department' を含む）
+    """
+    try:
+        if df.empty or '実施術者' not in df.columns:
+            logger.warning("術者データがありません")
+            return []
+
+        start_date, end_date = _get_period_dates(df, period)
+        if not start_date or not end_date:
+            logger.error("期間計算に失敗しました")
+            return []
+
+        period_df = df[
+            (df['手術実施日_dt'] >= start_date) &
+            (df['手術実施日_dt'] <= end_date)
+        ]
+        if department:
+            period_df = period_df[period_df['実施診療科'] == department]
+        derive_data_version(period_df, df, 'surgeon_period', start_date, end_date, department)
+
+        # 複数術者の手術は術者ごとの行に展開
+        from analysis.surgeon import get_expanded_surgeon_df
+        expanded_df = get_expanded_surgeon_df(period_df)
+        if expanded_df.empty:
+            logger.warning(f"期間 {period} に術者データがありません")
+            return []
+        expanded_df = expanded_df.reset_index(drop=True)
+
+        weekly_df = _prepare_weekly_data(expanded_df, entity_col='実施術者')
+        if weekly_df.empty:
+            logger.warning("週次データの準備に失敗しました")
+            return []
+
+        surgeon_scores = _score_entities(weekly_df, '実施術者', surgeon_targets or {}, default_target)
+
+        # 主な所属診療科（最も手術件数の多い診療科）
+        main_departments = (
+            expanded_df.groupby(['実施術者', '実施診療科']).size()
+            .sort_values(ascending=False, kind='stable')
+            .reset_index()
+            .drop_duplicates('実施術者')
+            .set_index('実施術者')['実施診療科']
+        )
+        for score in surgeon_scores:
+            score['department'] = main_departments.get(score['entity_name'])
+
+        logger.info(f"術者ハイスコア計算完了: {len(surgeon_scores)}名")
+        return surgeon_scores
+
+    except Exception as e:
+        logger.error(f"術者ハイスコア計算エラー: {e}")
+        return []
+
+
+def calculate_surgery_high_score_history(df: pd.DataFrame, target_dict: Dict[str, float],
+                                         period: str = "直近12週",
+                                         max_weeks: int = 52) -> pd.DataFrame:
+    """
+    診療科別ハイスコアの週次推移を計算
+
+    最新日から1週ずつ遡った各基準日について、calculate_surgery_high_scores と
+    同じ評価（基準日までの評価期間）を行う。週次集計は一度だけ作成し、
+    各基準日の評価窓はそのスライディングウィンドウとして組み立てる。
+    結果はデータバージョン・目標・期間ごとにキャッシュする。
+
+    Args:
+        df: 手術データ
+        target_dict: 診療科別目標値辞書
+        period: 分析期間
+        max_weeks: 遡る最大週数（基準日の数）
+
+    Returns:
+        基準日×診療科のスコア推移DataFrame
+        (anchor_date, entity_name, total_score, grade, rank, achievement_rate, improvement_rate)
+    """
+    try:
+        if df.empty:
+            logger.warning("手術データが空です")
+            return pd.DataFrame()
+
+        history_df = _memoize(
+            ('history', period, max_weeks), df, target_dict,
+            lambda: _calculate_score_history(df, target_dict, PERIOD_WEEKS.get(period, 12), max_weeks)
+        )
+
+        logger.info(f"ハイスコア推移計算完了: {history_df['anchor_date'].nunique() if not history_df.empty else 0}週")
+        return history_df
+
+    except Exception as e:
+        logger.error(f"ハイスコア推移計算エラー: {e}")
+        return pd.DataFrame()
+
+
+@timed()
+def get_surgery_high_scores(df: pd.DataFrame, target_dict: Dict[str, float],
+                            period: str = "直近12週") -> List[Dict[str, Any]]:
+    """
+    診療科別ハイスコアを取得（メモ化版）
+
+    データ指紋・目標・期間が同じ呼び出しは前回の計算結果を再利用する。
+    ダッシュボード・統計表示・HTML出力など複数箇所からの同一計算を1回にまとめる。
+    """
+    if df is None or df.empty:
+        return []
+    return _memoize(('department', period), df, target_dict,
+                    lambda: calculate_surgery_high_scores(df, target_dict, period))
+
+
+@timed()
+def get_surgeon_high_scores(df: pd.DataFrame, surgeon_targets: Optional[Dict[str, float]] = None,
+                            period: str = "直近12週", default_target: float = 0,
+                            department: Optional[str] = None) -> List[Dict[str, Any]]:
+    """術者別ハイスコアを取得（メモ化版）"""
+    if df is None or df.empty:
+        return []
+    return _memoize(('surgeon', period, default_target, department), df, surgeon_targets,
+                    lambda: calculate_surgeon_high_scores(df, surgeon_targets, period,
+                                                          default_target, department))
+
+
+def clear_high_score_cache() -> None:
+    """ハイスコアのメモ化結果を破棄（全セッション共通。キーにデータ指紋・目標を含むため、データ更新時に呼ぶ必要はない）"""
+    _SCORE_CACHE.clear()
+    logger.debug("ハイスコアキャッシュをクリアしました")
+
+
+def export_high_score_cache(df: pd.DataFrame) -> Dict[Tuple, Any]:
+    """指定データのメモ化結果を取り出す（事前計算結果の保存用）"""
+    fingerprint = get_data_fingerprint(df)
+    return {key: copy.deepcopy(value) for key, value in _SCORE_CACHE.items() if key[1] == fingerprint}
+
+
+def prime_high_score_cache(entries: Dict[Tuple, Any]) -> None:
+    """事前計算済みのメモ化結果をキャッシュに登録（export_high_score_cache の結果を渡す）"""
+    for cache_key, result in entries.items():
+        _SCORE_CACHE[cache_key] = result
+        _SCORE_CACHE.move_to_end(cache_key)
+    while len(_SCORE_CACHE) > _SCORE_CACHE_SIZE:
+        _SCORE_CACHE.popitem(last=False)
+
+
+def get_data_fingerprint(df: pd.DataFrame) -> str:
+    """
+    データ指紋を取得
+
+    読み込み・結合時に登録したデータバージョンを使う。未登録のDataFrameは
+    その場で内容から計算して登録する（同じオブジェクトでは1回だけ）。
+    """
+    return get_data_version(df) or set_data_version(df)
+
+
+def _memoize(kind: Tuple, df: pd.DataFrame, target_dict: Optional[Dict[str, float]], compute) -> Any:
+    """計算結果をLRUキャッシュ経由で返す（呼び出し側の変更が波及しないよう複製を返す）"""
+    cache_key = (kind, get_data_fingerprint(df), _target_key(target_dict))
+    if cache_key in _SCORE_CACHE:
+        _SCORE_CACHE.move_to_end(cache_key)
+        return copy.deepcopy(_SCORE_CACHE[cache_key])
+
+    result = compute()
+    _SCORE_CACHE[cache_key] = result
+    while len(_SCORE_CACHE) > _SCORE_CACHE_SIZE:
+        _SCORE_CACHE.popitem(last=False)
+    return copy.deepcopy(result)
+
+
+def _calculate_score_history(df: pd.DataFrame, target_dict: Dict[str, float],
+                             weeks: int, max_weeks: int) -> pd.DataFrame:
+    """基準日ごとのスコアをスライディングウィンドウで一括計算"""
+    dates = df['手術実施日_dt']
+    latest_date = dates.max().normalize()
+    n_anchors = min(max_weeks, (latest_date - dates.min().normalize()).days // 7 + 1)
+    if n_anchors <= 0:
+        return pd.DataFrame()
+
+    earliest_start = latest_date - pd.Timedelta(weeks=n_anchors - 1 + weeks) + pd.Timedelta(days=1)
+    weekly_df = _prepare_weekly_data(df[(dates >= earliest_start) & (dates <= dates.max())])
+    if weekly_df.empty:
+        return pd.DataFrame()
+
+    # 基準日の曜日で各週を「基準日まで(head)」と「基準日より後(tail)」に分ける。
+    # 全基準日は同じ曜日なので、評価窓は tail(最初の週) + 全週 + head(最後の週) になる。
+    day_offset = (weekly_df['手術実施日_dt'].dt.normalize() - weekly_df['week_start']).dt.days
+    anchor_offset = (latest_date - latest_date.to_period('W-MON').start_time).days
+    is_head = (day_offset <= anchor_offset).to_numpy()
+
+    entities = pd.Index(weekly_df['実施診療科'].dropna().unique())
+    first_week = earliest_start.to_period('W-MON').start_time - pd.Timedelta(weeks=1)
+    week_axis = pd.date_range(first_week, latest_date.to_period('W-MON').start_time, freq='7D')
+
+    full = _weekly_stats_cube(weekly_df, entities, week_axis)
+    head = _weekly_stats_cube(weekly_df[is_head], entities, week_axis)
+    tail = _weekly_stats_cube(weekly_df[~is_head], entities, week_axis)
+
+    # 評価窓のスライディングウィンドウ（基準日 × 窓内の週）
+    last_week = np.arange(len(week_axis) - 1, len(week_axis) - 1 - n_anchors, -1)
+    window = last_week[:, np.newaxis] + np.arange(-weeks, 1)[np.newaxis, :]
+    cells = {}
+    for stat in full:
+        cube = full[stat][:, window]                     # (診療科, 基準日, 週)
+        cube[:, :, 0] = tail[stat][:, window[:, 0]]
+        cube[:, :, -1] = head[stat][:, window[:, -1]]
+        cells[stat] = cube.transpose(1, 0, 2).reshape(-1, weeks + 1)
+
+    counts = cells['weekly_total_cases']
+    present = counts > 0
+    week_counts = present.sum(axis=1)
+    eligible = counts.sum(axis=1) >= MIN_ENTITY_RECORDS  # 最小データ数チェック
+
+    row_entities = np.tile(np.arange(len(entities)), n_anchors)
+    row_anchors = np.repeat(np.arange(n_anchors), len(entities))
+    all_targets = np.array([target_dict.get(entity, 0) for entity in entities], dtype=object)
+
+    records = []
+    for n_weeks in np.unique(week_counts[eligible]):
+        rows = np.flatnonzero(eligible & (week_counts == n_weeks))
+        # 実績のある週を時系列順に左詰め
+        order = np.argsort(~present[rows], axis=1, kind='stable')[:, :n_weeks]
+        packed = {
+            stat: np.take_along_axis(values[rows], order, axis=1)
+            for stat, values in cells.items()
+        }
+        metrics = _calculate_score_matrix(
+            packed['weekly_gas_cases'], packed['weekly_total_cases'],
+            packed['weekly_total_hours'], list(all_targets[row_entities[rows]])
+        )
+        records.append(pd.DataFrame({
+            'anchor_date': latest_date - pd.to_timedelta(row_anchors[rows] * 7, unit='D'),
+            'entity_name': entities[row_entities[rows]],
+            'total_score': np.round(metrics['total_score'], 1),
+            'grade': [_determine_grade(score) for score in metrics['total_score']],
+            'achievement_rate': np.round(metrics['achievement_rate'], 1),
+            'improvement_rate': np.round(metrics['improvement_rate'], 1),
+        }))
+
+    if not records:
+        return pd.DataFrame()
+
+    history_df = pd.concat(records, ignore_index=True)
+    history_df['rank'] = history_df.groupby('anchor_date')['total_score'].rank(
+        method='min', ascending=False
+    ).astype(int)
+    history_df = history_df.sort_values(['anchor_date', 'rank', 'entity_name']).reset_index(drop=True)
+    return history_df[['anchor_date', 'entity_name', 'total_score', 'grade', 'rank',
+                       'achievement_rate', 'improvement_rate']]
+
+
+def _weekly_stats_cube(weekly_df: pd.DataFrame, entities: pd.Index,
+                       week_axis: pd.DatetimeIndex) -> Dict[str, np.ndarray]:
+    """週次集計をエンティティ×週の密行列に展開（実績なしは0）"""
+    weekly_stats = _aggregate_weekly_stats(weekly_df, '実施診療科')
+    full_index = pd.MultiIndex.from_product([entities, week_axis])
+    dense = weekly_stats.reindex(full_index, fill_value=0)
+    return {
+        stat: dense[stat].to_numpy().reshape(len(entities), len(week_axis))
+        for stat in weekly_stats.columns
+    }
+
+
+def _target_key(target_dict: Dict[str, float]) -> Tuple:
+    """目標辞書をキャッシュキー用のタプルに変換"""
+    return tuple(sorted((str(k), str(v)) for k, v in (target_dict or {}).items()))
+
+
+def _prepare_weekly_data(df: pd.DataFrame, entity_col: str = '実施診療科') -> pd.DataFrame:
+    """週次データを準備（スコア計算に必要な列のみ）"""
+    try:
+        dates = df['手術実施日_dt']
+        weekly_df = pd.DataFrame({
+            '手術実施日_dt': dates,
+            entity_col: df[entity_col],
+            # 週開始日を計算（月曜始まり）
+            'week_start': dates.dt.to_period('W-MON').dt.start_time,
+        }, index=df.index)
+
         # 手術時間計算（入退室時刻から）
-        if '入室時刻' in weekly_df.columns and '退室時刻' in weekly_df.columns:
+        if '入室時刻' in df.columns and '退室時刻' in df.columns:
             weekly_df['手術時間_時間'] = _calculate_surgery_hours(
-                weekly_df['入室時刻'], 
-                weekly_df['退室時刻'], 
-                weekly_df['手術実施日_dt']
+                df['入室時刻'],
+                df['退室時刻'],
+                dates
             )
         else:
             # フォールバック: デフォルト値
-            weekly_df['手術時間_時間'] = 2.0
-        
+            weekly_df['手術時間_時間'] = DEFAULT_SURGERY_HOURS
+
         # 全身麻酔フラグの確認・作成
-        if 'is_gas_20min' not in weekly_df.columns:
+        if 'is_gas_20min' in df.columns:
+            weekly_df['is_gas_20min'] = df['is_gas_20min']
+        elif '麻酔種別' in df.columns:
             # 麻酔種別から判定
-            if '麻酔種別' in weekly_df.columns:
-                weekly_df['is_gas_20min'] = weekly_df['麻酔種別'].str.contains(
-                    '全身麻酔.*20分以上', na=False, regex=True
-                )
-            else:
-                weekly_df['is_gas_20min'] = True  # デフォルトで全て対象
-        
-        # 平日フラグの確認・作成
-        if 'is_weekday' not in weekly_df.columns:
-            weekly_df['is_weekday'] = weekly_df['手術実施日_dt'].dt.weekday < 5
-        
+            weekly_df['is_gas_20min'] = df['麻酔種別'].str.contains(
+                '全身麻酔.*20分以上', na=False, regex=True
+            )
+        else:
+            weekly_df['is_gas_20min'] = True  # デフォルトで全て対象
+
         return weekly_df
-        
+
     except Exception as e:
         logger.error(f"週次データ準備エラー: {e}")
         return pd.DataFrame()
@@ -122,54 +464,46 @@ def _prepare_weekly_data(df: pd.DataFrame) -> pd.DataFrame:
 def _calculate_surgery_hours(entry_times, exit_times, surgery_dates) -> pd.Series:
     """入退室時刻から手術時間を計算（深夜跨ぎ対応）"""
     try:
-        hours = pd.Series(0.0, index=entry_times.index)
-        
-        for idx in entry_times.index:
-            try:
-                entry_time = entry_times[idx]
-                exit_time = exit_times[idx]
-                surgery_date = surgery_dates[idx]
-                
-                if pd.isna(entry_time) or pd.isna(exit_time) or pd.isna(surgery_date):
-                    hours[idx] = 2.0  # デフォルト値
-                    continue
-                
-                # 時刻を文字列に変換
-                entry_str = str(entry_time).strip()
-                exit_str = str(exit_time).strip()
-                
-                # 時刻をdatetimeに変換
-                entry_dt = _parse_time_to_datetime(entry_str, surgery_date)
-                exit_dt = _parse_time_to_datetime(exit_str, surgery_date)
-                
-                if not entry_dt or not exit_dt:
-                    hours[idx] = 2.0
-                    continue
-                
-                # 深夜跨ぎの処理
-                if exit_dt < entry_dt:
-                    exit_dt += timedelta(days=1)
-                
-                # 手術時間を時間単位で計算
-                duration = exit_dt - entry_dt
-                hours[idx] = duration.total_seconds() / 3600
-                
-                # 妥当性チェック（0.5時間〜24時間）
-                if not (0.5 <= hours[idx] <= 24):
-                    hours[idx] = 2.0
-                    
-            except Exception:
-                hours[idx] = 2.0
-        
-        return hours
-        
+        entry_minutes = _time_values_to_minutes(entry_times)
+        exit_minutes = _time_values_to_minutes(exit_times)
+
+        # 深夜跨ぎの処理
+        duration = exit_minutes - entry_minutes
+        duration = np.where(duration < 0, duration + 24 * 60, duration)
+
+        # 手術時間を時間単位で計算
+        with np.errstate(invalid='ignore'):
+            hours = duration * 60.0 / 3600
+            # 妥当性チェック（0.5時間〜24時間）、解析不能な時刻はデフォルト値
+            valid = (
+                surgery_dates.notna().to_numpy() &
+                (hours >= 0.5) & (hours <= 24)
+            )
+
+        return pd.Series(np.where(valid, hours, DEFAULT_SURGERY_HOURS), index=entry_times.index)
+
     except Exception as e:
         logger.error(f"手術時間計算エラー: {e}")
-        return pd.Series(2.0, index=entry_times.index)
+        return pd.Series(DEFAULT_SURGERY_HOURS, index=entry_times.index)
+
 
+def _time_values_to_minutes(values: pd.Series) -> np.ndarray:
+    """時刻列を0時からの経過分に変換（解析不能はNaN）"""
+    strings = values.astype(str).str.strip()
+    codes, uniques = pd.factorize(strings)
+
+    # 時刻の種類は高々数千なので、ユニーク値だけを解析して展開する
+    parsed = np.array(
+        [_parse_time_to_minutes(value) for value in uniques] + [None],
+        dtype=float
+    )
+    minutes = parsed[codes]  # 欠損値(code=-1)は末尾のNoneを参照
+    minutes[values.isna().to_numpy()] = np.nan
+    return minutes
 
-def _parse_time_to_datetime(time_str: str, date_obj: pd.Timestamp) -> Optional[datetime]:
-    """時刻文字列をdatetimeに変換"""
+
+def _parse_time_to_minutes(time_str: str) -> Optional[int]:
+    """時刻文字列を0時からの経過分に変換"""
     try:
         if ':' in time_str:
             # HH:MM形式
@@ -177,238 +511,301 @@ def _parse_time_to_datetime(time_str: str, date_obj: pd.Timestamp) -> Optional[d
             if len(parts) >= 2:
                 hour = int(parts[0])
                 minute = int(parts[1])
-                
+
                 if 0 <= hour <= 23 and 0 <= minute <= 59:
-                    return datetime.combine(date_obj.date(), time(hour, minute))
-        
+                    return hour * 60 + minute
+
         elif time_str.isdigit() and len(time_str) == 4:
             # HHMM形式
             hour = int(time_str[:2])
             minute = int(time_str[2:])
-            
+
             if 0 <= hour <= 23 and 0 <= minute <= 59:
-                return datetime.combine(date_obj.date(), time(hour, minute))
-        
+                return hour * 60 + minute
+
         return None
-        
+
     except Exception:
         return None
 
 
-def _calculate_department_score(dept_data: pd.DataFrame, dept_name: str, 
-                               target_dict: Dict[str, float], 
-                               start_date: pd.Timestamp, 
-                               end_date: pd.Timestamp) -> Optional[Dict[str, Any]]:
-    """診療科別スコアを計算"""
-    try:
-        # 週次集計
-        weekly_stats = dept_data.groupby('week_start').agg({
-            'is_gas_20min': 'sum',      # 週次全身麻酔件数
-            '手術実施日_dt': 'count',    # 週次全手術件数  
-            '手術時間_時間': 'sum'       # 週次総手術時間
-        }).rename(columns={
-            'is_gas_20min': 'weekly_gas_cases',
-            '手術実施日_dt': 'weekly_total_cases',
-            '手術時間_時間': 'weekly_total_hours'
-        })
-        
-        if weekly_stats.empty:
-            return None
-        
-        # 基本統計
-        avg_gas_cases = weekly_stats['weekly_gas_cases'].mean()
-        avg_total_cases = weekly_stats['weekly_total_cases'].mean()
-        avg_total_hours = weekly_stats['weekly_total_hours'].mean()
-        
-        # 最新週実績
-        latest_week = weekly_stats.index.max()
-        latest_gas_cases = weekly_stats.loc[latest_week, 'weekly_gas_cases']
-        latest_total_cases = weekly_stats.loc[latest_week, 'weekly_total_cases']
-        latest_total_hours = weekly_stats.loc[latest_week, 'weekly_total_hours']
-        
-        # 目標との比較
-        target_gas_cases = target_dict.get(dept_name, 0)
-        achievement_rate = (latest_gas_cases / target_gas_cases * 100) if target_gas_cases > 0 else 0
-        
-        # スコア計算
-        score_components = _calculate_score_components(
-            weekly_stats, target_gas_cases, achievement_rate,
-            avg_gas_cases, avg_total_cases, avg_total_hours,
-            latest_gas_cases, latest_total_cases, latest_total_hours
-        )
-        
-        total_score = sum(score_components.values())
-        grade = _determine_grade(total_score)
-        
-        # 改善度計算
-        improvement_rate = _calculate_improvement_rate(weekly_stats['weekly_gas_cases'])
-        
-        return {
-            'entity_name': dept_name,
-            'display_name': dept_name,
-            'total_score': round(total_score, 1),
-            'grade': grade,
-            'latest_gas_cases': int(latest_gas_cases),
-            'latest_total_cases': int(latest_total_cases),
-            'latest_total_hours': round(latest_total_hours, 1),
-            'avg_gas_cases': round(avg_gas_cases, 1),
-            'avg_total_cases': round(avg_total_cases, 1),
-            'avg_total_hours': round(avg_total_hours, 1),
-            'target_gas_cases': target_gas_cases,
-            'achievement_rate': round(achievement_rate, 1),
-            'improvement_rate': round(improvement_rate, 1),
-            'score_components': {k: round(v, 1) for k, v in score_components.items()},
-            'latest_achievement_rate': round(achievement_rate, 1),
-            'weekly_data': weekly_stats.to_dict('index')
+def _aggregate_weekly_stats(weekly_df: pd.DataFrame, entity_col: str) -> pd.DataFrame:
+    """エンティティ×週の週次集計（エンティティ・週の昇順）"""
+    return weekly_df.groupby([entity_col, 'week_start']).agg(
+        weekly_gas_cases=('is_gas_20min', 'sum'),        # 週次全身麻酔件数
+        weekly_total_cases=('手術実施日_dt', 'count'),    # 週次全手術件数
+        weekly_total_hours=('手術時間_時間', 'sum'),      # 週次総手術時間
+    )
+
+
+def _score_entities(weekly_df: pd.DataFrame, entity_col: str,
+                    target_dict: Dict[str, float], default_target: float = 0) -> List[Dict[str, Any]]:
+    """
+    全エンティティ（診療科など）のスコアを一括計算
+
+    週次集計をエンティティ×週の行列に展開し、各スコア要素を配列演算で求める。
+    実績のある週だけを左詰めした行列を週数ごとに作るため、
+    エンティティ単位で計算した場合と同じ値になる。
+    """
+    entities = weekly_df[entity_col].dropna().unique()
+    record_counts = weekly_df[entity_col].value_counts()
+    eligible = [e for e in entities if record_counts.get(e, 0) >= MIN_ENTITY_RECORDS]  # 最小データ数チェック
+    if not eligible:
+        return []
+
+    weekly_stats = _aggregate_weekly_stats(weekly_df, entity_col)
+    entity_index = weekly_stats.index.get_level_values(0)
+    weekly_stats = weekly_stats[entity_index.isin(eligible)]
+    entity_index = weekly_stats.index.get_level_values(0)
+    week_index = weekly_stats.index.get_level_values(1)
+
+    week_counts = weekly_stats.groupby(level=0)['weekly_gas_cases'].transform('size').to_numpy()
+
+    scores_by_entity: Dict[Any, Dict[str, Any]] = {}
+    for n_weeks in np.unique(week_counts):
+        in_block = week_counts == n_weeks
+        block = weekly_stats[in_block]
+        block_entities = entity_index[in_block][::n_weeks]
+        block_weeks = week_index[in_block].to_numpy().reshape(-1, n_weeks)
+
+        gas = block['weekly_gas_cases'].to_numpy().reshape(-1, n_weeks)
+        total = block['weekly_total_cases'].to_numpy().reshape(-1, n_weeks)
+        hours = block['weekly_total_hours'].to_numpy().reshape(-1, n_weeks)
+        targets = [target_dict.get(entity, default_target) for entity in block_entities]
+
+        metrics = _calculate_score_matrix(gas, total, hours, targets)
+
+        for i, entity in enumerate(block_entities):
+            scores_by_entity[entity] = _build_score_record(
+                entity, targets[i], {key: values[i] for key, values in metrics.items()},
+                block_weeks[i], gas[i], total[i], hours[i]
+            )
+
+    # スコア順でソート（同点は出現順）
+    entity_scores = [scores_by_entity[e] for e in eligible if e in scores_by_entity]
+    return sorted(entity_scores, key=lambda x: x['total_score'], reverse=True)
+
+
+def _build_score_record(entity: Any, target: float, metrics: Dict[str, Any],
+                        weeks: np.ndarray, gas: np.ndarray, total: np.ndarray,
+                        hours: np.ndarray) -> Dict[str, Any]:
+    """1エンティティ分のスコア結果を辞書化"""
+    score_components = {
+        'gas_surgery_score': metrics['gas_surgery_score'],
+        'total_cases_score': metrics['total_cases_score'],
+        'total_hours_score': metrics['total_hours_score'],
+    }
+    weekly_data = {
+        pd.Timestamp(week): {
+            'weekly_gas_cases': gas_value.item(),
+            'weekly_total_cases': total_value.item(),
+            'weekly_total_hours': hours_value.item(),
         }
-        
-    except Exception as e:
-        logger.error(f"診療科 {dept_name} のスコア計算エラー: {e}")
-        return None
+        for week, gas_value, total_value, hours_value in zip(weeks, gas, total, hours)
+    }
+
+    return {
+        'entity_name': entity,
+        'display_name': entity,
+        'total_score': float(round(metrics['total_score'], 1)),
+        'grade': _determine_grade(metrics['total_score']),
+        'latest_gas_cases': int(gas[-1]),
+        'latest_total_cases': int(total[-1]),
+        'latest_total_hours': float(round(hours[-1], 1)),
+        'avg_gas_cases': float(round(metrics['avg_gas_cases'], 1)),
+        'avg_total_cases': float(round(metrics['avg_total_cases'], 1)),
+        'avg_total_hours': float(round(metrics['avg_total_hours'], 1)),
+        'target_gas_cases': target,
+        'achievement_rate': float(round(metrics['achievement_rate'], 1)),
+        'improvement_rate': float(round(metrics['improvement_rate'], 1)),
+        'score_components': {k: float(round(v, 1)) for k, v in score_components.items()},
+        'latest_achievement_rate': float(round(metrics['achievement_rate'], 1)),
+        'weekly_data': weekly_data
+    }
+
+
+def _calculate_score_matrix(gas: np.ndarray, total: np.ndarray, hours: np.ndarray,
+                            targets: List[float]) -> Dict[str, np.ndarray]:
+    """
+    週次行列（エンティティ×週、全列が実績週）からスコア要素を一括計算
+
+    Returns:
+        各指標の配列（行 = エンティティ）
+    """
+    gas = gas.astype(np.float64)
+    total = total.astype(np.float64)
+    hours = hours.astype(np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+
+    # 基本統計
+    avg_gas_cases = _row_mean(gas)
+    avg_total_cases = _row_mean(total)
+    avg_total_hours = _row_mean(hours)
 
+    # 直近週実績
+    latest_gas_cases = gas[:, -1]
+    latest_total_cases = total[:, -1]
+    latest_total_hours = hours[:, -1]
+
+    # 目標との比較
+    with np.errstate(divide='ignore', invalid='ignore'):
+        achievement_rate = np.where(targets > 0, latest_gas_cases / targets * 100, 0.0)
+
+    improvement_rate = _calculate_improvement_rates(gas)
 
-def _calculate_score_components(weekly_stats: pd.DataFrame, target_gas_cases: float,
-                               achievement_rate: float, avg_gas_cases: float,
-                               avg_total_cases: float, avg_total_hours: float,
-                               latest_gas_cases: float, latest_total_cases: float,
-                               latest_total_hours: float) -> Dict[str, float]:
-    """スコア構成要素を計算"""
-    
     # 1. 全身麻酔手術件数評価 (70点満点)
-    gas_score = _calculate_gas_surgery_score(
-        weekly_stats['weekly_gas_cases'], target_gas_cases, achievement_rate
-    )
-    
+    gas_score = _calculate_gas_surgery_scores(gas, achievement_rate, improvement_rate)
+
     # 2. 全手術件数評価 (15点満点)
-    total_cases_score = _calculate_total_cases_score(
-        latest_total_cases, avg_total_cases
-    )
-    
+    total_cases_score = _calculate_total_cases_scores(latest_total_cases, avg_total_cases)
+
     # 3. 総手術時間評価 (15点満点)
-    total_hours_score = _calculate_total_hours_score(
-        latest_total_hours, avg_total_hours
-    )
-    
+    total_hours_score = _calculate_total_hours_scores(latest_total_hours, avg_total_hours)
+
     return {
+        'total_score': gas_score + total_cases_score + total_hours_score,
         'gas_surgery_score': gas_score,
         'total_cases_score': total_cases_score,
-        'total_hours_score': total_hours_score
+        'total_hours_score': total_hours_score,
+        'avg_gas_cases': avg_gas_cases,
+        'avg_total_cases': avg_total_cases,
+        'avg_total_hours': avg_total_hours,
+        'achievement_rate': achievement_rate,
+        'improvement_rate': improvement_rate,
     }
 
 
-def _calculate_gas_surgery_score(weekly_gas_cases: pd.Series, target: float, 
-                                achievement_rate: float) -> float:
+def _calculate_gas_surgery_scores(gas: np.ndarray, achievement_rate: np.ndarray,
+                                  improvement_rate: np.ndarray) -> np.ndarray:
     """全身麻酔手術件数スコア (70点満点)"""
-    
+
     # 直近週達成度 (30点)
-    if achievement_rate >= 110:
-        achievement_score = 30
-    elif achievement_rate >= 100:
-        achievement_score = 25
-    elif achievement_rate >= 90:
-        achievement_score = 20
-    elif achievement_rate >= 80:
-        achievement_score = 15
-    else:
-        achievement_score = max(0, achievement_rate / 80 * 15)
-    
+    achievement_score = np.select(
+        [achievement_rate >= 110, achievement_rate >= 100,
+         achievement_rate >= 90, achievement_rate >= 80],
+        [30.0, 25.0, 20.0, 15.0],
+        default=_non_negative(achievement_rate / 80 * 15)
+    )
+
     # 改善度 (20点)
-    improvement_rate = _calculate_improvement_rate(weekly_gas_cases)
-    if improvement_rate >= 15:
-        improvement_score = 20
-    elif improvement_rate >= 10:
-        improvement_score = 15
-    elif improvement_rate >= 5:
-        improvement_score = 10
-    elif improvement_rate >= 0:
-        improvement_score = 8
-    else:
-        improvement_score = max(0, 8 + improvement_rate * 0.4)
-    
+    improvement_score = np.select(
+        [improvement_rate >= 15, improvement_rate >= 10,
+         improvement_rate >= 5, improvement_rate >= 0],
+        [20.0, 15.0, 10.0, 8.0],
+        default=_non_negative(8 + improvement_rate * 0.4)
+    )
+
     # 安定性 (15点) - 変動係数
-    variation_coeff = weekly_gas_cases.std() / weekly_gas_cases.mean() if weekly_gas_cases.mean() > 0 else 1
-    if variation_coeff <= 0.2:
-        stability_score = 15
-    elif variation_coeff <= 0.4:
-        stability_score = 12
-    elif variation_coeff <= 0.6:
-        stability_score = 8
-    else:
-        stability_score = max(0, 15 - variation_coeff * 10)
-    
+    mean = _row_mean(gas)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variation_coeff = np.where(mean > 0, _row_std(gas) / mean, 1.0)
+    stability_score = np.select(
+        [variation_coeff <= 0.2, variation_coeff <= 0.4, variation_coeff <= 0.6],
+        [15.0, 12.0, 8.0],
+        default=_non_negative(15 - variation_coeff * 10)
+    )
+
     # 持続性 (5点) - トレンド
-    trend_score = _calculate_trend_score(weekly_gas_cases, 5)
-    
+    trend_score = _calculate_trend_scores(gas, 5)
+
     return achievement_score + improvement_score + stability_score + trend_score
 
 
-def _calculate_total_cases_score(latest: float, avg: float) -> float:
+def _calculate_total_cases_scores(latest: np.ndarray, avg: np.ndarray) -> np.ndarray:
     """全手術件数スコア (15点満点)"""
     # ランキング基準 (10点) + 改善度 (5点)
-    improvement_rate = ((latest - avg) / avg * 100) if avg > 0 else 0
-    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        improvement_rate = np.where(avg > 0, (latest - avg) / avg * 100, 0.0)
+
     # 改善度評価
-    if improvement_rate >= 10:
-        improvement_score = 5
-    elif improvement_rate >= 5:
-        improvement_score = 4
-    elif improvement_rate >= 0:
-        improvement_score = 3
-    else:
-        improvement_score = max(0, 3 + improvement_rate * 0.2)
-    
+    improvement_score = np.select(
+        [improvement_rate >= 10, improvement_rate >= 5, improvement_rate >= 0],
+        [5.0, 4.0, 3.0],
+        default=_non_negative(3 + improvement_rate * 0.2)
+    )
+
     # ランキング評価（仮実装 - 実際は全診療科との比較が必要）
-    ranking_score = min(10, latest / 20 * 10) if latest > 0 else 0
-    
+    ranking_score = np.where(latest > 0, np.minimum(latest / 20 * 10, 10), 0.0)
+
     return ranking_score + improvement_score
 
 
-def _calculate_total_hours_score(latest: float, avg: float) -> float:
+def _calculate_total_hours_scores(latest: np.ndarray, avg: np.ndarray) -> np.ndarray:
     """総手術時間スコア (15点満点)"""
     # 全手術件数と同じロジック
-    return _calculate_total_cases_score(latest, avg)
+    return _calculate_total_cases_scores(latest, avg)
 
 
-def _calculate_improvement_rate(series: pd.Series) -> float:
-    """改善率を計算"""
-    try:
-        if len(series) < 2:
-            return 0
-        
-        # 後半と前半の平均を比較
-        mid_point = len(series) // 2
-        recent_avg = series.iloc[mid_point:].mean()
-        early_avg = series.iloc[:mid_point].mean()
-        
-        if early_avg > 0:
-            return (recent_avg - early_avg) / early_avg * 100
-        else:
-            return 0
-            
-    except Exception:
-        return 0
+def _calculate_improvement_rates(values: np.ndarray) -> np.ndarray:
+    """改善率を計算（後半と前半の平均を比較）"""
+    n_weeks = values.shape[1]
+    if n_weeks < 2:
+        return np.zeros(values.shape[0])
 
+    mid_point = n_weeks // 2
+    recent_avg = _row_mean(values[:, mid_point:])
+    early_avg = _row_mean(values[:, :mid_point])
 
-def _calculate_trend_score(series: pd.Series, max_score: float) -> float:
-    """トレンドスコアを計算"""
-    try:
-        if len(series) < 3:
-            return max_score / 2
-        
-        # 線形回帰の傾き
-        x = np.arange(len(series))
-        slope, _ = np.polyfit(x, series, 1)
-        
-        # 正の傾きを評価
-        if slope > 0:
-            return max_score
-        elif slope >= -0.5:
-            return max_score * 0.7
-        else:
-            return max_score * 0.3
-            
-    except Exception:
-        return max_score / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(early_avg > 0, (recent_avg - early_avg) / early_avg * 100, 0.0)
+
+
+def _calculate_trend_scores(values: np.ndarray, max_score: float) -> np.ndarray:
+    """トレンドスコアを計算（values は週次件数）"""
+    n_rows, n_weeks = values.shape
+    if n_weeks < 3:
+        return np.full(n_rows, max_score / 2)
+
+    # 線形回帰の傾きの符号を整数演算で判定（傾き = numerator / denominator）
+    x = np.arange(n_weeks)
+    counts = np.rint(values).astype(np.int64)
+    numerator = n_weeks * (counts * x).sum(axis=1) - x.sum() * counts.sum(axis=1)
+    denominator = n_weeks * (x * x).sum() - x.sum() ** 2
+
+    # 正の傾きを評価
+    scores = np.select(
+        [numerator > 0, 2 * numerator >= -denominator],
+        [max_score, max_score * 0.7],
+        default=max_score * 0.3
+    )
+
+    # 傾きがちょうど境界値の場合は浮動小数点誤差で判定が決まるため、
+    # 従来どおり polyfit の結果で判定する
+    on_boundary = (numerator == 0) | (2 * numerator == -denominator)
+    for row in np.flatnonzero(on_boundary):
+        slope, _ = np.polyfit(x, values[row], 1)
+        scores[row] = _trend_score_from_slope(slope, max_score)
+
+    return scores
+
+
+def _trend_score_from_slope(slope: float, max_score: float) -> float:
+    """回帰直線の傾きからトレンドスコアを判定"""
+    if slope > 0:
+        return max_score
+    elif slope >= -0.5:
+        return max_score * 0.7
+    else:
+        return max_score * 0.3
+
+
+def _row_mean(values: np.ndarray) -> np.ndarray:
+    """行ごとの平均（pandasのmeanと同じ計算順序）"""
+    return values.sum(axis=1) / values.shape[1]
+
+
+def _row_std(values: np.ndarray) -> np.ndarray:
+    """行ごとの標本標準偏差（ddof=1、1週のみの場合はNaN）"""
+    n_weeks = values.shape[1]
+    if n_weeks <= 1:
+        return np.full(values.shape[0], np.nan)
+    avg = _row_mean(values)[:, np.newaxis]
+    return np.sqrt(((avg - values) ** 2).sum(axis=1) / (n_weeks - 1))
+
+
+def _non_negative(values: np.ndarray) -> np.ndarray:
+    """負値とNaNを0に丸める"""
+    return np.where(values > 0, values, 0.0)
 
 
 def _determine_grade(total_score: float) -> str:
@@ -433,14 +830,7 @@ def _get_period_dates(df: pd.DataFrame, period: str) -> Tuple[Optional[pd.Timest
         
         latest_date = df['手術実施日_dt'].max()
         
-        if period == "直近4週":
-            weeks = 4
-        elif period == "直近8週": 
-            weeks = 8
-        elif period == "直近12週":
-            weeks = 12
-        else:
-            weeks = 12  # デフォルト
+        weeks = PERIOD_WEEKS.get(period, 12)  # デフォルト: 12週
         
         # 最新日付から遡って期間を設定
         start_date = latest_date - pd.Timedelta(weeks=weeks) + pd.Timedelta(days=1)
@@ -1,6 +1,8 @@
 # analysis/weekly.py (修正版)
 import pandas as pd
 import numpy as np
+from data_processing import analytic_store
+from utils.perf_metrics import timed
 
 def get_analysis_end_date(latest_date):
     """分析の最終日（最新の完全な週の最終日曜日）を計算する"""
@@ -13,6 +15,7 @@ def get_analysis_end_date(latest_date):
     else:
         return latest_date - pd.to_timedelta(latest_date.dayofweek + 1, unit='d')
 
+@timed()
 def get_summary(df, department=None, use_complete_weeks=True):
     """
     週単位でのサマリーを計算する。
@@ -20,16 +23,25 @@ def get_summary(df, department=None, use_complete_weeks=True):
     if df.empty:
         return pd.DataFrame()
 
+    analysis_end_date = get_analysis_end_date(df['手術実施日_dt'].max()) if use_complete_weeks else None
+
+    # 分析用SQLストアが同じデータから作られていれば集計をSQLで行う
+    if analytic_store.is_active_for(df):
+        summary = analytic_store.aggregate_cases(
+            ['week_start'], metrics=('件数', '平日件数', '実データ平日数'),
+            end_date=analysis_end_date, departments=[department] if department else None
+        ).rename(columns={'件数': '週合計件数'})
+        if summary.empty:
+            return pd.DataFrame()
+        return _finalize_summary(summary)
+
     target_df = df[df['is_gas_20min']].copy()
 
     if department:
         target_df = target_df[target_df['実施診療科'] == department]
 
-    if use_complete_weeks:
-        latest_date = df['手術実施日_dt'].max()
-        analysis_end_date = get_analysis_end_date(latest_date)
-        if analysis_end_date:
-            target_df = target_df[target_df['手術実施日_dt'] <= analysis_end_date]
+    if analysis_end_date:
+        target_df = target_df[target_df['手術実施日_dt'] <= analysis_end_date]
     
     if target_df.empty:
         return pd.DataFrame()
@@ -47,6 +59,11 @@ def get_summary(df, department=None, use_complete_weeks=True):
         summary['平日件数'] = 0
         summary['実データ平日数'] = 0
 
+    return _finalize_summary(summary)
+
+
+def _finalize_summary(summary):
+    """週別件数から平日1日平均を計算し、表示用の列名・列順にする"""
     summary.fillna(0, inplace=True)
     summary[['平日件数', '実データ平日数']] = summary[['平日件数', '実データ平日数']].astype(int)
 
@@ -0,0 +1,196 @@
+# analysis/weekly_forecast.py
+"""
+週次予測モジュール
+祝日・年末年始を考慮した営業日数で週次件数を正規化し、全診療科をまとめて予測する
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import math
+from typing import Dict, List, Optional
+
+from analysis import fast_forecast, weekly
+from analysis.forecasting import HOSPITAL_LABEL, INTERVAL_Z
+from utils import date_helpers
+
+# scipy があれば正規分布の累積分布関数に使う
+try:
+    from scipy.special import ndtr
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 週次予測に必要な最小の完全週数
+MIN_HISTORY_WEEKS = 12
+
+# 学習に使う直近の週数
+DEFAULT_HISTORY_WEEKS = 104
+
+# 予測する週数の既定値（夜間事前計算もこの週数で作成する）
+DEFAULT_HORIZON_WEEKS = 12
+
+
+def forecast_weekly(df: pd.DataFrame, target_dict: Optional[Dict[str, float]] = None,
+                    departments: Optional[List[str]] = None, horizon_weeks: int = DEFAULT_HORIZON_WEEKS,
+                    history_weeks: int = DEFAULT_HISTORY_WEEKS) -> pd.DataFrame:
+    """
+    病院全体と各診療科の週合計件数（全身麻酔20分以上）を予測する
+
+    各週の件数を営業日数（土日祝・年末年始を除く）で割った「営業日あたり件数」を
+    全対象の2次元配列として減衰トレンド付き指数平滑法でまとめて予測し、
+    将来週の営業日数を掛けて週合計件数に戻す。目標値（週合計）がある診療科は
+    目標との差と達成確率（正規近似）も求める。
+
+    Args:
+        df: 手術データ
+        target_dict: 診療科別目標値辞書（週合計）
+        departments: 対象診療科（省略時は目標設定済みの診療科、目標がなければ全診療科）
+        horizon_weeks: 予測する週数
+        history_weeks: 学習に使う直近の完全週数
+
+    Returns:
+        (対象, 週, 営業日数, 営業日あたり件数, 予測件数, 下限, 上限, 目標, 不足見込み, 達成確率)
+    """
+    columns = ['対象', '週', '営業日数', '営業日あたり件数', '予測件数', '下限', '上限',
+               '目標', '不足見込み', '達成確率']
+    try:
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+
+        target_dict = target_dict or {}
+        if departments is None:
+            departments = list(target_dict) or sorted(df['実施診療科'].dropna().unique())
+
+        counts, week_axis = _weekly_count_matrix(df, departments, history_weeks)
+        if len(week_axis) < MIN_HISTORY_WEEKS:
+            logger.warning(f"週次予測には最低{MIN_HISTORY_WEEKS}週分のデータが必要です")
+            return pd.DataFrame(columns=columns)
+
+        labels = [HOSPITAL_LABEL] + list(departments)
+
+        # 営業日あたり件数（営業日のない週は直前の週の値で補完）
+        history_days = date_helpers.count_business_days_per_week(week_axis)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(history_days > 0, counts / history_days, np.nan)
+        rates = pd.DataFrame(rates).ffill(axis=1).bfill(axis=1).fillna(0).to_numpy()
+
+        # トレンドなし／減衰トレンドの両方を当てはめ、対象ごとにAICの小さい方を採用
+        fitted = _select_by_aic(
+            fast_forecast.holt_winters_forecast(rates, horizon_weeks, trend=False, seasonal=False),
+            fast_forecast.holt_winters_forecast(rates, horizon_weeks, trend=True, damped=True, seasonal=False),
+        )
+        rate_forecast = np.maximum(fitted['forecast'], 0)
+
+        future_weeks = pd.date_range(week_axis[-1] + pd.Timedelta(weeks=1), periods=horizon_weeks, freq='7D')
+        future_days = date_helpers.count_business_days_per_week(future_weeks)
+        forecast = rate_forecast * future_days
+        # h週先の予測誤差分散は 1 + (h-1)α² 倍（単純指数平滑の近似）
+        steps_ahead = np.arange(horizon_weeks)[np.newaxis, :]
+        sd = fitted['sigma'][:, np.newaxis] * np.sqrt(1 + steps_ahead * fitted['alpha'][:, np.newaxis] ** 2) * future_days
+        spread = INTERVAL_Z * sd
+
+        targets = np.array([np.nan] + [target_dict.get(dept, np.nan) for dept in departments], dtype=float)
+        target_grid = np.repeat(targets[:, np.newaxis], horizon_weeks, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(sd > 0, (forecast - target_grid) / sd, np.where(forecast >= target_grid, np.inf, -np.inf))
+        probability = np.where(np.isnan(target_grid), np.nan, _normal_cdf(z) * 100)
+
+        n_targets = len(labels)
+        result = pd.DataFrame({
+            '対象': np.repeat(labels, horizon_weeks),
+            '週': np.tile(future_weeks, n_targets),
+            '営業日数': np.tile(future_days, n_targets),
+            '営業日あたり件数': rate_forecast.ravel(),
+            '予測件数': forecast.ravel(),
+            '下限': np.maximum(forecast - spread, 0).ravel(),
+            '上限': (forecast + spread).ravel(),
+            '目標': target_grid.ravel(),
+            '不足見込み': np.maximum(target_grid - forecast, 0).ravel(),
+            '達成確率': probability.ravel(),
+        })
+        logger.info(f"週次予測完了: {n_targets}対象 × {horizon_weeks}週")
+        return result[columns]
+
+    except Exception as e:
+        logger.error(f"週次予測エラー: {e}")
+        return pd.DataFrame(columns=columns)
+
+
+def summarize_weekly_shortfalls(forecast_df: pd.DataFrame, probability_threshold: float = 50.0) -> pd.DataFrame:
+    """
+    目標未達が見込まれる週を診療科ごとに集計する
+
+    Args:
+        forecast_df: forecast_weekly の結果
+        probability_threshold: この達成確率(%)を下回る週を未達見込みとする
+
+    Returns:
+        (対象, 目標, 予測平均, 未達見込み週数, 最初の未達見込み週, 不足見込み合計, 平均達成確率)
+    """
+    targeted = forecast_df.dropna(subset=['目標'])
+    if targeted.empty:
+        return pd.DataFrame()
+
+    at_risk = targeted['達成確率'] < probability_threshold
+    summary = targeted.assign(未達見込み=at_risk, 未達週=targeted['週'].where(at_risk)).groupby('対象', sort=False).agg(
+        目標=('目標', 'first'),
+        予測平均=('予測件数', 'mean'),
+        未達見込み週数=('未達見込み', 'sum'),
+        最初の未達見込み週=('未達週', 'min'),
+        不足見込み合計=('不足見込み', 'sum'),
+        平均達成確率=('達成確率', 'mean'),
+    ).reset_index()
+    numeric_cols = ['目標', '予測平均', '不足見込み合計', '平均達成確率']
+    summary[numeric_cols] = summary[numeric_cols].round(1)
+    return summary.sort_values(['未達見込み週数', '平均達成確率'], ascending=[False, True]).reset_index(drop=True)
+
+
+def _weekly_count_matrix(df: pd.DataFrame, departments: List[str], history_weeks: int):
+    """
+    病院全体＋各診療科の完全週の週合計件数を (対象, 週) の行列にする
+
+    Returns:
+        (件数行列, 週の開始日)
+    """
+    target_df = df[df['is_gas_20min']]
+    analysis_end_date = weekly.get_analysis_end_date(df['手術実施日_dt'].max())
+    if analysis_end_date is not None:
+        target_df = target_df[target_df['手術実施日_dt'] <= analysis_end_date]
+    if target_df.empty:
+        return np.zeros((len(departments) + 1, 0)), pd.DatetimeIndex([])
+
+    week_start = target_df['手術実施日_dt'].dt.normalize() - pd.to_timedelta(
+        target_df['手術実施日_dt'].dt.dayofweek, unit='D')
+    last_week = week_start.max()
+    first_week = max(week_start.min(), last_week - pd.Timedelta(weeks=history_weeks - 1))
+    week_axis = pd.date_range(first_week, last_week, freq='7D')
+
+    by_department = (
+        target_df.groupby([target_df['実施診療科'], week_start]).size()
+        .unstack(fill_value=0)
+        .reindex(index=departments, columns=week_axis, fill_value=0)
+    )
+    total = week_start.value_counts().reindex(week_axis, fill_value=0)
+    counts = np.vstack([total.to_numpy(dtype=float), by_department.to_numpy(dtype=float)])
+    return counts, week_axis
+
+
+def _select_by_aic(level_fit: Dict[str, np.ndarray], trend_fit: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """2つの当てはめ結果から系列ごとにAICの小さい方を選ぶ"""
+    use_trend = trend_fit['aic'] < level_fit['aic']
+    return {
+        key: np.where(use_trend[:, np.newaxis] if level_fit[key].ndim == 2 else use_trend,
+                      trend_fit[key], level_fit[key])
+        for key in ('forecast', 'sigma', 'alpha')
+    }
+
+
+def _normal_cdf(z: np.ndarray) -> np.ndarray:
+    """標準正規分布の累積分布関数（配列対応）"""
+    z = np.asarray(z, dtype=float)
+    if SCIPY_AVAILABLE:
+        return ndtr(z)
+    return 0.5 * (1 + np.frompyfunc(math.erf, 1, 1)(z / np.sqrt(2)).astype(float))
@@ -3,24 +3,183 @@
 import pickle
 import os
 import pandas as pd
-import streamlit as st
 from datetime import datetime
 import json
 import shutil  # 標準ライブラリ
 import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path  # 標準ライブラリ（pathlib2不要）
 
+from data_processing import analytic_store, backup_store
+from utils.cache import get_data_version, set_data_version, streamlit_runtime_active
+from utils.file_utils import COPY_BUFFER_SIZE, atomic_copy, atomic_write, file_lock
+
+# Streamlit は任意（夜間バッチなど Streamlit 外からも保存・読み込みできるようにする）
+try:
+    import streamlit as st
+    STREAMLIT_AVAILABLE = True
+except ImportError:
+    STREAMLIT_AVAILABLE = False
+
 # ===== 設定 =====
 DATA_DIR = "saved_data"
 MAIN_DATA_FILE = os.path.join(DATA_DIR, "main_data.pkl")
 METADATA_FILE = os.path.join(DATA_DIR, "metadata.json")
 SETTINGS_FILE = os.path.join(DATA_DIR, "settings.json")
 BACKUP_DIR = os.path.join(DATA_DIR, "backup")
+MANIFEST_FILE = os.path.join(DATA_DIR, "manifest.json")
+LOCK_FILE = os.path.join(DATA_DIR, ".lock")
+
+# 他のプロセスの書き込み完了を待つ最大秒数
+LOCK_TIMEOUT = 120
 
 # ロギング設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 保存処理の排他（スレッド間はこのロック、プロセス間は LOCK_FILE で排他する）
+_SAVE_LOCK = threading.RLock()
+
+# 書き込みロックの保持状態（同じスレッド内での入れ子を許すため）
+_LOCK_STATE = {'owner': None, 'depth': 0}
+
+# マニフェストの読み込みキャッシュ {(更新時刻, サイズ): 内容}
+_MANIFEST_CACHE: dict = {}
+
+# このセッションが最後に読み込んだ・保存した保存データ {'store_version', 'data_version'}（セッション状態のキー）
+SESSION_STORE_KEY = 'saved_store_version'
+# このセッションが依頼したバックグラウンド保存のジョブID（セッション状態のキー）
+SESSION_SAVE_JOB_KEY = 'pending_save_job'
+
+# 完了したバックグラウンド保存の結果 {ジョブID: (store_version, data_version)}
+_SAVE_RESULTS: "OrderedDict[int, tuple]" = OrderedDict()
+_SAVE_RESULTS_SIZE = 32
+
+# バックグラウンド保存用の書き込みスレッド（1本で順番に処理）
+_SAVE_EXECUTOR: "ThreadPoolExecutor | None" = None
+
+# 最新のバックグラウンド保存の状態
+_SAVE_STATUS = {'job_id': 0, 'state': 'idle', 'started_at': None, 'finished_at': None,
+                'rows': 0, 'error': None}
+_SAVE_STATUS_LOCK = threading.Lock()
+
+# データバージョンごとのメタデータ統計（同じデータの再保存では再計算しない）
+_STATISTICS_CACHE: "OrderedDict[str, dict]" = OrderedDict()
+_STATISTICS_CACHE_SIZE = 4
+
+def _session_available():
+    """Streamlit のセッション状態・画面表示を使えるか（Streamlit 実行中のみ True）"""
+    return STREAMLIT_AVAILABLE and streamlit_runtime_active()
+
+@contextmanager
+def _write_lock():
+    """保存データの書き込みロック（他のスレッド・プロセスの書き込みと読み込みを待たせる。入れ子可）"""
+    with _SAVE_LOCK:
+        if _LOCK_STATE['depth'] > 0:
+            _LOCK_STATE['depth'] += 1
+            try:
+                yield
+            finally:
+                _LOCK_STATE['depth'] -= 1
+            return
+
+        if not ensure_data_directory():
+            raise OSError(f"データディレクトリを作成できません: {DATA_DIR}")
+        with file_lock(LOCK_FILE, timeout=LOCK_TIMEOUT):
+            _LOCK_STATE.update(owner=threading.get_ident(), depth=1)
+            try:
+                yield
+            finally:
+                _LOCK_STATE.update(owner=None, depth=0)
+
+@contextmanager
+def _read_lock():
+    """保存データの読み込みロック（データとメタデータの組を書き込み途中の状態で読まない）"""
+    if _LOCK_STATE['owner'] == threading.get_ident() or not os.path.isdir(DATA_DIR):
+        # 書き込みロックを持つスレッド自身の読み込み、またはデータ未保存
+        yield
+        return
+    with file_lock(LOCK_FILE, shared=True, timeout=LOCK_TIMEOUT):
+        yield
+
+def get_store_manifest():
+    """保存データのマニフェスト（バージョン・データバージョン・スナップショットID）、未保存は空の辞書
+
+    ファイルの更新時刻が変わらない間はキャッシュを返すため、画面の再描画ごとに呼んでもよい。
+    """
+    try:
+        stat = os.stat(MANIFEST_FILE)
+    except OSError:
+        return {}
+    cache_key = (stat.st_mtime_ns, stat.st_size)
+    if cache_key not in _MANIFEST_CACHE:
+        try:
+            with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"マニフェスト読み込みエラー: {e}")
+            return {}
+        _MANIFEST_CACHE.clear()
+        _MANIFEST_CACHE[cache_key] = manifest
+    return dict(_MANIFEST_CACHE[cache_key])
+
+def get_store_version():
+    """保存データのバージョン（保存・復元・インポートのたびに1ずつ増える。未保存は0）"""
+    return get_store_manifest().get('version', 0)
+
+def is_saved_data_newer(df):
+    """保存データが、このセッションで読み込んだ・保存した後に他の端末・プロセスで更新されているか
+
+    セッションのデータが読み込んだ・保存したものから変わっている場合（未保存のアップロード、
+    保存に失敗したデータなど）は、再読み込みで失われるため対象外とする。
+    """
+    if df is None or not _session_available():
+        return False
+    _collect_session_save_result()
+    session_store = st.session_state.get(SESSION_STORE_KEY)
+    if not session_store or session_store['data_version'] != get_data_version(df):
+        return False
+    manifest = get_store_manifest()
+    if manifest.get('data_version') is None:
+        return False
+    return manifest.get('version', 0) > session_store['store_version']
+
+def _remember_session_store(store_version, data_version):
+    """このセッションが読み込んだ・保存した保存データのバージョンを記録（Streamlit実行中のみ）"""
+    if _session_available():
+        st.session_state[SESSION_STORE_KEY] = {'store_version': store_version, 'data_version': data_version}
+
+def _collect_session_save_result():
+    """このセッションのバックグラウンド保存が完了していれば、保存したバージョンを記録"""
+    job_id = st.session_state.get(SESSION_SAVE_JOB_KEY)
+    if job_id is None:
+        return
+    with _SAVE_STATUS_LOCK:
+        result = _SAVE_RESULTS.get(job_id)
+    if result is not None:
+        _remember_session_store(*result)
+        del st.session_state[SESSION_SAVE_JOB_KEY]
+
+def _next_store_version():
+    """次の保存データバージョン（書き込みロック中に呼ぶ）"""
+    _MANIFEST_CACHE.clear()
+    return get_store_version() + 1
+
+def _write_store_manifest(version, data_version, snapshot_id=None):
+    """データとメタデータの書き込み完了後にマニフェストを更新（書き込みロック中に呼ぶ）"""
+    manifest = {
+        'version': version,
+        'updated_at': datetime.now().isoformat(),
+        'data_version': data_version,
+        'snapshot_id': snapshot_id,
+        'writer_pid': os.getpid(),
+    }
+    data = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+    atomic_write(MANIFEST_FILE, lambda f: f.write(data))
+
 def ensure_data_directory():
     """データディレクトリの存在確認・作成"""
     try:
@@ -32,13 +191,16 @@ def ensure_data_directory():
             logger.info(f"バックアップディレクトリを作成: {BACKUP_DIR}")
         return True
     except Exception as e:
-        if 'st' in globals():
+        if _session_available():
             st.error(f"ディレクトリ作成エラー: {e}")
         logger.error(f"ディレクトリ作成エラー: {e}")
         return False
 
 def create_backup(force_create=False):
-    """現在のデータのバックアップを作成
+    """現在のデータのバックアップ（差分スナップショット）を作成
+
+    通常の保存では保存時にスナップショットを作成済みのため、ここでは何もしない。
+    旧形式で保存されたデータやインポートしたデータは読み込んでスナップショットにする。
     
     Args:
         force_create (bool): Trueの場合、ファイルが存在しなくてもエラーにしない
@@ -46,156 +208,240 @@ def create_backup(force_create=False):
     try:
         if not os.path.exists(MAIN_DATA_FILE):
             if force_create:
-                # 現在のセッションデータからバックアップを作成
-                if hasattr(st, 'session_state') and st.session_state.get('processed_df') is not None:
+                # 現在のセッションデータからバックアップを作成（保存時にスナップショットも作成される）
+                if _session_available() and st.session_state.get('processed_df') is not None:
                     df = st.session_state.get('processed_df')
                     target_data = st.session_state.get('target_dict')
                     if df is not None and not df.empty:
-                        # 一時的にファイルに保存してからバックアップ
-                        temp_success = save_data_to_file(df, target_data)
-                        if not temp_success:
-                            return False
-                    else:
-                        return False
-                else:
-                    return False
-            else:
-                return False
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = os.path.join(BACKUP_DIR, f"main_data_backup_{timestamp}.pkl")
-        shutil.copy2(MAIN_DATA_FILE, backup_file)
-        
-        # メタデータファイルもバックアップ
-        if os.path.exists(METADATA_FILE):
-            backup_metadata_file = os.path.join(BACKUP_DIR, f"metadata_backup_{timestamp}.json")
-            shutil.copy2(METADATA_FILE, backup_metadata_file)
-        
-        # 古いバックアップファイルを削除（最新10個まで保持）
-        backup_files = [f for f in os.listdir(BACKUP_DIR) if f.startswith("main_data_backup_")]
-        backup_files.sort(reverse=True)
+                        return save_data_to_file(df, target_data)
+            return False
         
-        for old_backup in backup_files[10:]:
-            try:
-                os.remove(os.path.join(BACKUP_DIR, old_backup))
-                # 対応するメタデータファイルも削除
-                metadata_backup = old_backup.replace("main_data_backup_", "metadata_backup_").replace(".pkl", ".json")
-                metadata_path = os.path.join(BACKUP_DIR, metadata_backup)
-                if os.path.exists(metadata_path):
-                    os.remove(metadata_path)
-            except Exception as cleanup_error:
-                logger.warning(f"古いバックアップ削除エラー: {cleanup_error}")
-        
-        logger.info(f"バックアップ作成完了: {backup_file}")
+        with _write_lock():
+            metadata = get_data_info()
+            if metadata and backup_store.snapshot_exists(metadata.get('snapshot_id')):
+                logger.info(f"現在のデータはバックアップ済みです: {metadata['snapshot_id']}")
+                return True
+
+            with open(MAIN_DATA_FILE, 'rb') as f:
+                saved_data = pickle.load(f)
+            snapshot_id = backup_store.create_snapshot(saved_data, metadata)
+            if metadata is not None:
+                metadata['snapshot_id'] = snapshot_id
+                _write_metadata(metadata)
+        
+        logger.info(f"バックアップ作成完了: {snapshot_id}")
         return True
     except Exception as e:
-        if 'st' in globals():
+        if _session_available():
             st.warning(f"バックアップ作成エラー: {e}")
         logger.error(f"バックアップ作成エラー: {e}")
         return False
 
 def save_data_to_file(df, target_data=None, metadata=None):
-    """データをファイルに保存（強化版）"""
+    """データをファイルに保存（呼び出し元で完了まで待つ）
+
+    一時ファイルに書き込んで fsync してから置き換えるため、途中で異常終了しても
+    main_data.pkl が壊れることはない。画面操作を止めたくない場合は save_data_in_background を使う。
+    """
     try:
-        if not ensure_data_directory():
+        store_version = _write_data_files(df, target_data, metadata, _session_snapshot())
+        _remember_session_store(store_version, get_data_version(df) if df is not None else None)
+        return True
+    except Exception as e:
+        if _session_available():
+            st.error(f"データ保存エラー: {e}")
+        logger.error(f"データ保存エラー: {e}")
+        return False
+
+def save_data_in_background(df, target_data=None, metadata=None):
+    """データを書き込みスレッドで保存（すぐに戻る）
+
+    保存待ちのうちに新しい保存が依頼された場合、古い依頼は書き込まずに破棄する。
+    進捗・結果は get_save_status() で確認できる。
+
+    Returns:
+        int: 保存ジョブID
+    """
+    global _SAVE_EXECUTOR
+    # セッション状態は呼び出し元（Streamlitのスクリプトスレッド）で取得しておく
+    session_snapshot = _session_snapshot()
+    with _SAVE_STATUS_LOCK:
+        _SAVE_STATUS.update({'job_id': _SAVE_STATUS['job_id'] + 1, 'state': 'queued', 'started_at': None,
+                             'finished_at': None, 'rows': len(df) if df is not None else 0, 'error': None})
+        job_id = _SAVE_STATUS['job_id']
+        if _SAVE_EXECUTOR is None:
+            _SAVE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="data-save")
+    _SAVE_EXECUTOR.submit(_run_save_job, job_id, df, target_data, metadata, session_snapshot)
+    if _session_available():
+        st.session_state[SESSION_SAVE_JOB_KEY] = job_id
+    return job_id
+
+def get_save_status():
+    """最新のバックグラウンド保存の状態を取得
+
+    Returns:
+        dict: job_id, state（idle / queued / running / done / failed）, started_at, finished_at, rows, error
+    """
+    with _SAVE_STATUS_LOCK:
+        return dict(_SAVE_STATUS)
+
+def wait_for_save(timeout=None):
+    """実行中のバックグラウンド保存の完了を待つ（夜間バッチ・終了処理用）
+
+    Returns:
+        bool: 待機時間内に保存が終わり、失敗していないか
+    """
+    if _SAVE_EXECUTOR is not None:
+        future = _SAVE_EXECUTOR.submit(lambda: None)
+        try:
+            future.result(timeout=timeout)
+        except Exception:
             return False
-        
-        # 既存データのバックアップ
+    return get_save_status()['state'] != 'failed'
+
+def _run_save_job(job_id, df, target_data, metadata, session_snapshot):
+    """書き込みスレッドで保存を実行し、状態を更新"""
+    with _SAVE_STATUS_LOCK:
+        if _SAVE_STATUS['job_id'] != job_id:
+            logger.info(f"新しい保存依頼があるため保存ジョブ {job_id} をスキップしました")
+            return
+        _SAVE_STATUS.update({'state': 'running', 'started_at': datetime.now()})
+    try:
+        store_version = _write_data_files(df, target_data, metadata, session_snapshot)
+        state, error = 'done', None
+    except Exception as e:
+        logger.error(f"バックグラウンド保存エラー: {e}")
+        state, error = 'failed', str(e)
+    with _SAVE_STATUS_LOCK:
+        if state == 'done':
+            _SAVE_RESULTS[job_id] = (store_version, get_data_version(df) if df is not None else None)
+            while len(_SAVE_RESULTS) > _SAVE_RESULTS_SIZE:
+                _SAVE_RESULTS.popitem(last=False)
+        if _SAVE_STATUS['job_id'] == job_id:
+            _SAVE_STATUS.update({'state': state, 'finished_at': datetime.now(), 'error': error})
+
+def _session_snapshot():
+    """保存ファイルに含めるセッション情報を取得（Streamlit外では空）"""
+    if not _session_available():
+        return {'data_source': 'unknown', 'session_info': {
+            'filter_config': {}, 'performance_metrics': {}, 'validation_results': {}}}
+    return {
+        'data_source': st.session_state.get('data_source', 'unknown'),
+        'session_info': {
+            'filter_config': st.session_state.get('current_unified_filter_config', {}),
+            'performance_metrics': st.session_state.get('performance_metrics', {}),
+            'validation_results': st.session_state.get('validation_results', {})
+        }
+    }
+
+def _write_data_files(df, target_data, metadata, session_snapshot):
+    """メインデータとメタデータを書き込み、保存データのバージョンを返す（失敗時は例外）"""
+    if not ensure_data_directory():
+        raise OSError(f"データディレクトリを作成できません: {DATA_DIR}")
+
+    with _write_lock():
+        # 旧形式の既存データはスナップショットにしてから上書きする
         create_backup()
-        
+        store_version = _next_store_version()
+
         # メインデータの保存
         data_to_save = {
             'df': df,
             'target_data': target_data,
             'saved_at': datetime.now(),
             'data_shape': df.shape if df is not None else None,
+            'data_version': (get_data_version(df) or set_data_version(df)) if df is not None else None,
             'version': '6.0',  # アプリバージョンに合わせて更新
-            'data_source': st.session_state.get('data_source', 'unknown') if hasattr(st, 'session_state') else 'unknown',
-            'session_info': {
-                'filter_config': st.session_state.get('current_unified_filter_config', {}) if hasattr(st, 'session_state') else {},
-                'performance_metrics': st.session_state.get('performance_metrics', {}) if hasattr(st, 'session_state') else {},
-                'validation_results': st.session_state.get('validation_results', {}) if hasattr(st, 'session_state') else {}
-            }
+            'data_source': session_snapshot['data_source'],
+            'session_info': session_snapshot['session_info'],
+            'store_version': store_version
         }
-        
-        with open(MAIN_DATA_FILE, 'wb') as f:
-            pickle.dump(data_to_save, f, protocol=pickle.HIGHEST_PROTOCOL)
-        
+        atomic_write(MAIN_DATA_FILE, lambda f: pickle.dump(data_to_save, f, protocol=pickle.HIGHEST_PROTOCOL))
+
         # メタデータの保存（強化版）
         if metadata is None:
             metadata = {}
-        
+
         enhanced_metadata = {
             'last_saved': datetime.now().isoformat(),
             'data_rows': len(df) if df is not None else 0,
             'data_columns': list(df.columns) if df is not None else [],
             'file_size_mb': round(os.path.getsize(MAIN_DATA_FILE) / (1024 * 1024), 2),
-            'data_source': st.session_state.get('data_source', 'unknown') if hasattr(st, 'session_state') else 'unknown',
+            'data_source': session_snapshot['data_source'],
             'app_version': '6.0',
             'save_count': metadata.get('save_count', 0) + 1,
             'date_range': {},
             'statistics': {}
         }
-        
-        # データ統計情報を追加
         if df is not None and not df.empty:
-            # 日付列の検出（複数の可能性のある列名に対応）
-            date_columns = ['日付', '手術実施日_dt', '手術実施日', 'date']
-            date_col = None
-            for col in date_columns:
-                if col in df.columns:
-                    date_col = col
-                    break
-            
-            if date_col:
-                try:
-                    enhanced_metadata['date_range'] = {
-                        'min_date': df[date_col].min().isoformat(),
-                        'max_date': df[date_col].max().isoformat(),
-                        'total_days': (df[date_col].max() - df[date_col].min()).days + 1,
-                        'unique_dates': df[date_col].nunique()
-                    }
-                except Exception as date_error:
-                    logger.warning(f"日付範囲計算エラー: {date_error}")
-            
-            # 基本統計（複数の可能性のある列名に対応）
-            dept_columns = ['診療科名', '実施診療科', '診療科', 'department']
-            ward_columns = ['病棟コード', '病棟', 'ward']
-            
-            dept_col = None
-            ward_col = None
-            
-            for col in dept_columns:
-                if col in df.columns:
-                    dept_col = col
-                    break
-                    
-            for col in ward_columns:
-                if col in df.columns:
-                    ward_col = col
-                    break
-            
-            enhanced_metadata['statistics'] = {
-                'departments': df[dept_col].nunique() if dept_col else 0,
-                'wards': df[ward_col].nunique() if ward_col else 0,
-                'total_records': len(df),
-                'columns_count': len(df.columns)
-            }
-        
+            enhanced_metadata.update(_get_data_statistics(df, data_to_save['data_version']))
+
         # 元のメタデータと結合
         enhanced_metadata.update(metadata)
-        
-        with open(METADATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(enhanced_metadata, f, ensure_ascii=False, indent=2, default=str)
-        
-        logger.info(f"データ保存完了: {len(df) if df is not None else 0}件")
-        return True
-        
-    except Exception as e:
-        if 'st' in globals():
-            st.error(f"データ保存エラー: {e}")
-        logger.error(f"データ保存エラー: {e}")
-        return False
+        enhanced_metadata['store_version'] = store_version
+
+        # 保存内容の差分スナップショット（失敗しても保存は続行）
+        try:
+            enhanced_metadata['snapshot_id'] = backup_store.create_snapshot(data_to_save, enhanced_metadata)
+        except Exception as backup_error:
+            logger.warning(f"スナップショット作成エラー: {backup_error}")
+            enhanced_metadata.pop('snapshot_id', None)
+
+        _write_metadata(enhanced_metadata)
+        _write_store_manifest(store_version, data_to_save['data_version'], enhanced_metadata.get('snapshot_id'))
+
+    # 分析用SQLストアを使っている場合は保存したデータで作り直す（失敗しても保存は成功扱い）
+    if df is not None and analytic_store.is_enabled():
+        try:
+            analytic_store.build_store(df)
+        except Exception as store_error:
+            logger.warning(f"分析用SQLストア更新エラー: {store_error}")
+
+    logger.info(f"データ保存完了: {len(df) if df is not None else 0}件")
+    return store_version
+
+def _write_metadata(metadata):
+    """メタデータを一時ファイル経由で書き込み"""
+    data = json.dumps(metadata, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+    atomic_write(METADATA_FILE, lambda f: f.write(data))
+
+def _get_data_statistics(df, data_version):
+    """メタデータ用の日付範囲・基本統計（データバージョンごとに1回だけ計算）"""
+    if data_version in _STATISTICS_CACHE:
+        _STATISTICS_CACHE.move_to_end(data_version)
+        return _STATISTICS_CACHE[data_version]
+
+    statistics = {'date_range': {}, 'statistics': {}}
+
+    # 日付列の検出（複数の可能性のある列名に対応）
+    date_col = next((col for col in ['日付', '手術実施日_dt', '手術実施日', 'date'] if col in df.columns), None)
+    if date_col:
+        try:
+            dates = pd.to_datetime(df[date_col])
+            min_date, max_date = dates.min(), dates.max()
+            statistics['date_range'] = {
+                'min_date': min_date.isoformat(),
+                'max_date': max_date.isoformat(),
+                'total_days': (max_date - min_date).days + 1,
+                'unique_dates': int(dates.dt.normalize().drop_duplicates().count())
+            }
+        except Exception as date_error:
+            logger.warning(f"日付範囲計算エラー: {date_error}")
+
+    # 基本統計（複数の可能性のある列名に対応）
+    dept_col = next((col for col in ['診療科名', '実施診療科', '診療科', 'department'] if col in df.columns), None)
+    ward_col = next((col for col in ['病棟コード', '病棟', 'ward'] if col in df.columns), None)
+    statistics['statistics'] = {
+        'departments': int(df[dept_col].nunique()) if dept_col else 0,
+        'wards': int(df[ward_col].nunique()) if ward_col else 0,
+        'total_records': len(df),
+        'columns_count': len(df.columns)
+    }
+
+    _STATISTICS_CACHE[data_version] = statistics
+    while len(_STATISTICS_CACHE) > _STATISTICS_CACHE_SIZE:
+        _STATISTICS_CACHE.popitem(last=False)
+    return statistics
 
 def load_data_from_file():
     """ファイルからデータを読み込み（強化版）"""
@@ -204,16 +450,25 @@ def load_data_from_file():
             logger.info("保存ファイルが見つかりません")
             return None, None, None
         
-        # メインデータの読み込み
-        with open(MAIN_DATA_FILE, 'rb') as f:
-            saved_data = pickle.load(f)
-        
-        # メタデータの読み込み
-        metadata = None
-        if os.path.exists(METADATA_FILE):
-            with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-        
+        # データとメタデータは同じ保存の組を読む（書き込み中なら完了を待つ）
+        with _read_lock():
+            with open(MAIN_DATA_FILE, 'rb') as f:
+                saved_data = pickle.load(f)
+
+            metadata = None
+            if os.path.exists(METADATA_FILE):
+                with open(METADATA_FILE, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+
+            # 旧形式・復元したファイルは store_version を持たないため、同じロック内でマニフェストから取る
+            store_version = get_store_version()
+
+        if metadata and saved_data.get('store_version') != metadata.get('store_version'):
+            logger.warning(
+                f"データとメタデータの保存バージョンが一致しません: "
+                f"{saved_data.get('store_version')} / {metadata.get('store_version')}"
+            )
+
         # データの妥当性チェック
         df = saved_data.get('df')
         if df is not None and isinstance(df, pd.DataFrame):
@@ -225,9 +480,12 @@ def load_data_from_file():
                         df[col] = pd.to_datetime(df[col])
                     except Exception as date_convert_error:
                         logger.warning(f"日付列変換警告 {col}: {date_convert_error}")
+
+            # 保存時のデータバージョンを引き継ぐ（旧形式のファイルは内容から計算）
+            set_data_version(df, saved_data.get('data_version'))
         
         # セッション情報の復元（可能な場合）
-        if hasattr(st, 'session_state'):
+        if _session_available():
             session_info = saved_data.get('session_info', {})
             if session_info:
                 # フィルター設定の復元
@@ -237,12 +495,14 @@ def load_data_from_file():
                 # パフォーマンス情報の復元
                 if session_info.get('performance_metrics'):
                     st.session_state['performance_metrics'] = session_info['performance_metrics']
+
+            _remember_session_store(store_version, get_data_version(df) if df is not None else None)
         
         logger.info(f"データ読み込み完了: {len(df) if df is not None else 0}件")
         return df, saved_data.get('target_data'), metadata
         
     except Exception as e:
-        if 'st' in globals():
+        if _session_available():
             st.error(f"データ読み込みエラー: {e}")
         logger.error(f"データ読み込みエラー: {e}")
         return None, None, None
@@ -266,7 +526,7 @@ def save_settings_to_file(settings):
         return True
         
     except Exception as e:
-        if 'st' in globals():
+        if _session_available():
             st.error(f"設定保存エラー: {e}")
         logger.error(f"設定保存エラー: {e}")
         return False
@@ -283,7 +543,7 @@ def load_settings_from_file():
         return saved_settings.get('settings')
         
     except Exception as e:
-        if 'st' in globals():
+        if _session_available():
             st.error(f"設定読み込みエラー: {e}")
         logger.error(f"設定読み込みエラー: {e}")
         return None
@@ -308,16 +568,22 @@ def delete_saved_data():
     try:
         files_to_delete = [MAIN_DATA_FILE, METADATA_FILE, SETTINGS_FILE]
         deleted_files = []
-        
-        for file_path in files_to_delete:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                deleted_files.append(os.path.basename(file_path))
-        
-        # バックアップディレクトリも削除
-        if os.path.exists(BACKUP_DIR):
-            shutil.rmtree(BACKUP_DIR)
-            deleted_files.append("backup/")
+        if not os.path.isdir(DATA_DIR):
+            return True, deleted_files
+
+        with _write_lock():
+            for file_path in files_to_delete:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    deleted_files.append(os.path.basename(file_path))
+
+            # バックアップディレクトリも削除
+            if os.path.exists(BACKUP_DIR):
+                shutil.rmtree(BACKUP_DIR)
+                deleted_files.append("backup/")
+
+            # バージョンは削除後も引き続き増やす（マニフェストは消さない）
+            _write_store_manifest(_next_store_version(), None)
         
         logger.info(f"データ削除完了: {deleted_files}")
         return True, deleted_files
@@ -330,7 +596,7 @@ def auto_load_data():
     """アプリ起動時の自動データ読み込み（シンプル確実版）"""
     
     # セッション状態がない場合はスキップ
-    if not hasattr(st, 'session_state'):
+    if not _session_available():
         return False
     
     # 既にデータが処理済みの場合はスキップ
@@ -371,7 +637,7 @@ def auto_load_data():
     except Exception as e:
         # エラーが発生した場合は自動読み込みを無効化
         logger.error(f"自動データ読み込みエラー: {e}")
-        if 'st' in globals():
+        if _session_available():
             st.error(f"自動データ読み込みエラー: {str(e)}")
         return False
 
@@ -407,7 +673,7 @@ def get_file_sizes():
                 os.path.getsize(os.path.join(BACKUP_DIR, f)) 
                 for f in os.listdir(BACKUP_DIR) 
                 if os.path.isfile(os.path.join(BACKUP_DIR, f))
-            )
+            ) + backup_store.get_store_size()
             total_size += backup_size
             
             if backup_size > 0:
@@ -430,75 +696,110 @@ def get_file_sizes():
         return {}
 
 def get_backup_info():
-    """バックアップファイルの情報を取得（強化版）"""
+    """バックアップの情報を取得（差分スナップショットと旧形式のファイル、新しい順）"""
     try:
         if not os.path.exists(BACKUP_DIR):
             return []
         
-        backup_files = [f for f in os.listdir(BACKUP_DIR) if f.startswith("main_data_backup_")]
         backup_info = []
-        
-        for backup_file in sorted(backup_files, reverse=True):
+
+        for snapshot in backup_store.list_snapshots():
+            timestamp = datetime.strptime(snapshot['snapshot_id'], "%Y%m%d_%H%M%S")
+            backup_info.append({
+                'filename': snapshot['snapshot_id'],
+                'kind': 'snapshot',
+                'timestamp': timestamp.strftime("%Y/%m/%d %H:%M:%S"),
+                'size': f"{_format_size(snapshot['total_bytes'])}（新規 {_format_size(snapshot['stored_bytes'])}）",
+                'path': None,
+                'has_metadata': snapshot['has_metadata'],
+                'age_days': (datetime.now() - timestamp).days,
+                'rows': snapshot['rows'],
+                'partitions': snapshot['partitions'],
+                'sort_key': timestamp
+            })
+        
+        # 旧形式（pickle全体のコピー）のバックアップ
+        backup_files = [f for f in os.listdir(BACKUP_DIR) if f.startswith("main_data_backup_")]
+        for backup_file in backup_files:
             file_path = os.path.join(BACKUP_DIR, backup_file)
             timestamp_str = backup_file.replace("main_data_backup_", "").replace(".pkl", "")
             
             try:
                 timestamp = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                formatted_time = timestamp.strftime("%Y/%m/%d %H:%M:%S")
-                file_size = os.path.getsize(file_path)
-                
-                if file_size < 1024 * 1024:
-                    size_str = f"{file_size / 1024:.1f} KB"
-                else:
-                    size_str = f"{file_size / (1024 * 1024):.1f} MB"
                 
                 # 対応するメタデータファイルがあるかチェック
                 metadata_file = os.path.join(BACKUP_DIR, f"metadata_backup_{timestamp_str}.json")
-                has_metadata = os.path.exists(metadata_file)
                 
                 backup_info.append({
                     'filename': backup_file,
-                    'timestamp': formatted_time,
-                    'size': size_str,
+                    'kind': 'legacy',
+                    'timestamp': timestamp.strftime("%Y/%m/%d %H:%M:%S"),
+                    'size': _format_size(os.path.getsize(file_path)),
                     'path': file_path,
-                    'has_metadata': has_metadata,
-                    'age_days': (datetime.now() - timestamp).days
+                    'has_metadata': os.path.exists(metadata_file),
+                    'age_days': (datetime.now() - timestamp).days,
+                    'sort_key': timestamp
                 })
             except Exception as parse_error:
                 logger.warning(f"バックアップファイル解析エラー {backup_file}: {parse_error}")
                 continue
         
+        backup_info.sort(key=lambda info: info.pop('sort_key'), reverse=True)
         return backup_info[:10]  # 最新10個まで
         
     except Exception as e:
         logger.error(f"バックアップ情報取得エラー: {e}")
         return []
 
+def _format_size(size_bytes):
+    """バイト数を KB / MB 表記に変換"""
+    if size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    return f"{size_bytes / (1024 * 1024):.1f} MB"
+
 def restore_from_backup(backup_filename):
-    """バックアップからデータを復元（強化版）"""
+    """バックアップからデータを復元（差分スナップショットはIDを、旧形式はファイル名を指定）"""
     try:
-        backup_path = os.path.join(BACKUP_DIR, backup_filename)
-        if not os.path.exists(backup_path):
-            return False, "バックアップファイルが見つかりません"
-        
-        # 現在のファイルをバックアップ
-        create_backup()
-        
-        # バックアップファイルを復元
-        shutil.copy2(backup_path, MAIN_DATA_FILE)
-        
-        # 対応するメタデータファイルも復元
-        timestamp_str = backup_filename.replace("main_data_backup_", "").replace(".pkl", "")
-        metadata_backup_path = os.path.join(BACKUP_DIR, f"metadata_backup_{timestamp_str}.json")
-        
-        if os.path.exists(metadata_backup_path):
-            shutil.copy2(metadata_backup_path, METADATA_FILE)
+        with _write_lock():
+            if backup_store.snapshot_exists(backup_filename):
+                saved_data, metadata = backup_store.restore_snapshot(backup_filename)
+
+                # 現在のデータがスナップショット化されていなければ先にバックアップ
+                create_backup()
+                store_version = _next_store_version()
+
+                saved_data = dict(saved_data, store_version=store_version)
+                atomic_write(MAIN_DATA_FILE, lambda f: pickle.dump(saved_data, f, protocol=pickle.HIGHEST_PROTOCOL))
+                metadata = dict(metadata or {})
+                metadata['snapshot_id'] = backup_filename
+                metadata['store_version'] = store_version
+                _write_metadata(metadata)
+                data_version = saved_data.get('data_version') or _loaded_data_version()
+                _write_store_manifest(store_version, data_version, backup_filename)
+            else:
+                backup_path = os.path.join(BACKUP_DIR, backup_filename)
+                if not os.path.exists(backup_path):
+                    return False, "バックアップファイルが見つかりません"
+
+                # 現在のファイルをバックアップ
+                create_backup()
+
+                # バックアップファイルを復元（一時ファイル経由で置き換え）
+                atomic_copy(backup_path, MAIN_DATA_FILE)
+
+                # 対応するメタデータファイルも復元
+                timestamp_str = backup_filename.replace("main_data_backup_", "").replace(".pkl", "")
+                metadata_backup_path = os.path.join(BACKUP_DIR, f"metadata_backup_{timestamp_str}.json")
+
+                if os.path.exists(metadata_backup_path):
+                    atomic_copy(metadata_backup_path, METADATA_FILE)
+                _write_store_manifest(_next_store_version(), _loaded_data_version())
         
         # セッション状態をクリア（Streamlit環境の場合のみ）
-        if hasattr(st, 'session_state'):
+        if _session_available():
             keys_to_clear = ['processed_df', 'target_dict', 'latest_date', 'data_source', 'data_metadata',
                             'current_unified_filter_config', 'performance_metrics',
-                            'validation_results', 'all_results']
+                            'validation_results', 'all_results', SESSION_STORE_KEY]
             for key in keys_to_clear:
                 if key in st.session_state:
                     del st.session_state[key]
@@ -510,31 +811,32 @@ def restore_from_backup(backup_filename):
         logger.error(f"バックアップ復元エラー: {e}")
         return False, f"復元エラー: {e}"
 
-def export_data_package(export_path=None):
-    """データパッケージのエクスポート（他端末への移行用）"""
+def export_data_package(export_path=None, snapshot_id=None):
+    """データパッケージのエクスポート（他端末への移行用）
+
+    現在のデータ（または指定したスナップショット）を年度パーティションごとのエントリとして
+    ファイルに逐次書き出す。書き出し中のファイルは一時ファイルで、完了時に置き換える。
+
+    Args:
+        export_path: 出力先（省略時はカレントディレクトリに日時付きのファイル名）
+        snapshot_id: エクスポートするスナップショット（省略時は現在の保存データ）
+    """
     try:
         if export_path is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             export_path = f"data_export_{timestamp}.zip"
         
-        import zipfile
-        
-        with zipfile.ZipFile(export_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            files_to_export = [
-                (MAIN_DATA_FILE, "main_data.pkl"),
-                (METADATA_FILE, "metadata.json"),
-                (SETTINGS_FILE, "settings.json")
-            ]
-            
-            for source_path, archive_name in files_to_export:
-                if os.path.exists(source_path):
-                    zipf.write(source_path, archive_name)
-            
-            # 最新のバックアップも含める
-            backup_info = get_backup_info()
-            if backup_info:
-                latest_backup = backup_info[0]
-                zipf.write(latest_backup['path'], f"backup_{latest_backup['filename']}")
+        if snapshot_id is None:
+            if not create_backup():
+                return False, "エクスポートするデータがありません"
+            snapshot_id = (get_data_info() or {}).get('snapshot_id')
+
+        # 書き出し中に他のプロセスの整理でスナップショットが消えないよう読み込みロックを持つ
+        with _read_lock():
+            if not backup_store.snapshot_exists(snapshot_id):
+                return False, "エクスポートするデータがありません"
+            atomic_write(export_path, lambda f: backup_store.export_package(
+                snapshot_id, f, {'settings.json': SETTINGS_FILE}))
         
         logger.info(f"データエクスポート完了: {export_path}")
         return True, export_path
@@ -543,39 +845,83 @@ def export_data_package(export_path=None):
         logger.error(f"データエクスポートエラー: {e}")
         return False, str(e)
 
-def import_data_package(import_file):
-    """データパッケージのインポート"""
+def import_data_package(import_file, merge=False):
+    """データパッケージのインポート
+
+    エントリごとにチェックサムを確認しながら逐次展開し、手元にない年度パーティションだけを書き込む。
+
+    Args:
+        import_file: パッケージ（パスまたはファイルオブジェクト）
+        merge: True の場合、パッケージに含まれる年度だけを現在のデータに統合する
+    """
     try:
         import zipfile
         
         if not ensure_data_directory():
             return False, "ディレクトリ作成失敗"
         
-        # 現在のデータをバックアップ
-        create_backup(force_create=True)
-        
         with zipfile.ZipFile(import_file, 'r') as zipf:
-            zipf.extractall(DATA_DIR)
+            package_manifest = backup_store.read_package_manifest(zipf)
+            if package_manifest is None:
+                _import_legacy_package(zipf)
+                message = "インポート完了"
+            else:
+                with _write_lock():
+                    # 現在のデータをバックアップ
+                    create_backup()
+                    base_snapshot = (get_data_info() or {}).get('snapshot_id') if merge else None
+                    snapshot_id = backup_store.import_package(zipf, package_manifest, merge_into=base_snapshot)
+                    backup_store.extract_package_file(zipf, package_manifest, 'settings.json', SETTINGS_FILE)
+                    success, restore_message = restore_from_backup(snapshot_id)
+                if not success:
+                    return False, restore_message
+                message = "インポート完了（年度単位で統合）" if base_snapshot else "インポート完了"
         
         # セッション状態をクリア（Streamlit環境の場合のみ）
-        if hasattr(st, 'session_state'):
+        if _session_available():
             keys_to_clear = ['processed_df', 'target_dict', 'latest_date', 'data_source', 'data_metadata',
                             'current_unified_filter_config', 'performance_metrics',
-                            'validation_results', 'all_results']
+                            'validation_results', 'all_results', SESSION_STORE_KEY]
             for key in keys_to_clear:
                 if key in st.session_state:
                     del st.session_state[key]
         
-        logger.info("データインポート完了")
-        return True, "インポート完了"
+        logger.info(f"データインポート完了: {message}")
+        return True, message
         
     except Exception as e:
         logger.error(f"データインポートエラー: {e}")
         return False, f"インポートエラー: {e}"
 
+def _import_legacy_package(zipf):
+    """旧形式（pickleをそのまま格納したZIP）のパッケージを展開"""
+    # 書き込み途中で中断しても既存ファイルが壊れないよう、その場で上書きせず置き換える
+    data_dir = os.path.realpath(DATA_DIR)
+    protected = {os.path.realpath(MANIFEST_FILE), os.path.realpath(LOCK_FILE)}
+    with _write_lock():
+        # 現在のデータをバックアップ
+        create_backup(force_create=True)
+
+        for member in zipf.infolist():
+            target_path = os.path.realpath(os.path.join(data_dir, member.filename))
+            if not target_path.startswith(data_dir + os.sep) or target_path in protected:
+                logger.warning(f"展開対象外のファイルは展開しません: {member.filename}")
+                continue
+            if member.is_dir():
+                os.makedirs(target_path, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            atomic_write(target_path, lambda f: shutil.copyfileobj(zipf.open(member), f, COPY_BUFFER_SIZE))
+        _write_store_manifest(_next_store_version(), _loaded_data_version())
+
+def _loaded_data_version():
+    """保存済みファイルを読み込んだときのデータバージョン（旧形式のファイルは内容から計算）"""
+    df, _, _ = load_data_from_file()
+    return get_data_version(df) if df is not None else None
+
 def toggle_auto_load(enabled=True):
     """自動読み込み機能の有効/無効切り替え"""
-    if hasattr(st, 'session_state'):
+    if _session_available():
         st.session_state['disable_auto_load'] = not enabled
         return not st.session_state.get('disable_auto_load', False)
     return enabled
\ No newline at end of file
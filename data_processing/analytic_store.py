@@ -0,0 +1,332 @@
+# data_processing/analytic_store.py
+"""
+分析用の埋め込みSQLストア（SQLite、サーバー不要・任意機能）
+
+前処理済みの手術データを saved_data/analytics.sqlite に書き出し、日付・診療科・手術室・術者に
+インデックスを張る。分析関数は抽出条件と集計をSQLに渡すことで、データ全体を
+DataFrameとして読み込まずに結果だけを取得できる。
+
+ストアは作成時のデータバージョンを記録し、バージョンが一致するDataFrameに対してだけ使う
+（一致しない場合は従来どおり pandas で集計する）。
+夜間事前計算（precompute.py）で作成され、作成済みの場合はデータ保存時にも更新する。
+環境変数 SURGERY_DASHBOARD_ANALYTIC_STORE=1 で保存時の作成を有効にできる。
+"""
+
+import pandas as pd
+import logging
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from utils.cache import get_data_version, set_data_version
+from utils.file_utils import match_file_mode
+
+logger = logging.getLogger(__name__)
+
+ANALYTIC_DB_FILE = os.path.join("saved_data", "analytics.sqlite")
+ANALYTIC_STORE_ENV = "SURGERY_DASHBOARD_ANALYTIC_STORE"
+STORE_FORMAT_VERSION = 1
+
+# アプリの列名 → ストアの列名
+COLUMN_MAP = {
+    '手術実施日_dt': 'surgery_date',
+    'week_start': 'week_start',
+    'month_start': 'month_start',
+    'fiscal_year': 'fiscal_year',
+    '実施診療科': 'department',
+    '実施手術室': 'room',
+    '実施術者': 'surgeon',
+    '麻酔種別': 'anesthesia',
+    '入室時刻': 'entry_time',
+    '退室時刻': 'exit_time',
+    'is_gas_20min': 'is_gas_20min',
+    'is_weekday': 'is_weekday',
+}
+DATE_COLUMNS = ('surgery_date', 'week_start', 'month_start')
+
+# 集計項目 → SQL式
+METRICS = {
+    '件数': "COUNT(*)",
+    '平日件数': "SUM(s.is_weekday)",
+    '実データ平日数': "COUNT(DISTINCT CASE WHEN s.is_weekday = 1 THEN s.surgery_date END)",
+    '実施日数': "COUNT(DISTINCT s.surgery_date)",
+}
+
+_SCHEMA = """
+CREATE TABLE surgeries (
+    id INTEGER PRIMARY KEY,
+    surgery_date TEXT NOT NULL,
+    week_start TEXT,
+    month_start TEXT,
+    fiscal_year INTEGER,
+    department TEXT,
+    room TEXT,
+    surgeon TEXT,
+    anesthesia TEXT,
+    entry_time TEXT,
+    exit_time TEXT,
+    is_gas_20min INTEGER NOT NULL,
+    is_weekday INTEGER NOT NULL
+);
+CREATE TABLE surgery_surgeons (
+    surgery_id INTEGER NOT NULL REFERENCES surgeries(id),
+    surgeon TEXT NOT NULL
+);
+CREATE TABLE store_info (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_INDEXES = """
+CREATE INDEX idx_surgeries_date ON surgeries (surgery_date);
+CREATE INDEX idx_surgeries_department ON surgeries (department, surgery_date);
+CREATE INDEX idx_surgeries_room ON surgeries (room, surgery_date);
+CREATE INDEX idx_surgeries_gas ON surgeries (is_gas_20min, surgery_date);
+CREATE INDEX idx_surgery_surgeons_surgeon ON surgery_surgeons (surgeon, surgery_id);
+CREATE INDEX idx_surgery_surgeons_surgery ON surgery_surgeons (surgery_id);
+"""
+
+# ストア情報のキャッシュ {(更新時刻, サイズ): 情報}（ファイルが変わったときだけ読み直す）
+_INFO_CACHE: Dict[Tuple[int, int], Dict[str, str]] = {}
+
+
+def is_enabled() -> bool:
+    """データ保存時にストアを作成・更新するか（作成済み、または環境変数で有効）"""
+    return os.path.exists(ANALYTIC_DB_FILE) or os.environ.get(ANALYTIC_STORE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def build_store(df: pd.DataFrame, path: str = ANALYTIC_DB_FILE) -> str:
+    """
+    前処理済みのデータからストアを作成する（一時ファイルに作成して置き換え）
+
+    Returns:
+        ストアに記録したデータバージョン
+    """
+    data_version = get_data_version(df) or set_data_version(df)
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".analytics.", suffix=".tmp")
+    os.close(fd)
+    try:
+        with closing(sqlite3.connect(temp_path)) as conn:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(_SCHEMA)
+            conn.executemany(
+                f"INSERT INTO surgeries (id, {', '.join(c for c in _store_columns())}) "
+                f"VALUES (?, {', '.join('?' for _ in _store_columns())})",
+                _surgery_rows(df)
+            )
+            conn.executemany("INSERT INTO surgery_surgeons (surgery_id, surgeon) VALUES (?, ?)", _surgeon_rows(df))
+            conn.executescript(_INDEXES)
+            conn.executemany("INSERT INTO store_info (key, value) VALUES (?, ?)", [
+                ('format_version', str(STORE_FORMAT_VERSION)),
+                ('data_version', data_version),
+                ('built_at', datetime.now().isoformat()),
+                ('rows', str(len(df))),
+            ])
+            conn.execute("ANALYZE")
+            conn.commit()
+        match_file_mode(temp_path, path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    logger.info(f"分析用SQLストア作成完了: {len(df):,}件 ({path})")
+    return data_version
+
+
+def get_store_info(path: str = ANALYTIC_DB_FILE) -> Optional[Dict[str, str]]:
+    """ストアの情報（データバージョン・作成日時・件数）、ストアがない場合は None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cache_key = (stat.st_mtime_ns, stat.st_size)
+    if cache_key not in _INFO_CACHE:
+        try:
+            with closing(_connect(path)) as conn:
+                info = dict(conn.execute("SELECT key, value FROM store_info").fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"分析用SQLストアを開けません: {e}")
+            return None
+        _INFO_CACHE.clear()
+        _INFO_CACHE[cache_key] = info
+    info = _INFO_CACHE[cache_key]
+    return info if info.get('format_version') == str(STORE_FORMAT_VERSION) else None
+
+
+def is_active_for(df: pd.DataFrame, path: str = ANALYTIC_DB_FILE) -> bool:
+    """ストアがこのDataFrameと同じデータから作成されているか（集計をSQLに任せてよいか）"""
+    version = get_data_version(df)
+    if version is None:
+        return False
+    info = get_store_info(path)
+    return info is not None and info.get('data_version') == version
+
+
+def aggregate_cases(group_by: Sequence[str] = (), metrics: Sequence[str] = ('件数',),
+                    start_date=None, end_date=None,
+                    departments: Optional[Iterable[str]] = None,
+                    rooms: Optional[Iterable[str]] = None,
+                    surgeons: Optional[Iterable[str]] = None,
+                    gas_only: bool = True, weekday_only: bool = False,
+                    path: str = ANALYTIC_DB_FILE) -> pd.DataFrame:
+    """
+    抽出条件と集計をSQLで実行する
+
+    Args:
+        group_by: 集計単位（アプリの列名。例: 'week_start', '実施診療科', '実施術者'）
+        metrics: 集計項目（'件数' / '平日件数' / '実データ平日数' / '実施日数'）
+        start_date, end_date: 手術実施日の範囲（両端を含む）
+        departments, rooms, surgeons: 絞り込む診療科・手術室・術者
+        gas_only: 全身麻酔（20分以上）のみ
+        weekday_only: 平日のみ
+
+    Returns:
+        集計結果（列名はアプリの列名と集計項目名）
+    """
+    group_columns = [_store_column(col) for col in group_by]
+    unknown = [m for m in metrics if m not in METRICS]
+    if unknown:
+        raise ValueError(f"不明な集計項目です: {unknown}")
+
+    # 術者単位の集計は術者ごとの行に展開して数える（複数術者の手術は各術者に1件）
+    by_surgeon = 'surgeon' in group_columns
+    keys = [f"{'ss' if col == 'surgeon' and by_surgeon else 's'}.{col}" for col in group_columns]
+    select = keys + [f"{METRICS[m]} AS m{i}" for i, m in enumerate(metrics)]
+    sql = f"SELECT {', '.join(select)} FROM surgeries s"
+    if by_surgeon:
+        sql += " JOIN surgery_surgeons ss ON ss.surgery_id = s.id"
+
+    where, params = _build_filters(start_date, end_date, departments, rooms, surgeons, gas_only, weekday_only,
+                                   joined_surgeons=by_surgeon)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if keys:
+        sql += f" GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}"
+
+    with closing(_connect(path)) as conn:
+        result = pd.read_sql_query(sql, conn, params=params)
+    result.columns = list(group_by) + list(metrics)
+    return _to_app_types(result, group_by)
+
+
+def fetch_cases(start_date=None, end_date=None,
+                departments: Optional[Iterable[str]] = None,
+                rooms: Optional[Iterable[str]] = None,
+                surgeons: Optional[Iterable[str]] = None,
+                gas_only: bool = False, weekday_only: bool = False,
+                columns: Optional[Sequence[str]] = None,
+                path: str = ANALYTIC_DB_FILE) -> pd.DataFrame:
+    """
+    条件に一致する手術だけを読み込む（列名はアプリの列名）
+
+    Args:
+        columns: 読み込む列（アプリの列名、省略時は全列）
+    """
+    columns = list(columns) if columns is not None else list(COLUMN_MAP)
+    select = ', '.join(f"s.{_store_column(col)}" for col in columns)
+    sql = f"SELECT {select} FROM surgeries s"
+    where, params = _build_filters(start_date, end_date, departments, rooms, surgeons, gas_only, weekday_only)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY s.id"
+
+    with closing(_connect(path)) as conn:
+        result = pd.read_sql_query(sql, conn, params=params)
+    result.columns = columns
+    return _to_app_types(result, columns)
+
+
+def run_query(sql: str, params: Sequence[Any] = (), path: str = ANALYTIC_DB_FILE) -> pd.DataFrame:
+    """任意のSQLを読み取り専用で実行する（管理者向けのアドホック集計用）"""
+    with closing(_connect(path)) as conn:
+        return pd.read_sql_query(sql, conn, params=list(params))
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """読み取り専用で接続"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"分析用SQLストアがありません: {path}")
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+
+
+def _store_columns() -> list:
+    return list(COLUMN_MAP.values())
+
+
+def _store_column(app_column: str) -> str:
+    if app_column not in COLUMN_MAP:
+        raise ValueError(f"ストアにない列です: {app_column}")
+    return COLUMN_MAP[app_column]
+
+
+def _build_filters(start_date, end_date, departments, rooms, surgeons, gas_only, weekday_only,
+                   joined_surgeons=False):
+    """WHERE句の条件とパラメータ（joined_surgeons: surgery_surgeons を結合済みか）"""
+    where, params = [], []
+    if start_date is not None:
+        where.append("s.surgery_date >= ?")
+        params.append(pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+    if end_date is not None:
+        where.append("s.surgery_date <= ?")
+        params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+    for column, values in (('s.department', departments), ('s.room', rooms), ('ss.surgeon', surgeons)):
+        if values is None:
+            continue
+        values = [str(v) for v in values]
+        if column == 'ss.surgeon' and not joined_surgeons:
+            where.append(f"s.id IN (SELECT surgery_id FROM surgery_surgeons ss WHERE ss.surgeon IN "
+                         f"({', '.join('?' for _ in values)}))")
+        else:
+            where.append(f"{column} IN ({', '.join('?' for _ in values)})")
+        params.extend(values)
+    if gas_only:
+        where.append("s.is_gas_20min = 1")
+    if weekday_only:
+        where.append("s.is_weekday = 1")
+    return where, params
+
+
+def _surgery_rows(df: pd.DataFrame):
+    """surgeries テーブルの行（前処理で作られない列は NULL）"""
+    data = {}
+    for app_column, store_column in COLUMN_MAP.items():
+        if app_column not in df.columns:
+            data[store_column] = [None] * len(df)
+        elif store_column in DATE_COLUMNS:
+            data[store_column] = pd.to_datetime(df[app_column]).dt.strftime('%Y-%m-%d').tolist()
+        elif store_column in ('is_gas_20min', 'is_weekday'):
+            data[store_column] = df[app_column].fillna(False).astype(bool).astype(int).tolist()
+        elif store_column == 'fiscal_year':
+            data[store_column] = [None if pd.isna(v) else int(v) for v in df[app_column]]
+        else:
+            data[store_column] = [None if pd.isna(v) else str(v) for v in df[app_column]]
+    return zip(range(len(df)), *(data[col] for col in _store_columns()))
+
+
+def _surgeon_rows(df: pd.DataFrame):
+    """surgery_surgeons テーブルの行（複数術者の手術は術者ごとの行、術者分析と同じ分割）"""
+    from analysis.surgeon import get_expanded_surgeon_df
+
+    expanded = get_expanded_surgeon_df(df.reset_index(drop=True))
+    if expanded.empty:
+        return []
+    return zip(expanded.index.tolist(), expanded['実施術者'].astype(str).tolist())
+
+
+def _to_app_types(result: pd.DataFrame, app_columns: Sequence[str]) -> pd.DataFrame:
+    """日付列を datetime、フラグ列を bool に戻す"""
+    for col in app_columns:
+        store_column = COLUMN_MAP.get(col)
+        if store_column in DATE_COLUMNS:
+            result[col] = pd.to_datetime(result[col])
+        elif store_column in ('is_gas_20min', 'is_weekday'):
+            result[col] = result[col].astype(bool)
+    return result
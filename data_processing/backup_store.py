@@ -0,0 +1,458 @@
+# data_processing/backup_store.py
+"""
+差分バックアップ（スナップショット）の保存・復元モジュール
+
+保存データを年度（4月始まり）ごとのパーティションに分け、内容のハッシュを名前にして
+圧縮保存する（saved_data/backup/objects/）。スナップショットはどのパーティションで
+構成されるかを記録したマニフェスト（saved_data/backup/snapshots/<ID>.json）で、
+内容が変わっていない年度は前回までのオブジェクトを共有するため、新しく書き込むのは
+追加・変更のあった年度だけになる。
+
+データパッケージ（他端末への移行用ZIP）は、スナップショットのオブジェクトをそのまま
+エントリとして書き出し、マニフェストにチェックサムを記録する。書き出し・取り込みとも
+ファイル単位で逐次コピーするため、データ全体をメモリに載せない。
+"""
+
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import logging
+import os
+import pickle
+import zipfile
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.cache import compute_data_version, set_data_version
+from utils.file_utils import COPY_BUFFER_SIZE, atomic_write
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = os.path.join("saved_data", "backup")
+OBJECTS_DIR = os.path.join(BACKUP_DIR, "objects")
+SNAPSHOTS_DIR = os.path.join(BACKUP_DIR, "snapshots")
+SNAPSHOT_FORMAT_VERSION = 1
+
+# 保持するスナップショット数（古いものから削除し、参照されなくなったオブジェクトも削除）
+KEEP_SNAPSHOTS = 10
+COMPRESSION_LEVEL = 6
+
+# データパッケージの形式
+PACKAGE_FORMAT = "surgery-dashboard-package"
+PACKAGE_FORMAT_VERSION = 2
+PACKAGE_MANIFEST_NAME = "manifest.json"
+
+# パーティション分けに使う日付列（見つからない場合は1パーティション）
+DATE_COLUMNS = ['手術実施日_dt', '日付', '手術実施日', 'date']
+
+
+def create_snapshot(saved_data: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    保存データのスナップショットを作成する
+
+    Args:
+        saved_data: main_data.pkl に保存する辞書（'df' とその他の項目）
+        metadata: metadata.json の内容
+
+    Returns:
+        スナップショットID（作成日時）
+    """
+    os.makedirs(OBJECTS_DIR, exist_ok=True)
+    os.makedirs(SNAPSHOTS_DIR, exist_ok=True)
+
+    df = saved_data.get('df')
+    stored_bytes = 0
+    partitions = []
+    index_object = None
+    row_order_object = None
+
+    if df is not None:
+        keys = _partition_keys(df)
+        positions_by_key = pd.Series(np.arange(len(df))).groupby(keys, sort=False).indices
+        ordered_keys = list(dict.fromkeys(keys)) if len(df) else ['all']
+        for key in ordered_keys:
+            positions = positions_by_key.get(key, np.arange(0))
+            part = df.iloc[positions].reset_index(drop=True)
+            object_id = compute_data_version(part)
+            stored_bytes += _write_object(object_id, part)
+            partitions.append({'key': str(key), 'object': object_id, 'rows': len(part)})
+
+        # パーティションを順に連結して元の行順にならない場合は並び順も保存
+        concatenated = np.concatenate([positions_by_key.get(key, np.arange(0)) for key in ordered_keys])
+        if not np.array_equal(concatenated, np.arange(len(df))):
+            row_order = np.argsort(concatenated, kind='stable')
+            row_order_object, size = _write_payload(row_order)
+            stored_bytes += size
+        if not df.index.equals(pd.RangeIndex(len(df))):
+            index_object, size = _write_payload(df.index)
+            stored_bytes += size
+
+    meta_object, size = _write_payload({k: v for k, v in saved_data.items() if k != 'df'})
+    stored_bytes += size
+
+    snapshot_id = _new_snapshot_id()
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'snapshot_id': snapshot_id,
+        'created_at': datetime.now().isoformat(),
+        'has_df': df is not None,
+        'rows': len(df) if df is not None else 0,
+        'partitions': partitions,
+        'index_object': index_object,
+        'row_order_object': row_order_object,
+        'meta_object': meta_object,
+        'metadata': metadata,
+        'stored_bytes': stored_bytes,
+    }
+    manifest['total_bytes'] = sum(_object_size(object_id) for object_id in _referenced_objects(manifest))
+    _write_manifest(snapshot_id, manifest)
+
+    _prune_snapshots()
+    logger.info(f"スナップショット作成完了: {snapshot_id} "
+                f"({len(partitions)}パーティション, 新規 {stored_bytes / 1024:.1f} KB)")
+    return snapshot_id
+
+
+def restore_snapshot(snapshot_id: str) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    スナップショットから保存データを復元する（各パーティションは内容のハッシュで検証）
+
+    Returns:
+        (main_data.pkl に保存する辞書, metadata.json の内容)
+    """
+    manifest = load_snapshot_manifest(snapshot_id)
+    if manifest is None:
+        raise FileNotFoundError(f"スナップショットが見つかりません: {snapshot_id}")
+
+    saved_data = dict(_read_payload(manifest['meta_object']))
+    df = None
+    if manifest['has_df']:
+        parts = []
+        for partition in manifest['partitions']:
+            part = _read_payload(partition['object'])
+            if compute_data_version(part) != partition['object']:
+                raise ValueError(f"バックアップデータが破損しています: {partition['key']}")
+            parts.append(part)
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        if manifest['row_order_object']:
+            df = df.iloc[_read_payload(manifest['row_order_object'])].reset_index(drop=True)
+        if manifest['index_object']:
+            df.index = _read_payload(manifest['index_object'])
+        if saved_data.get('data_version'):
+            set_data_version(df, saved_data['data_version'])
+    saved_data['df'] = df
+    return saved_data, manifest.get('metadata')
+
+
+def list_snapshots() -> List[Dict[str, Any]]:
+    """スナップショットの一覧（新しい順）"""
+    if not os.path.isdir(SNAPSHOTS_DIR):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(SNAPSHOTS_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        manifest = load_snapshot_manifest(name[:-len(".json")])
+        if manifest is None:
+            continue
+        snapshots.append({
+            'snapshot_id': manifest['snapshot_id'],
+            'created_at': manifest['created_at'],
+            'rows': manifest['rows'],
+            'partitions': [p['key'] for p in manifest['partitions']],
+            'stored_bytes': manifest['stored_bytes'],
+            'total_bytes': manifest['total_bytes'],
+            'has_metadata': manifest.get('metadata') is not None,
+        })
+    return snapshots
+
+
+def snapshot_exists(snapshot_id: Optional[str]) -> bool:
+    """スナップショットのマニフェストがあるか"""
+    return bool(snapshot_id) and os.path.exists(_manifest_path(snapshot_id))
+
+
+def load_snapshot_manifest(snapshot_id: str) -> Optional[Dict[str, Any]]:
+    """スナップショットのマニフェストを読み込む"""
+    try:
+        with open(_manifest_path(snapshot_id), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"スナップショットの読み込みに失敗しました ({snapshot_id}): {e}")
+        return None
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def get_store_size() -> int:
+    """バックアップ（オブジェクトとマニフェスト）の合計サイズ（バイト）"""
+    total = 0
+    for directory in (OBJECTS_DIR, SNAPSHOTS_DIR):
+        for root, _, files in os.walk(directory):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def export_package(snapshot_id: str, output, extra_files: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    スナップショットをデータパッケージ（ZIP）として書き出す
+
+    圧縮済みのオブジェクトは無圧縮エントリとしてそのままコピーし、
+    各エントリの SHA-256 をパッケージのマニフェストに記録する。
+
+    Args:
+        snapshot_id: 書き出すスナップショット
+        output: 出力先（パスまたは書き込み可能なファイルオブジェクト）
+        extra_files: 一緒に書き出すファイル {パッケージ内の名前: パス}（設定ファイルなど）
+
+    Returns:
+        パッケージのマニフェスト
+    """
+    manifest = load_snapshot_manifest(snapshot_id)
+    if manifest is None:
+        raise FileNotFoundError(f"スナップショットが見つかりません: {snapshot_id}")
+
+    entries = []
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED, allowZip64=True) as zipf:
+        for object_id in sorted(_referenced_objects(manifest)):
+            entries.append(_copy_into_zip(zipf, _object_path(object_id), f"objects/{object_id}.pkl.z",
+                                          zipfile.ZIP_STORED))
+        for name, path in (extra_files or {}).items():
+            if os.path.exists(path):
+                entries.append(_copy_into_zip(zipf, path, f"files/{name}", zipfile.ZIP_DEFLATED))
+
+        package_manifest = {
+            'format': PACKAGE_FORMAT,
+            'format_version': PACKAGE_FORMAT_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'snapshot': manifest,
+            'entries': entries,
+        }
+        zipf.writestr(PACKAGE_MANIFEST_NAME, json.dumps(package_manifest, ensure_ascii=False, indent=2, default=str))
+
+    logger.info(f"データパッケージ書き出し完了: {snapshot_id} ({len(entries)}エントリ)")
+    return package_manifest
+
+
+def read_package_manifest(zipf: zipfile.ZipFile) -> Optional[Dict[str, Any]]:
+    """データパッケージのマニフェストを読み込む（旧形式のZIPは None）"""
+    if PACKAGE_MANIFEST_NAME not in zipf.namelist():
+        return None
+    package_manifest = json.loads(zipf.read(PACKAGE_MANIFEST_NAME).decode('utf-8'))
+    if package_manifest.get('format') != PACKAGE_FORMAT:
+        return None
+    if package_manifest.get('format_version') != PACKAGE_FORMAT_VERSION:
+        raise ValueError(f"対応していないパッケージ形式です: {package_manifest.get('format_version')}")
+    return package_manifest
+
+
+def import_package(zipf: zipfile.ZipFile, package_manifest: Dict[str, Any],
+                   merge_into: Optional[str] = None) -> str:
+    """
+    データパッケージを取り込み、新しいスナップショットを作成する
+
+    手元にないオブジェクトだけをチェックサムを確認しながら展開する。
+    merge_into を指定すると、そのスナップショットにパッケージの年度パーティションを統合する
+    （同じ年度は置き換え、パッケージにない年度は手元のものを残す）。
+
+    Returns:
+        作成したスナップショットID
+    """
+    os.makedirs(OBJECTS_DIR, exist_ok=True)
+    os.makedirs(SNAPSHOTS_DIR, exist_ok=True)
+
+    imported = 0
+    imported_bytes = 0
+    for entry in package_manifest['entries']:
+        if not entry['name'].startswith("objects/"):
+            continue
+        object_id = os.path.basename(entry['name'])[:-len(".pkl.z")]
+        path = _object_path(object_id)
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _extract_verified(zipf, entry, path)
+        imported += 1
+        imported_bytes += entry['size']
+
+    snapshot = package_manifest['snapshot']
+    missing = [o for o in _referenced_objects(snapshot) if not os.path.exists(_object_path(o))]
+    if missing:
+        raise ValueError(f"パッケージに含まれていないデータがあります: {len(missing)}件")
+
+    base = load_snapshot_manifest(merge_into) if merge_into else None
+    if base is not None and base['has_df'] and snapshot['has_df']:
+        snapshot = _merge_snapshots(base, snapshot)
+
+    snapshot_id = _new_snapshot_id()
+    manifest = dict(snapshot, snapshot_id=snapshot_id, created_at=datetime.now().isoformat(),
+                    stored_bytes=imported_bytes)
+    manifest['total_bytes'] = sum(_object_size(object_id) for object_id in _referenced_objects(manifest))
+    _write_manifest(snapshot_id, manifest)
+    _prune_snapshots()
+
+    logger.info(f"データパッケージ取り込み完了: {snapshot_id} (新規オブジェクト {imported}件"
+                f"{', 年度統合' if base is not None else ''})")
+    return snapshot_id
+
+
+def extract_package_file(zipf: zipfile.ZipFile, package_manifest: Dict[str, Any], name: str, path: str) -> bool:
+    """パッケージに含まれるファイル（files/<name>）をチェックサムを確認して書き出す"""
+    entry = next((e for e in package_manifest['entries'] if e['name'] == f"files/{name}"), None)
+    if entry is None:
+        return False
+    _extract_verified(zipf, entry, path)
+    return True
+
+
+def _merge_snapshots(base: Dict[str, Any], package: Dict[str, Any]) -> Dict[str, Any]:
+    """年度パーティションを統合したマニフェストを作成（年度順、日付のない行は最後）"""
+    partitions = {p['key']: p for p in base['partitions']}
+    partitions.update({p['key']: p for p in package['partitions']})
+    ordered = sorted(partitions.values(), key=lambda p: (p['key'] in ('unknown', 'all'), p['key']))
+
+    # 統合後は内容が変わるため、保存済みのデータバージョンは引き継がない
+    meta = dict(_read_payload(package['meta_object']))
+    meta['data_version'] = None
+    meta_object, _ = _write_payload(meta)
+
+    metadata = dict(package.get('metadata') or {})
+    metadata.update({'data_rows': sum(p['rows'] for p in ordered),
+                     'merged_partitions': [p['key'] for p in package['partitions']]})
+    return dict(package, partitions=ordered, rows=sum(p['rows'] for p in ordered),
+                index_object=None, row_order_object=None, meta_object=meta_object, metadata=metadata)
+
+
+def _copy_into_zip(zipf: zipfile.ZipFile, path: str, name: str, compress_type: int) -> Dict[str, Any]:
+    """ファイルをZIPエントリに逐次コピーし、SHA-256 を計算"""
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = compress_type
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as source, zipf.open(info, 'w', force_zip64=True) as target:
+        while chunk := source.read(COPY_BUFFER_SIZE):
+            digest.update(chunk)
+            target.write(chunk)
+            size += len(chunk)
+    return {'name': name, 'sha256': digest.hexdigest(), 'size': size}
+
+
+def _extract_verified(zipf: zipfile.ZipFile, entry: Dict[str, Any], path: str) -> None:
+    """ZIPエントリを逐次展開し、SHA-256 が一致した場合だけ書き出し先を置き換える"""
+    def _copy(f):
+        digest = hashlib.sha256()
+        with zipf.open(entry['name']) as source:
+            while chunk := source.read(COPY_BUFFER_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+        if digest.hexdigest() != entry['sha256']:
+            raise ValueError(f"チェックサムが一致しません: {entry['name']}")
+    atomic_write(path, _copy)
+
+
+def _partition_keys(df: pd.DataFrame) -> np.ndarray:
+    """各行のパーティション名（年度、日付のない行は 'unknown'）"""
+    date_col = next((col for col in DATE_COLUMNS if col in df.columns), None)
+    if date_col is None:
+        return np.full(len(df), 'all', dtype=object)
+    dates = pd.to_datetime(df[date_col], errors='coerce')
+    fiscal_years = dates.dt.year - (dates.dt.month < 4)
+    return np.where(dates.isna(), 'unknown', fiscal_years.astype('Int64').astype(str)).astype(object)
+
+
+def _write_object(object_id: str, value: Any) -> int:
+    """内容のハッシュを名前にしてオブジェクトを圧縮保存（既にあれば書き込まない）"""
+    path = _object_path(object_id)
+    if os.path.exists(path):
+        return 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), COMPRESSION_LEVEL)
+    atomic_write(path, lambda f: f.write(compressed))
+    return len(compressed)
+
+
+def _write_payload(value: Any) -> Tuple[str, int]:
+    """DataFrame以外の値を pickle のハッシュを名前にして保存"""
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    object_id = f"p-{hashlib.blake2b(payload, digest_size=16).hexdigest()}"
+    path = _object_path(object_id)
+    if os.path.exists(path):
+        return object_id, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zlib.compress(payload, COMPRESSION_LEVEL)
+    atomic_write(path, lambda f: f.write(compressed))
+    return object_id, len(compressed)
+
+
+def _read_payload(object_id: str) -> Any:
+    """オブジェクトを読み込んで展開（pickle のハッシュで保存したものはここで検証）"""
+    with open(_object_path(object_id), 'rb') as f:
+        payload = zlib.decompress(f.read())
+    if object_id.startswith("p-") and hashlib.blake2b(payload, digest_size=16).hexdigest() != object_id[2:]:
+        raise ValueError(f"バックアップデータが破損しています: {object_id}")
+    return pickle.loads(payload)
+
+
+def _object_path(object_id: str) -> str:
+    digest = object_id.split('-')[-1]
+    return os.path.join(OBJECTS_DIR, digest[:2], f"{object_id}.pkl.z")
+
+
+def _object_size(object_id: str) -> int:
+    try:
+        return os.path.getsize(_object_path(object_id))
+    except OSError:
+        return 0
+
+
+def _manifest_path(snapshot_id: str) -> str:
+    return os.path.join(SNAPSHOTS_DIR, f"{snapshot_id}.json")
+
+
+def _new_snapshot_id() -> str:
+    """作成日時のID（既存の最新スナップショット以前になる場合はその1秒後）"""
+    snapshot_time = datetime.now().replace(microsecond=0)
+    existing = sorted(name[:-len(".json")] for name in os.listdir(SNAPSHOTS_DIR) if name.endswith(".json"))
+    if existing:
+        try:
+            snapshot_time = max(snapshot_time, datetime.strptime(existing[-1], "%Y%m%d_%H%M%S") + timedelta(seconds=1))
+        except ValueError:
+            pass
+    return f"{snapshot_time:%Y%m%d_%H%M%S}"
+
+
+def _write_manifest(snapshot_id: str, manifest: Dict[str, Any]) -> None:
+    data = json.dumps(manifest, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+    atomic_write(_manifest_path(snapshot_id), lambda f: f.write(data))
+
+
+def _referenced_objects(manifest: Dict[str, Any]) -> set:
+    """マニフェストが参照するオブジェクトID"""
+    objects = {p['object'] for p in manifest['partitions']}
+    objects.update(o for o in (manifest['index_object'], manifest['row_order_object'], manifest['meta_object']) if o)
+    return objects
+
+
+def _prune_snapshots() -> None:
+    """古いスナップショットを KEEP_SNAPSHOTS 個まで削除し、参照されなくなったオブジェクトを削除"""
+    names = sorted(name for name in os.listdir(SNAPSHOTS_DIR) if name.endswith(".json"))
+    if len(names) <= KEEP_SNAPSHOTS:
+        return
+    for name in names[:-KEEP_SNAPSHOTS]:
+        os.remove(os.path.join(SNAPSHOTS_DIR, name))
+
+    referenced = set()
+    for name in names[-KEEP_SNAPSHOTS:]:
+        manifest = load_snapshot_manifest(name[:-len(".json")])
+        if manifest is None:
+            # 読めないマニフェストがある間は、参照中のオブジェクトを消さないよう削除を見送る
+            return
+        referenced |= _referenced_objects(manifest)
+
+    for root, _, files in os.walk(OBJECTS_DIR):
+        for file_name in files:
+            if file_name.endswith(".pkl.z") and file_name[:-len(".pkl.z")] not in referenced:
+                os.remove(os.path.join(root, file_name))
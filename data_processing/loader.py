@@ -1,9 +1,12 @@
 # data_processing/loader.py
 import pandas as pd
-import streamlit as st
+import logging
 from utils import date_helpers
+from utils.cache import cached, set_data_version
 
-@st.cache_data(ttl=3600)
+logger = logging.getLogger(__name__)
+
+@cached(ttl=3600)
 def preprocess_dataframe(df):
     """
     データフレームに対して、アプリケーションで必要な前処理を一度にすべて実行する。
@@ -60,9 +63,11 @@ def _load_single_file(uploaded_file):
     raise ValueError(f"ファイル '{uploaded_file.name}' の読み込みに失敗しました。")
 
 
-def load_and_merge_files(base_file, update_files):
+def load_and_merge_files(base_file, update_files, on_warning=None):
     """
     基礎データと更新データを読み込み、前処理して結合する。
+
+    :param on_warning: 読み込めなかった更新ファイルの通知先（UIでは st.warning を渡す。省略時はログのみ）
     """
     if not base_file:
         return pd.DataFrame()
@@ -75,11 +80,16 @@ def load_and_merge_files(base_file, update_files):
             try:
                 update_dfs.append(_load_single_file(f))
             except ValueError as e:
-                st.warning(e)
+                logger.warning(e)
+                if on_warning is not None:
+                    on_warning(e)
 
     # 全データを結合してから一度だけ前処理を実行
     combined_df = pd.concat([df_base] + update_dfs, ignore_index=True)
     processed_df = preprocess_dataframe(combined_df)
     processed_df.sort_values(by="手術実施日_dt", inplace=True)
+    processed_df = processed_df.reset_index(drop=True)
 
-    return processed_df.reset_index(drop=True)
\ No newline at end of file
+    # 以降のキャッシュキーに使うデータバージョンを結合時に一度だけ計算
+    set_data_version(processed_df)
+    return processed_df
\ No newline at end of file
@@ -0,0 +1,264 @@
+# data_processing/precomputed.py
+"""
+事前計算結果（夜間バッチの成果物）の保存・読み込みモジュール
+
+saved_data/precomputed/<バージョン>/ に集計表・ハイスコア・予測結果を保存し、
+アプリ起動時に最新バージョンをメモリマップで開く。
+表は列ごとの .npy（数値・日付）と pickle（文字列などのオブジェクト列）に分けて保存する。
+"""
+
+import pandas as pd
+import numpy as np
+import json
+import logging
+import os
+import pickle
+import shutil
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTED_DIR = os.path.join("saved_data", "precomputed")
+LATEST_POINTER_FILE = os.path.join(PRECOMPUTED_DIR, "LATEST")
+MANIFEST_NAME = "manifest.json"
+ARTIFACT_FORMAT_VERSION = 1
+
+# 保持するバージョン数（古いものから削除）
+KEEP_VERSIONS = 3
+
+# 起動時に読み込んだ最新バージョン（マニフェストと読み込み済みの成果物）
+# プロセス内の全セッションで共有するため、取得時にデータ指紋を照合する
+_ACTIVE: Dict[str, Any] = {}
+
+
+def create_version(data_fingerprint: str, target_dict: Optional[Dict[str, float]] = None,
+                   latest_date: Optional[pd.Timestamp] = None) -> str:
+    """
+    新しいバージョンのディレクトリを作成する（書き込み完了までは LATEST を更新しない）
+
+    Returns:
+        バージョン名（作成日時＋データ指紋の先頭）
+    """
+    version = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{data_fingerprint.split('-')[-1][:8]}"
+    os.makedirs(os.path.join(PRECOMPUTED_DIR, version), exist_ok=True)
+    _write_manifest(version, {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'version': version,
+        'created_at': datetime.now().isoformat(),
+        'data_fingerprint': data_fingerprint,
+        'target_key': target_key(target_dict),
+        'latest_date': latest_date.isoformat() if latest_date is not None else None,
+        'artifacts': {},
+    })
+    return version
+
+
+def save_table(version: str, name: str, df: pd.DataFrame) -> None:
+    """DataFrameを列ごとに保存（数値・日付列は .npy、その他は pickle）"""
+    table_dir = os.path.join(PRECOMPUTED_DIR, version, name)
+    os.makedirs(table_dir, exist_ok=True)
+
+    columns = []
+    object_columns = {}
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series) and getattr(series.dt, 'tz', None) is None:
+            values = series.to_numpy(dtype='datetime64[ns]').view('int64')
+            np.save(os.path.join(table_dir, f"{i}.npy"), values)
+            columns.append({'name': str(col), 'kind': 'datetime'})
+        elif pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            if series.isna().any() and not pd.api.types.is_float_dtype(series):
+                values = series.to_numpy(dtype=float)
+            else:
+                values = series.to_numpy()
+            np.save(os.path.join(table_dir, f"{i}.npy"), values)
+            columns.append({'name': str(col), 'kind': 'array'})
+        else:
+            object_columns[str(col)] = series.tolist()
+            columns.append({'name': str(col), 'kind': 'object'})
+
+    if object_columns:
+        with open(os.path.join(table_dir, "objects.pkl"), 'wb') as f:
+            pickle.dump(object_columns, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    _register_artifact(version, name, {'type': 'table', 'rows': len(df), 'columns': columns})
+
+
+def save_object(version: str, name: str, obj: Any) -> None:
+    """表以外の結果（辞書・リストなど）を pickle で保存"""
+    path = os.path.join(PRECOMPUTED_DIR, version, f"{name}.pkl")
+    with open(path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    _register_artifact(version, name, {'type': 'object'})
+
+
+def publish_version(version: str) -> None:
+    """LATEST を新しいバージョンに切り替え、古いバージョンを削除する"""
+    temp_path = f"{LATEST_POINTER_FILE}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(temp_path, LATEST_POINTER_FILE)
+    _prune_versions()
+    logger.info(f"事前計算結果を公開しました: {version}")
+
+
+def get_latest_version() -> Optional[str]:
+    """公開済みの最新バージョン名を取得"""
+    try:
+        with open(LATEST_POINTER_FILE, 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+        return version if os.path.isdir(os.path.join(PRECOMPUTED_DIR, version)) else None
+    except OSError:
+        return None
+
+
+def load_manifest(version: str) -> Optional[Dict[str, Any]]:
+    """バージョンのマニフェストを読み込む"""
+    try:
+        with open(os.path.join(PRECOMPUTED_DIR, version, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"事前計算マニフェストの読み込みに失敗しました: {e}")
+        return None
+
+
+def load_table(version: str, name: str, mmap: bool = True) -> pd.DataFrame:
+    """保存した表を読み込む（数値・日付列はメモリマップで開く）"""
+    manifest = load_manifest(version) or {}
+    spec = manifest.get('artifacts', {}).get(name)
+    if spec is None or spec.get('type') != 'table':
+        raise KeyError(f"事前計算結果がありません: {name}")
+
+    table_dir = os.path.join(PRECOMPUTED_DIR, version, name)
+    object_columns = {}
+    if any(col['kind'] == 'object' for col in spec['columns']):
+        with open(os.path.join(table_dir, "objects.pkl"), 'rb') as f:
+            object_columns = pickle.load(f)
+
+    data = {}
+    for i, col in enumerate(spec['columns']):
+        if col['kind'] == 'object':
+            data[col['name']] = pd.Series(object_columns[col['name']])
+            continue
+        values = np.load(os.path.join(table_dir, f"{i}.npy"), mmap_mode='r' if mmap else None)
+        if col['kind'] == 'datetime':
+            values = np.asarray(values).view('datetime64[ns]')
+        data[col['name']] = pd.Series(values, copy=False)
+    return pd.DataFrame(data, index=pd.RangeIndex(spec['rows']), copy=False)
+
+
+def load_object(version: str, name: str) -> Any:
+    """保存した表以外の結果を読み込む"""
+    with open(os.path.join(PRECOMPUTED_DIR, version, f"{name}.pkl"), 'rb') as f:
+        return pickle.load(f)
+
+
+def activate_latest(data_fingerprint: str) -> bool:
+    """
+    最新バージョンがデータ指紋に一致すれば、アプリで使う事前計算結果として登録する
+
+    一致しない場合も、他のセッションが使っている登録済みの結果はそのまま残す。
+
+    Returns:
+        登録できたか（成果物がない・データが更新済みの場合は False）
+    """
+    version = get_latest_version()
+    if version is None:
+        return False
+    if _ACTIVE.get('version') == version:
+        return _ACTIVE['manifest'].get('data_fingerprint') == data_fingerprint
+
+    manifest = load_manifest(version)
+    if not manifest or manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        return False
+    if manifest.get('data_fingerprint') != data_fingerprint:
+        logger.info(f"事前計算結果はデータ更新前のものです（{version}）")
+        return False
+
+    _ACTIVE.clear()
+
+    _ACTIVE.update({'version': version, 'manifest': manifest, 'loaded': {}})
+    logger.info(f"事前計算結果を使用します: {version}")
+    return True
+
+
+def get_active(name: str, target_dict: Optional[Dict[str, float]] = None,
+               data_fingerprint: Optional[str] = None) -> Any:
+    """
+    登録済みの事前計算結果を取得（ない場合は None）
+
+    Args:
+        name: 成果物名
+        target_dict: 目標値に依存する成果物の場合は現在の目標値辞書（事前計算時と異なれば None）
+        data_fingerprint: 表示中のデータの指紋（事前計算時と異なれば None）
+    """
+    if not _ACTIVE:
+        return None
+    if data_fingerprint is not None and data_fingerprint != _ACTIVE['manifest'].get('data_fingerprint'):
+        return None
+    if target_dict is not None and target_key(target_dict) != _ACTIVE['manifest'].get('target_key'):
+        return None
+    spec = _ACTIVE['manifest'].get('artifacts', {}).get(name)
+    if spec is None:
+        return None
+
+    loaded = _ACTIVE['loaded']
+    if name not in loaded:
+        try:
+            if spec['type'] == 'table':
+                loaded[name] = load_table(_ACTIVE['version'], name)
+            else:
+                loaded[name] = load_object(_ACTIVE['version'], name)
+        except Exception as e:
+            logger.warning(f"事前計算結果の読み込みに失敗しました ({name}): {e}")
+            return None
+    return loaded[name]
+
+
+def get_active_info() -> Optional[Dict[str, Any]]:
+    """登録済みバージョンの情報（バージョン名・作成日時・成果物一覧）"""
+    if not _ACTIVE:
+        return None
+    manifest = _ACTIVE['manifest']
+    return {
+        'version': manifest['version'],
+        'created_at': manifest.get('created_at'),
+        'latest_date': manifest.get('latest_date'),
+        'artifacts': sorted(manifest.get('artifacts', {})),
+    }
+
+
+def deactivate() -> None:
+    """登録済みの事前計算結果を破棄（全セッション共通。データ更新時は get_active の指紋照合で除外される）"""
+    _ACTIVE.clear()
+
+
+def target_key(target_dict: Optional[Dict[str, float]]) -> list:
+    """目標値辞書をマニフェスト保存・比較用のリストに変換"""
+    return [[str(k), str(v)] for k, v in sorted((target_dict or {}).items(), key=lambda item: str(item[0]))]
+
+
+def _register_artifact(version: str, name: str, spec: Dict[str, Any]) -> None:
+    """マニフェストに成果物を追記"""
+    manifest = load_manifest(version)
+    manifest['artifacts'][name] = spec
+    _write_manifest(version, manifest)
+
+
+def _write_manifest(version: str, manifest: Dict[str, Any]) -> None:
+    """マニフェストを一時ファイル経由で書き込み"""
+    path = os.path.join(PRECOMPUTED_DIR, version, MANIFEST_NAME)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(temp_path, path)
+
+
+def _prune_versions() -> None:
+    """公開中のバージョンを残し、古いバージョンを KEEP_VERSIONS 個まで削除"""
+    latest = get_latest_version()
+    versions = sorted(entry.name for entry in os.scandir(PRECOMPUTED_DIR) if entry.is_dir())
+    for version in versions[:-KEEP_VERSIONS]:
+        if version != latest:
+            shutil.rmtree(os.path.join(PRECOMPUTED_DIR, version), ignore_errors=True)
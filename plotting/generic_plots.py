@@ -2,7 +2,6 @@
 import streamlit as st
 import pandas as pd  # 追加：pandasのインポート
 import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime
 
 def display_kpi_metrics(kpi_summary):
@@ -158,6 +157,11 @@ def create_forecast_chart(result_df, title):
             if forecast_date_col == '月':
                 connector['月'] = connector['month_start']
             
+            # 予測区間も実績の最終点から広がるようにする
+            for bound_col in ('下限', '上限'):
+                if bound_col in forecast_df.columns:
+                    connector[bound_col] = connector[value_col]
+            
             forecast_df = pd.concat([connector, forecast_df], ignore_index=True)
             
     elif 'タイプ' in result_df.columns:
@@ -189,6 +193,26 @@ def create_forecast_chart(result_df, title):
             marker=dict(size=6)
         ))
     
+    # 予測区間（下限・上限）の帯
+    if not forecast_df.empty and {'下限', '上限'} <= set(forecast_df.columns) and forecast_df['上限'].notna().any():
+        fig.add_trace(go.Scatter(
+            x=forecast_df[forecast_date_col],
+            y=forecast_df['上限'],
+            mode='lines',
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=forecast_df[forecast_date_col],
+            y=forecast_df['下限'],
+            name='95%予測区間',
+            mode='lines',
+            line=dict(width=0),
+            fill='tonexty',
+            fillcolor='rgba(255, 0, 0, 0.15)'
+        ))
+    
     # 予測データのプロット
     if not forecast_df.empty:
         fig.add_trace(go.Scatter(
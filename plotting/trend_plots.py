@@ -82,4 +82,24 @@ def create_quarterly_summary_chart(summary_df, title, target_dict):
     fig.update_layout(title=title, xaxis_title="四半期", yaxis_title="平日1日平均件数", **sc.LAYOUT_DEFAULTS)
     return fig
 
+def create_high_score_history_chart(history_df, title, top_n=5):
+    """ハイスコア週次推移グラフを作成（最新週の上位N診療科）"""
+    fig = go.Figure()
+    if history_df.empty:
+        return fig.update_layout(title="グラフデータがありません")
+
+    latest = history_df[history_df['anchor_date'] == history_df['anchor_date'].max()]
+    top_entities = latest.sort_values('rank')['entity_name'].head(top_n)
+
+    for entity in top_entities:
+        entity_df = history_df[history_df['entity_name'] == entity]
+        fig.add_trace(go.Scatter(
+            x=entity_df['anchor_date'], y=entity_df['total_score'], mode='lines+markers', name=str(entity),
+            customdata=entity_df[['grade', 'rank']],
+            hovertemplate='%{x|%Y/%m/%d}<br>%{y:.1f}点 (%{customdata[0]}グレード, %{customdata[1]}位)<extra>' + str(entity) + '</extra>'
+        ))
+
+    fig.update_layout(title=title, xaxis_title="基準日", yaxis_title="総合スコア", **sc.LAYOUT_DEFAULTS)
+    return fig
+
 # 診療科別の月次・四半期グラフも同様にここに追加可能
\ No newline at end of file
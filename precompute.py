@@ -0,0 +1,118 @@
+# precompute.py
+"""
+夜間事前計算ジョブ（Streamlit外で実行するコマンドラインツール）
+
+保存済みデータを読み込み、週次集計・ハイスコア・一括予測・週次予測を計算して
+saved_data/precomputed/ にバージョン付きの成果物として書き出す。
+アプリは起動時にデータ指紋が一致する最新バージョンを読み込む。
+
+使い方:
+    python precompute.py
+    python precompute.py --skip-forecasts
+    python precompute.py --skip-sql-store
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+import pandas as pd
+
+from analysis import forecasting, surgery_high_score, weekly, weekly_forecast
+from data_processing import analytic_store, precomputed
+
+logger = logging.getLogger("precompute")
+
+
+def run(skip_forecasts: bool = False, engine: str = forecasting.DEFAULT_ENGINE,
+        skip_sql_store: bool = False) -> bool:
+    """
+    事前計算を実行して成果物を公開する
+
+    各ステップは個別に実行し、失敗したステップがあっても残りの成果物は保存する。
+
+    Returns:
+        全ステップが成功したか
+    """
+    from data_persistence import load_data_from_file
+
+    df, target_dict, _ = load_data_from_file()
+    if df is None or df.empty:
+        logger.error("保存済みデータがありません。先にアプリでデータを保存してください。")
+        return False
+    target_dict = target_dict or {}
+    latest_date = df['手術実施日_dt'].max()
+
+    fingerprint = surgery_high_score.get_data_fingerprint(df)
+    version = precomputed.create_version(fingerprint, target_dict, latest_date)
+    logger.info(f"事前計算開始: {len(df):,}件, 最新日 {latest_date:%Y/%m/%d}, バージョン {version}")
+
+    steps = [
+        ('集計表', lambda: _precompute_aggregates(version, df)),
+        ('ハイスコア', lambda: _precompute_high_scores(version, df, target_dict)),
+    ]
+    if not skip_forecasts:
+        steps.append(('予測', lambda: _precompute_forecasts(version, df, target_dict, latest_date, engine)))
+    if not skip_sql_store:
+        steps.append(('分析用SQLストア', lambda: analytic_store.build_store(df)))
+
+    succeeded = True
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+            logger.info(f"{name}: 完了 ({time.perf_counter() - started:.1f}秒)")
+        except Exception as e:
+            logger.error(f"{name}: 失敗 ({e})")
+            succeeded = False
+
+    precomputed.publish_version(version)
+    return succeeded
+
+
+def _precompute_aggregates(version, df):
+    """病院全体・診療科別の週次サマリー（期間で絞り込まない集計のみ。期間別の集計は各ページで行う）"""
+    departments = sorted(df['実施診療科'].dropna().unique())
+
+    weekly_frames = [weekly.get_summary(df).assign(対象=forecasting.HOSPITAL_LABEL)]
+    for department in departments:
+        weekly_frames.append(weekly.get_summary(df, department).assign(対象=department))
+    precomputed.save_table(version, 'weekly_summary', pd.concat(weekly_frames, ignore_index=True))
+
+
+def _precompute_high_scores(version, df, target_dict):
+    """全評価期間の診療科・術者ハイスコアとスコア推移（メモ化キャッシュごと保存）"""
+    for period in surgery_high_score.PERIOD_WEEKS:
+        surgery_high_score.get_surgery_high_scores(df, target_dict, period)
+        surgery_high_score.calculate_surgery_high_score_history(df, target_dict, period)
+        if '実施術者' in df.columns:
+            surgery_high_score.get_surgeon_high_scores(df, None, period)
+    precomputed.save_object(version, 'high_score_cache', surgery_high_score.export_high_score_cache(df))
+
+
+def _precompute_forecasts(version, df, target_dict, latest_date, engine):
+    """年度末までの一括予測、年度目標達成確率、週次予測（既定の予測週数）"""
+    batch_df = forecasting.predict_future_batch(df, latest_date, target_dict, engine=engine)
+    precomputed.save_table(version, f'batch_forecast_fiscal_year_{engine}', batch_df)
+    precomputed.save_table(version, f'target_probabilities_{engine}',
+                           forecasting.calculate_target_probabilities(df, latest_date, target_dict, engine=engine))
+    if target_dict:
+        precomputed.save_table(version, 'weekly_forecast', weekly_forecast.forecast_weekly(
+            df, target_dict, horizon_weeks=weekly_forecast.DEFAULT_HORIZON_WEEKS))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="手術ダッシュボードの夜間事前計算ジョブ")
+    parser.add_argument('--skip-forecasts', action='store_true', help="予測の事前計算を省略する")
+    parser.add_argument('--engine', choices=list(forecasting.FORECAST_ENGINES), default=forecasting.DEFAULT_ENGINE,
+                        help="一括予測の計算エンジン")
+    parser.add_argument('--skip-sql-store', action='store_true', help="分析用SQLストアの作成を省略する")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    return 0 if run(skip_forecasts=args.skip_forecasts, engine=args.engine, skip_sql_store=args.skip_sql_store) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# reporting/chart_images.py
+"""
+レポート用グラフ画像の作成（並列化・キャッシュ）
+
+Plotly グラフの PNG 化（kaleido）はレポート生成で最も時間のかかる処理のため、
+- kaleido のレンダラー（Chromium）を起動したままにして呼び出しごとの起動を省き、
+- 複数のグラフを画像化スレッドで同時に作成し、
+- 作成した PNG をグラフ定義（JSON）と画像サイズのハッシュをキーに保持する。
+グラフが変わっていなければ、2回目以降のレポートでは画像化を行わない。
+
+    images = render_figures({"週次推移": fig1, "診療科別": fig2}, width=800, height=400)
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import plotly.io as pio
+
+from utils.perf_metrics import span
+
+logger = logging.getLogger(__name__)
+
+# 同時に画像化するグラフ数（kaleido のタブ数。描画は Chromium 側で行うため1コアでも2並列にする）
+RENDER_WORKERS = max(2, min(4, os.cpu_count() or 1))
+
+# 保持する画像数（古いものから破棄）
+IMAGE_CACHE_SIZE = 64
+
+# 画像化スレッド（初回の画像化時に kaleido のレンダラーと一緒に起動する）
+_RENDER_EXECUTOR: "ThreadPoolExecutor | None" = None
+_RENDER_LOCK = threading.Lock()
+
+# 画像キー → PNG
+_IMAGES: "OrderedDict[str, bytes]" = OrderedDict()
+_IMAGES_LOCK = threading.Lock()
+_STATS = {'hits': 0, 'misses': 0}
+
+
+def figure_key(fig: Any, width: int, height: int, scale: float = 1) -> str:
+    """グラフ定義と画像サイズから画像キーを作成（go.Figure / dict のどちらでもよい）"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pio.to_json(fig, validate=False).encode('utf-8'))
+    digest.update(f"|{width}x{height}@{scale}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def fig_to_png(fig: Any, width: int, height: int, scale: float = 1) -> Optional[bytes]:
+    """グラフを1件 PNG にする（画像化済みのグラフはキャッシュを返す）"""
+    if fig is None:
+        return None
+    key = figure_key(fig, width, height, scale)
+    png = _get_cached(key)
+    if png is None:
+        _get_executor()
+        png = _render(key, fig, width, height, scale)
+    return png
+
+
+def render_figures(figures: Dict[str, Any], width: int, height: int, scale: float = 1) -> Dict[str, Optional[bytes]]:
+    """
+    複数のグラフを並列で PNG にする
+
+    同じ定義のグラフは1回だけ画像化し、画像化済みのものはキャッシュを使う。
+
+    Args:
+        figures: {グラフ名: go.Figure または dict}
+
+    Returns:
+        {グラフ名: PNG}（画像化できなかったグラフは None）
+    """
+    keys = {name: figure_key(fig, width, height, scale) for name, fig in figures.items() if fig is not None}
+    images = {key: _get_cached(key) for key in set(keys.values())}
+    pending = {key for key, png in images.items() if png is None}
+
+    if pending:
+        with span("グラフ画像化", kind='analysis'):
+            executor = _get_executor()
+            futures = {}
+            for name, key in keys.items():
+                if key in pending and key not in futures:
+                    futures[key] = executor.submit(_render, key, figures[name], width, height, scale)
+            for key, future in futures.items():
+                try:
+                    images[key] = future.result()
+                except Exception as e:
+                    names = [name for name, k in keys.items() if k == key]
+                    logger.error(f"グラフ画像化エラー ({', '.join(names)}): {e}")
+
+    return {name: images.get(keys[name]) if name in keys else None for name in figures}
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """画像キャッシュの件数とヒット数"""
+    with _IMAGES_LOCK:
+        return {'images': len(_IMAGES), **_STATS}
+
+
+def clear_image_cache() -> None:
+    """保持している画像を破棄"""
+    with _IMAGES_LOCK:
+        _IMAGES.clear()
+
+
+def _get_cached(key: str) -> Optional[bytes]:
+    with _IMAGES_LOCK:
+        png = _IMAGES.get(key)
+        if png is None:
+            _STATS['misses'] += 1
+            return None
+        _IMAGES.move_to_end(key)
+        _STATS['hits'] += 1
+        return png
+
+
+def _render(key: str, fig: Any, width: int, height: int, scale: float) -> bytes:
+    """kaleido で画像化してキャッシュに保存"""
+    png = pio.to_image(fig, format='png', width=width, height=height, scale=scale)
+    with _IMAGES_LOCK:
+        _IMAGES[key] = png
+        _IMAGES.move_to_end(key)
+        while len(_IMAGES) > IMAGE_CACHE_SIZE:
+            _IMAGES.popitem(last=False)
+    return png
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """画像化スレッドを取得（初回は kaleido のレンダラーも起動する）"""
+    global _RENDER_EXECUTOR
+    with _RENDER_LOCK:
+        if _RENDER_EXECUTOR is None:
+            _start_renderer()
+            _RENDER_EXECUTOR = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="chart-render")
+        return _RENDER_EXECUTOR
+
+
+def _start_renderer() -> None:
+    """
+    kaleido のレンダラーを常駐させる
+
+    kaleido 1.x は呼び出しごとに Chromium を起動するため、常駐サーバーを起動して
+    pio.to_image から使い回す。0.x はもともと常駐プロセスを使い回すため何もしない。
+    """
+    try:
+        import kaleido
+    except ImportError:
+        logger.warning("kaleidoがインストールされていません。グラフの画像化はできません")
+        return
+
+    start_sync_server = getattr(kaleido, 'start_sync_server', None)
+    if start_sync_server is None:
+        return
+    try:
+        start_sync_server(n=RENDER_WORKERS, silence_warnings=True)
+        atexit.register(kaleido.stop_sync_server, silence_warnings=True)
+        logger.info(f"kaleidoレンダラーを起動しました (タブ数: {RENDER_WORKERS})")
+    except Exception as e:
+        logger.warning(f"kaleidoレンダラーを常駐できません（呼び出しごとに起動します）: {e}")
@@ -0,0 +1,158 @@
+# reporting/pdf_jobs.py
+"""
+PDFレポートのバックグラウンド生成とキャッシュ
+
+PDFはボタンが押されたときだけ、描画スレッドとは別の生成スレッドで作成する。
+生成結果は (レポート種別, データバージョン, 期間, 診療科) をキーに保持し、同じ条件では
+再生成せずにダウンロードボタンをすぐに表示する。画面の操作（再実行）ごとには何も生成しない。
+
+    key = report_key('dashboard', df, period_name)
+    render_report_download(key, build_pdf, "レポート.pdf")
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from ui.components.fragment import FRAGMENT_AVAILABLE, fragment
+from utils.cache import compute_data_version, get_data_version
+
+logger = logging.getLogger(__name__)
+
+# 保持するレポート数（古いものから破棄）
+PDF_CACHE_SIZE = 16
+
+# 生成中の状況を確認する間隔（秒）
+POLL_INTERVAL = 2
+
+# 生成スレッド（Streamlit の描画スレッドを止めない。生成は1件ずつ）
+_PDF_EXECUTOR: "ThreadPoolExecutor | None" = None
+
+# キー → {'state'（queued / running / done / failed）, 'pdf', 'file_name', 'error', 'requested_at', 'finished_at'}
+_REPORTS: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+_REPORTS_LOCK = threading.Lock()
+
+
+def report_key(kind: str, df: Optional[pd.DataFrame], period: Any, department: Optional[str] = None) -> Tuple:
+    """レポートのキャッシュキー（データはデータバージョンで識別し、内容をハッシュし直さない）"""
+    if df is None:
+        data_version = None
+    else:
+        data_version = get_data_version(df) or compute_data_version(df)
+    return (kind, data_version, str(period), department)
+
+
+def get_report(key: Tuple) -> Optional[Dict[str, Any]]:
+    """レポートの生成状態（未依頼は None）"""
+    with _REPORTS_LOCK:
+        report = _REPORTS.get(key)
+        if report is None:
+            return None
+        _REPORTS.move_to_end(key)
+        return dict(report)
+
+
+def request_report(key: Tuple, build_func: Callable[[], bytes], file_name: str) -> Dict[str, Any]:
+    """
+    レポートの生成を依頼する（すぐに戻る）
+
+    生成済み・生成中の同じキーは依頼し直さない（失敗したものは再依頼する）。
+
+    Args:
+        key: report_key() で作成したキー
+        build_func: PDFのバイト列を返す関数（生成スレッドで実行するため st.* を呼ばないこと）
+        file_name: ダウンロード時のファイル名
+    """
+    global _PDF_EXECUTOR
+    with _REPORTS_LOCK:
+        report = _REPORTS.get(key)
+        if report is not None and report['state'] != 'failed':
+            return dict(report)
+
+        report = {'state': 'queued', 'pdf': None, 'file_name': file_name, 'error': None,
+                  'requested_at': datetime.now(), 'finished_at': None}
+        _REPORTS[key] = report
+        _REPORTS.move_to_end(key)
+        while len(_REPORTS) > PDF_CACHE_SIZE:
+            _REPORTS.popitem(last=False)
+        if _PDF_EXECUTOR is None:
+            _PDF_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-report")
+    _PDF_EXECUTOR.submit(_run_report_job, key, report, build_func)
+    return dict(report)
+
+
+def clear_reports() -> None:
+    """生成済みレポートを破棄"""
+    with _REPORTS_LOCK:
+        _REPORTS.clear()
+
+
+def render_report_download(key: Tuple, build_func: Callable[[], bytes], file_name: str,
+                           button_label: str = "📄 PDFレポート生成", widget_key: str = "pdf_report") -> None:
+    """
+    PDFレポートの生成ボタン・生成状況・ダウンロードボタンを表示
+
+    生成済みならダウンロードボタンだけを表示する。生成中は状況を表示し、完了するまで
+    POLL_INTERVAL 秒ごとに確認して、完了・失敗したら画面を更新する。
+    """
+    report = get_report(key)
+
+    if report is None or report['state'] == 'failed':
+        if report is not None:
+            st.error(f"PDF生成エラー: {report['error']}")
+        if st.button(button_label, type="primary", use_container_width=True, key=f"{widget_key}_generate"):
+            report = request_report(key, build_func, file_name)
+        else:
+            return
+
+    if report['state'] in ('queued', 'running'):
+        _render_pending(key, widget_key)
+        return
+
+    st.download_button(
+        label="📥 PDFをダウンロード",
+        data=report['pdf'],
+        file_name=report['file_name'],
+        mime="application/pdf",
+        type="primary",
+        use_container_width=True,
+        key=f"{widget_key}_download"
+    )
+    st.caption(f"✅ {report['finished_at']:%H:%M:%S} に生成済み（データ・期間が変わるまで再生成しません）")
+
+
+@fragment("PDF生成状況", run_every=POLL_INTERVAL)
+def _render_pending(key: Tuple, widget_key: str) -> None:
+    """生成中の表示（このフラグメントだけを定期的に再実行し、完了したら画面全体を更新する）"""
+    report = get_report(key)
+    if report is None or report['state'] in ('done', 'failed'):
+        st.rerun()
+
+    st.info("⏳ PDFレポートを生成しています。完了するとダウンロードボタンが表示されます。")
+    if not FRAGMENT_AVAILABLE:
+        # 自動で再実行できない環境では手動で確認する
+        st.button("🔄 生成状況を更新", use_container_width=True, key=f"{widget_key}_refresh")
+
+
+def _run_report_job(key: Tuple, report: Dict[str, Any], build_func: Callable[[], bytes]) -> None:
+    """生成スレッドでPDFを作成（破棄されたレポートの結果は捨てる）"""
+    with _REPORTS_LOCK:
+        if _REPORTS.get(key) is not report:
+            return
+        report['state'] = 'running'
+    try:
+        pdf, state, error = build_func(), 'done', None
+        if not pdf:
+            pdf, state, error = None, 'failed', "PDFの生成に失敗しました"
+    except Exception as e:
+        logger.error(f"PDF生成エラー ({key[0]}): {e}")
+        pdf, state, error = None, 'failed', str(e)
+    with _REPORTS_LOCK:
+        report.update({'state': state, 'pdf': pdf, 'error': error, 'finished_at': datetime.now()})
+    logger.info(f"PDFレポート生成 {state}: {key[0]} {key[2]}")
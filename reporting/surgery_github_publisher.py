@@ -67,7 +67,6 @@ class SurgeryGitHubPublisher:
         """完全なHTMLコンテンツを生成"""
         try:
             from reporting.surgery_high_score_html import generate_complete_surgery_dashboard_html
-            from analysis.surgery_high_score import calculate_surgery_high_scores
             
             if include_high_score:
                 # ハイスコア機能付きHTML
@@ -12,8 +12,9 @@ logger = logging.getLogger(__name__)
 
 
 def generate_surgery_high_score_html(dept_scores: List[Dict[str, Any]], 
-                                   period: str = "直近12週") -> str:
-    """手術ハイスコアのHTML生成"""
+                                   period: str = "直近12週",
+                                   surgeon_scores: Optional[List[Dict[str, Any]]] = None) -> str:
+    """手術ハイスコアのHTML生成（術者スコアがあれば術者ランキングも追加）"""
     try:
         if not dept_scores:
             return _generate_empty_high_score_html()
@@ -38,6 +39,7 @@ def generate_surgery_high_score_html(dept_scores: List[Dict[str, Any]],
             
             {_generate_score_details_html(top3)}
             {_generate_weekly_insights_html(dept_scores)}
+            {_generate_surgeon_ranking_html(surgeon_scores or [])}
         </div>
         """
         
@@ -162,6 +164,49 @@ def _generate_weekly_insights_html(dept_scores: List[Dict[str, Any]]) -> str:
         return ""
 
 
+def _generate_surgeon_ranking_html(surgeon_scores: List[Dict[str, Any]], top_n: int = 10) -> str:
+    """術者ランキングのHTML生成"""
+    try:
+        if not surgeon_scores:
+            return ""
+        
+        rows_html = ""
+        for i, surgeon in enumerate(surgeon_scores[:top_n]):
+            grade_color = _get_grade_color(surgeon['grade'])
+            rows_html += f"""
+                <tr>
+                    <td>{i + 1}</td>
+                    <td>{surgeon['display_name']}</td>
+                    <td>{surgeon.get('department') or '--'}</td>
+                    <td><span class="grade-badge" style="background-color: {grade_color};">{surgeon['grade']}</span></td>
+                    <td>{surgeon['total_score']:.0f}点</td>
+                    <td>{surgeon['latest_gas_cases']}件</td>
+                    <td>{surgeon['improvement_rate']:+.1f}%</td>
+                </tr>
+            """
+        
+        return f"""
+        <div class="surgeon-ranking-section">
+            <h3>👨‍⚕️ 術者ランキング TOP{min(top_n, len(surgeon_scores))}</h3>
+            <table class="surgeon-ranking-table">
+                <thead>
+                    <tr>
+                        <th>順位</th><th>術者</th><th>診療科</th><th>グレード</th>
+                        <th>総合スコア</th><th>直近週全身麻酔</th><th>改善率</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {rows_html}
+                </tbody>
+            </table>
+        </div>
+        """
+        
+    except Exception as e:
+        logger.error(f"術者ランキングHTML生成エラー: {e}")
+        return ""
+
+
 def _get_grade_color(grade: str) -> str:
     """グレードに応じた色を取得"""
     color_map = {
@@ -380,6 +425,36 @@ def integrate_surgery_high_score_to_dashboard_html(base_html: str, high_score_ht
             color: #1976d2;
         }
         
+        .surgeon-ranking-section {
+            margin: 20px 0;
+        }
+        
+        .surgeon-ranking-table {
+            width: 100%;
+            border-collapse: collapse;
+            background: white;
+            border-radius: 12px;
+            overflow: hidden;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.05);
+        }
+        
+        .surgeon-ranking-table th,
+        .surgeon-ranking-table td {
+            padding: 10px 12px;
+            text-align: left;
+            border-bottom: 1px solid #e5e7eb;
+        }
+        
+        .surgeon-ranking-table th {
+            background: #f1f5f9;
+            color: #2c3e50;
+        }
+        
+        .surgeon-ranking-table .grade-badge {
+            padding: 4px 10px;
+            margin-right: 0;
+        }
+        
         .no-data {
             text-align: center;
             color: #666;
@@ -418,15 +493,17 @@ def integrate_surgery_high_score_to_dashboard_html(base_html: str, high_score_ht
 
 
 def generate_complete_surgery_dashboard_html(df: pd.DataFrame, target_dict: Dict[str, float], 
-                                           period: str = "直近12週") -> str:
+                                           period: str = "直近12週",
+                                           surgeon_targets: Optional[Dict[str, float]] = None) -> str:
     """完全な手術ダッシュボードHTMLを生成"""
     try:
         # ハイスコア計算
-        from analysis.surgery_high_score import calculate_surgery_high_scores
-        dept_scores = calculate_surgery_high_scores(df, target_dict, period)
+        from analysis.surgery_high_score import get_surgery_high_scores, get_surgeon_high_scores
+        dept_scores = get_surgery_high_scores(df, target_dict, period)
+        surgeon_scores = get_surgeon_high_scores(df, surgeon_targets, period) if '実施術者' in df.columns else []
         
         # ハイスコアHTML生成
-        high_score_html = generate_surgery_high_score_html(dept_scores, period)
+        high_score_html = generate_surgery_high_score_html(dept_scores, period, surgeon_scores)
         
         # 基本ダッシュボードHTML（既存機能を活用）
         base_html = _generate_base_dashboard_html(df, target_dict, period)
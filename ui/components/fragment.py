@@ -0,0 +1,43 @@
+# ui/components/fragment.py
+"""
+部分再実行（フラグメント）コンポーネント
+
+fragment() を付けた描画関数は、その中のウィジェットを操作したときに関数だけが再実行され、
+サイドバー・データ検証・他のセクションは再実行されない。フラグメントの引数は直前の
+ページ全体の実行時のものがそのまま使われるため、フラグメント内の操作で変わる値は
+引数で渡さず、フラグメントの中で取得すること。
+
+run_every を指定すると、表示している間は指定秒ごとにフラグメントだけが再実行される（処理状況の確認など）。
+st.fragment のない Streamlit（1.37 未満）では通常の関数として動作する（ページ全体を再実行、run_every は無視）。
+"""
+
+from functools import wraps
+from typing import Callable, Optional
+
+import streamlit as st
+
+from utils.perf_metrics import span
+
+_ST_FRAGMENT = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+FRAGMENT_AVAILABLE = _ST_FRAGMENT is not None
+
+
+def fragment(name: str, run_every: Optional[float] = None) -> Callable:
+    """
+    描画関数をフラグメントとして実行するデコレータ
+
+    フラグメントだけの再実行も描画時間（kind='fragment'）として記録する。
+
+    Args:
+        name: 描画時間の区間名
+        run_every: 自動で再実行する間隔（秒）
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind='fragment'):
+                return func(*args, **kwargs)
+        if not FRAGMENT_AVAILABLE:
+            return wrapper
+        return _ST_FRAGMENT(wrapper, run_every=run_every) if run_every else _ST_FRAGMENT(wrapper)
+    return decorator
@@ -12,6 +12,7 @@ from datetime import datetime
 
 from ui.session_manager import SessionManager
 from analysis import weekly
+from utils.cache import derive_data_version
 
 logger = logging.getLogger(__name__)
 
@@ -157,6 +158,7 @@ class PeriodSelector:
                 (df['手術実施日_dt'] >= start_date) & 
                 (df['手術実施日_dt'] <= end_date)
             ]
+            derive_data_version(filtered_df, df, 'period', start_date, end_date)
             
             logger.info(f"期間フィルタリング: {len(df)} -> {len(filtered_df)} 件")
             return filtered_df
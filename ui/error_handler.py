@@ -12,6 +12,8 @@ from typing import Callable, Any, Optional, Dict
 from datetime import datetime
 import sys
 
+from utils.perf_metrics import span
+
 # ログ設定
 logging.basicConfig(
     level=logging.INFO,
@@ -87,12 +89,15 @@ class ErrorHandler:
 
 
 def safe_streamlit_operation(operation_name: str = ""):
-    """Streamlit操作用の安全実行デコレータ"""
+    """Streamlit操作用の安全実行デコレータ（処理時間をスパンとして記録）"""
     def decorator(func: Callable) -> Callable:
+        span_name = operation_name or func.__qualname__
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             try:
-                return func(*args, **kwargs)
+                with span(span_name):
+                    return func(*args, **kwargs)
             except Exception as e:
                 context = operation_name or f"Streamlit操作: {func.__name__}"
                 
@@ -115,12 +120,15 @@ def safe_streamlit_operation(operation_name: str = ""):
 
 
 def safe_data_operation(operation_name: str = ""):
-    """データ操作用の安全実行デコレータ"""
+    """データ操作用の安全実行デコレータ（処理時間をスパンとして記録）"""
     def decorator(func: Callable) -> Callable:
+        span_name = operation_name or func.__qualname__
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             try:
-                return func(*args, **kwargs)
+                with span(span_name):
+                    return func(*args, **kwargs)
             except Exception as e:
                 context = operation_name or f"データ操作: {func.__name__}"
                 
@@ -5,11 +5,18 @@
 """
 
 import streamlit as st
-from typing import Dict, Callable, Optional
+from typing import Dict, Callable, Optional, Tuple, Union
+import importlib
 import logging
+import sys
+import time
 
 from ui.session_manager import SessionManager
 from ui.error_handler import safe_streamlit_operation, ErrorHandler
+from ui.pages import PAGE_SPECS
+from utils import page_profiler
+from utils.import_profiler import record_load_time
+from utils.perf_metrics import span, update_session_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -18,38 +25,50 @@ class PageRouter:
     """ページルーティングを管理するクラス"""
     
     def __init__(self):
-        self._pages: Dict[str, Callable] = {}
+        # ページ名 → 描画関数、または未読み込みのページ (モジュール, クラス名)
+        self._pages: Dict[str, Union[Callable, Tuple[str, str]]] = {}
         self._setup_routes()
     
     def _setup_routes(self) -> None:
-        """ルートを設定"""
+        """ルートを設定（ページモジュールは初めて表示するときに読み込む）"""
+        self._pages = {
+            "ダッシュボード": PAGE_SPECS["ダッシュボード"],
+            "データアップロード": self._render_upload_page_legacy,  # legacy版を継続使用
+            "データ管理": PAGE_SPECS["データ管理"],
+            "病院全体分析": PAGE_SPECS["病院全体分析"],
+            "診療科別分析": PAGE_SPECS["診療科別分析"],
+            "術者分析": PAGE_SPECS["術者分析"],
+            "将来予測": PAGE_SPECS["将来予測"],
+        }
+        
+        logger.info(f"ページルート設定完了: {list(self._pages.keys())}")
+
+    def _resolve_page(self, page_name: str) -> Callable:
+        """
+        ページの描画関数を取得（未読み込みならモジュールを読み込み、読み込み時間を記録）
+
+        PageRouter は再実行のたびに作り直されるため、読み込み時間はプロセスで
+        初めてモジュールを読み込んだときだけ記録する。
+        """
+        page = self._pages[page_name]
+        if callable(page):
+            return page
+
+        module_name, class_name = page
         try:
-            # 遅延インポートでページモジュールを読み込み
-            from ui.pages.dashboard_page import DashboardPage
-            from ui.pages.data_management_page import DataManagementPage
-            from ui.pages.hospital_page import HospitalPage
-            from ui.pages.department_page import DepartmentPage
-            from ui.pages.surgeon_page import SurgeonPage
-            from ui.pages.prediction_page import PredictionPage
-            
-            # 全ページを設定
-            self._pages = {
-                "ダッシュボード": DashboardPage.render,
-                "データアップロード": self._render_upload_page_legacy,  # legacy版を継続使用
-                "データ管理": DataManagementPage.render,
-                "病院全体分析": HospitalPage.render,
-                "診療科別分析": DepartmentPage.render,
-                "術者分析": SurgeonPage.render,
-                "将来予測": PredictionPage.render,
-            }
-            
-            logger.info(f"ページルート設定完了: {list(self._pages.keys())}")
-            
+            first_load = module_name not in sys.modules
+            started = time.perf_counter()
+            page_class = getattr(importlib.import_module(module_name), class_name)
+            if first_load:
+                record_load_time(module_name, time.perf_counter() - started)
         except ImportError as e:
-            logger.error(f"ページモジュールのインポートエラー: {e}")
+            logger.error(f"ページモジュールのインポートエラー ({page_name}): {e}")
             st.error(f"ページモジュールの読み込みに失敗しました: {e}")
-            # フォールバック: 基本ページのみ設定
-            self._setup_fallback_routes()
+            # フォールバック: このページのみ代替表示（次回の表示で再度読み込みを試す）
+            return self._render_fallback_page
+
+        self._pages[page_name] = page_class.render
+        return page_class.render
     
     def _setup_fallback_routes(self) -> None:
         """フォールバック用の基本ルート設定"""
@@ -81,8 +100,15 @@ class PageRouter:
         
         # ページを描画
         try:
-            page_func = self._pages[current_view]
-            page_func()
+            page_func = self._resolve_page(current_view)
+            if page_profiler.is_requested():
+                with page_profiler.profile(current_view), span(current_view, kind='page'):
+                    page_func()
+            else:
+                with span(current_view, kind='page'):
+                    page_func()
+            update_session_metrics()
+            page_profiler.render_result()
             
         except Exception as e:
             logger.error(f"ページ描画エラー ({current_view}): {e}")
@@ -173,7 +199,7 @@ class PageRouter:
         from datetime import datetime
         from data_processing import loader
         from config import target_loader
-        from data_persistence import save_data_to_file, create_backup, get_data_info
+        from data_persistence import save_data_in_background, create_backup, get_data_info
         
         st.header("📤 データアップロード")
         
@@ -214,7 +240,7 @@ class PageRouter:
                     
                     # データ処理
                     if base_file:
-                        df = loader.load_and_merge_files(base_file, update_files)
+                        df = loader.load_and_merge_files(base_file, update_files, on_warning=st.warning)
                         SessionManager.set_processed_df(df)
                         SessionManager.set_data_source('file_upload')
                         
@@ -230,22 +256,15 @@ class PageRouter:
                             SessionManager.set_target_dict(target_dict)
                             st.success(f"✅ 目標データを読み込みました。{len(target_dict)}件の診療科目標を設定。")
                         
-                        # 自動保存
+                        # 自動保存（バックグラウンドで書き込み、結果はサイドバーに表示）
                         if auto_save:
-                            save_success = save_data_to_file(df, target_dict, {
+                            save_data_in_background(df, target_dict, {
                                 'upload_time': datetime.now().isoformat(),
                                 'base_file_name': base_file.name,
                                 'update_files_count': len(update_files) if update_files else 0,
                                 'target_file_name': target_file.name if target_file else None
                             })
-                            
-                            if save_success:
-                                if existing_data_info:
-                                    st.success("💾 データを更新保存しました。次回起動時に自動で読み込まれます。")
-                                else:
-                                    st.success("💾 データを新規保存しました。次回起動時に自動で読み込まれます。")
-                            else:
-                                st.error("❌ データ保存に失敗しました。")
+                            st.info("💾 データをバックグラウンドで保存しています。完了するとサイドバーに表示され、次回起動時に自動で読み込まれます。")
                     else:
                         st.warning("基礎データファイルをアップロードしてください。")
                         
@@ -5,13 +5,17 @@ UI ページパッケージ
 各分析ページのクラスへの便利なアクセスを提供します。
 """
 
-# 各ページクラスをインポート
-from .dashboard_page import DashboardPage
-from .data_management_page import DataManagementPage
-from .hospital_page import HospitalPage
-from .department_page import DepartmentPage
-from .surgeon_page import SurgeonPage
-from .prediction_page import PredictionPage
+import importlib
+
+# ページクラスと定義モジュール（重いライブラリを使うページがあるため、参照時に読み込む）
+_PAGE_MODULES = {
+    'DashboardPage': 'ui.pages.dashboard_page',
+    'DataManagementPage': 'ui.pages.data_management_page',
+    'HospitalPage': 'ui.pages.hospital_page',
+    'DepartmentPage': 'ui.pages.department_page',
+    'SurgeonPage': 'ui.pages.surgeon_page',
+    'PredictionPage': 'ui.pages.prediction_page',
+}
 
 # 利用可能なページ一覧
 AVAILABLE_PAGES = [
@@ -24,16 +28,27 @@ AVAILABLE_PAGES = [
     '将来予測'
 ]
 
-# ページクラスマッピング
-PAGE_CLASSES = {
-    'ダッシュボード': DashboardPage,
-    'データ管理': DataManagementPage,
-    '病院全体分析': HospitalPage,
-    '診療科別分析': DepartmentPage,
-    '術者分析': SurgeonPage,
-    '将来予測': PredictionPage,
+# ページ名 → (モジュール, クラス名)
+PAGE_SPECS = {
+    'ダッシュボード': (_PAGE_MODULES['DashboardPage'], 'DashboardPage'),
+    'データ管理': (_PAGE_MODULES['DataManagementPage'], 'DataManagementPage'),
+    '病院全体分析': (_PAGE_MODULES['HospitalPage'], 'HospitalPage'),
+    '診療科別分析': (_PAGE_MODULES['DepartmentPage'], 'DepartmentPage'),
+    '術者分析': (_PAGE_MODULES['SurgeonPage'], 'SurgeonPage'),
+    '将来予測': (_PAGE_MODULES['PredictionPage'], 'PredictionPage'),
 }
 
+
+def __getattr__(name):
+    """ページクラス・PAGE_CLASSES は初めて参照されたときに読み込む"""
+    if name in _PAGE_MODULES:
+        page_class = getattr(importlib.import_module(_PAGE_MODULES[name]), name)
+        globals()[name] = page_class
+        return page_class
+    if name == 'PAGE_CLASSES':
+        return {page: __getattr__(class_name) for page, (_, class_name) in PAGE_SPECS.items()}
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = [
     # ページクラス
     'DashboardPage',
@@ -46,6 +61,7 @@ __all__ = [
     # 定数
     'AVAILABLE_PAGES',
     'PAGE_CLASSES',
+    'PAGE_SPECS',
 ]
 
 # パッケージ情報
@@ -9,21 +9,21 @@ import pandas as pd
 from typing import Dict, Any, Optional, Tuple
 import logging
 from datetime import datetime
+import importlib.util
 
 from ui.session_manager import SessionManager
 from ui.error_handler import safe_streamlit_operation, safe_data_operation
+from ui.components.fragment import fragment
 
 # 既存の分析モジュールをインポート
 from analysis import weekly, ranking
+from analysis.forecasting import HOSPITAL_LABEL
 from plotting import trend_plots, generic_plots
+from reporting import pdf_jobs
 from utils import date_helpers
 
-# PDF出力機能をインポート
-try:
-    from utils.pdf_generator import StreamlitPDFExporter
-    PDF_EXPORT_AVAILABLE = True
-except ImportError:
-    PDF_EXPORT_AVAILABLE = False
+# PDF出力機能（reportlab は重いため、PDF生成時に読み込む）
+PDF_EXPORT_AVAILABLE = importlib.util.find_spec("reportlab") is not None
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +32,7 @@ class DashboardPage:
     """ダッシュボードページクラス"""
 
     @staticmethod
+    @fragment("ハイスコア表示")
     @safe_streamlit_operation("ハイスコア表示")
     def _render_high_score_section() -> None:
         """ハイスコアセクションを表示"""
@@ -67,9 +68,9 @@ class DashboardPage:
             
             # ハイスコア計算
             with st.spinner("ハイスコアを計算中..."):
-                from analysis.surgery_high_score import calculate_surgery_high_scores, generate_surgery_high_score_summary
+                from analysis.surgery_high_score import get_surgery_high_scores, generate_surgery_high_score_summary
                 
-                dept_scores = calculate_surgery_high_scores(df, target_dict, period)
+                dept_scores = get_surgery_high_scores(df, target_dict, period)
                 
                 if not dept_scores:
                     st.warning("ハイスコアデータがありません。データと目標設定を確認してください。")
@@ -190,67 +191,44 @@ class DashboardPage:
                     file_name=f"手術ハイスコアランキング_{period}_{datetime.now().strftime('%Y%m%d')}.csv",
                     mime="text/csv"
                 )
+            
+            # スコア推移（週次）
+            if st.checkbox("📈 スコア推移を表示", value=False, key="high_score_history"):
+                from analysis.surgery_high_score import calculate_surgery_high_score_history
+                
+                with st.spinner("スコア推移を計算中..."):
+                    history_df = calculate_surgery_high_score_history(df, target_dict, period)
+                
+                if history_df.empty:
+                    st.info("スコア推移を計算できるデータがありません")
+                else:
+                    fig = trend_plots.create_high_score_history_chart(history_df, f"ハイスコア推移（{period}評価・週次）")
+                    st.plotly_chart(fig, use_container_width=True)
         
         except Exception as e:
             logger.error(f"ハイスコア表示エラー: {e}")
             st.error(f"ハイスコア表示でエラーが発生しました: {e}")
 
     @staticmethod
+    @safe_streamlit_operation("ダッシュボードページ描画")
     def render() -> None:
-        """ダッシュボードページを描画（ハイスコア機能追加版）"""
-        st.title("📱 ダッシュボード - 手術分析の中心")
-        
-        # データ取得
-        df = SessionManager.get_processed_df()
-        target_dict = SessionManager.get_target_dict()
-        latest_date = SessionManager.get_latest_date()
+        """ダッシュボードページを描画"""
+        st.title("📱 ダッシュボード - 管理者向けサマリー")
         
-        if df.empty:
+        if SessionManager.get_processed_df().empty:
             DashboardPage._render_no_data_dashboard()
             return
         
-        # 期間選択セクション
-        analysis_period, start_date, end_date = DashboardPage._render_period_selector(latest_date)
-        
-        # 分析期間情報
-        DashboardPage._render_analysis_period_info(latest_date, analysis_period, start_date, end_date)
-        
-        # メインコンテンツをタブで分割
-        tab1, tab2, tab3 = st.tabs(["📊 主要指標", "📈 診療科別パフォーマンス", "🏆 ハイスコアランキング"])
-        
-        with tab1:
-            # KPIセクション
-            DashboardPage._render_kpi_section_with_data(df, latest_date, start_date, end_date)
-            
-            # 目標達成状況
-            DashboardPage._render_achievement_status(df, target_dict, latest_date, start_date, end_date)
-        
-        with tab2:
-            # 診療科別パフォーマンスダッシュボード
-            DashboardPage._render_performance_dashboard_with_data(df, target_dict, latest_date, start_date, end_date)
-        
-        with tab3:
-            # ハイスコアランキング（新機能）
-            DashboardPage._render_high_score_section()
-        
-        # フッター情報
-        DashboardPage._render_dashboard_footer(df, target_dict)
+        DashboardPage._render_dashboard_body()
 
     @staticmethod
-    @safe_streamlit_operation("ダッシュボードページ描画")
-    def render() -> None:
-        """ダッシュボードページを描画"""
-        st.title("📱 ダッシュボード - 管理者向けサマリー")
-        
-        # データ取得
+    @fragment("ダッシュボード本体")
+    def _render_dashboard_body() -> None:
+        """期間選択以下の本体（期間を変えたときはこの部分だけ再実行）"""
         df = SessionManager.get_processed_df()
         target_dict = SessionManager.get_target_dict()
         latest_date = SessionManager.get_latest_date()
         
-        if df.empty:
-            DashboardPage._render_no_data_dashboard()
-            return
-        
         # 期間選択セクション
         analysis_period, start_date, end_date = DashboardPage._render_period_selector(latest_date)
         
@@ -271,10 +249,18 @@ class DashboardPage:
         # 目標達成状況サマリー  
         DashboardPage._render_achievement_summary(df, target_dict, latest_date, start_date, end_date)
         
+        # 診療科別ハイスコア（評価期間の変更などはこの部分だけ再実行）
+        DashboardPage._render_high_score_section()
+        
         # 週次推移グラフ（PDF用）
         if not df.empty:
             try:
-                summary = weekly.get_summary(df, use_complete_weeks=True)
+                # 夜間事前計算の結果があれば再集計しない
+                precomputed_summary = SessionManager.get_precomputed('weekly_summary')
+                if precomputed_summary is not None:
+                    summary = precomputed_summary[precomputed_summary['対象'] == HOSPITAL_LABEL].drop(columns='対象')
+                else:
+                    summary = weekly.get_summary(df, use_complete_weeks=True)
                 if not summary.empty:
                     pdf_charts['週次推移'] = trend_plots.create_weekly_summary_chart(summary, "病院全体 週次推移", target_dict)
             except Exception as e:
@@ -1112,6 +1098,7 @@ class DashboardPage:
             )
 
     @staticmethod
+    @fragment("PDF出力")
     def _render_pdf_export_section(kpi_data: Dict[str, Any], 
                                  performance_data: pd.DataFrame,
                                  period_name: str,
@@ -1148,24 +1135,24 @@ class DashboardPage:
                 total_days = (end_date - start_date).days + 1
                 weekdays = kpi_data.get('weekdays', 0)
                 
-                period_info = StreamlitPDFExporter.create_period_info(
-                    period_name, start_date, end_date, total_days, weekdays
-                )
-                
-                # PDFダウンロードボタン
-                if st.button("📄 PDFレポート生成", type="primary", use_container_width=True):
-                    with st.spinner("PDFレポートを生成中..."):
-                        try:
-                            StreamlitPDFExporter.add_pdf_download_button(
-                                kpi_data=kpi_data,
-                                performance_data=performance_data,
-                                period_info=period_info,
-                                charts=charts,
-                                button_label="📥 PDFをダウンロード"
-                            )
-                        except Exception as e:
-                            st.error(f"PDF生成でエラーが発生しました: {e}")
-                            logger.error(f"PDF生成エラー: {e}")
+                # PDFは押されたときに生成し、同じデータ・期間・目標値では生成済みのものを使う
+                period = (period_name, f"{start_date:%Y%m%d}", f"{end_date:%Y%m%d}",
+                          tuple(sorted(SessionManager.get_target_dict().items())))
+                cache_key = pdf_jobs.report_key('dashboard', SessionManager.get_processed_df(), period)
+
+                def build_pdf() -> Optional[bytes]:
+                    from utils.pdf_generator import PDFReportGenerator, StreamlitPDFExporter
+
+                    period_info = StreamlitPDFExporter.create_period_info(
+                        period_name, start_date, end_date, total_days, weekdays
+                    )
+                    pdf_buffer = PDFReportGenerator().generate_dashboard_report(
+                        kpi_data, performance_data, period_info, charts
+                    )
+                    return pdf_buffer.getvalue() if pdf_buffer else None
+
+                file_name = f"手術分析レポート_{period_name}_{datetime.now():%Y%m%d_%H%M%S}.pdf"
+                pdf_jobs.render_report_download(cache_key, build_pdf, file_name, widget_key="dashboard_pdf")
             else:
                 st.error("期間データが不正です。PDF生成できません。")
         
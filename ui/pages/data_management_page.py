@@ -9,17 +9,22 @@ import pandas as pd
 from datetime import datetime
 from typing import Dict, Any, Optional
 import logging
+import os
+import tempfile
 
 from ui.session_manager import SessionManager
 from ui.error_handler import safe_streamlit_operation, safe_file_operation
 from data_persistence import (
     get_data_info, get_file_sizes, get_backup_info, restore_from_backup,
     export_data_package, import_data_package, create_backup,
-    load_data_from_file, save_data_to_file, delete_saved_data
+    load_data_from_file, save_data_in_background, delete_saved_data
 )
 
 logger = logging.getLogger(__name__)
 
+# st.download_button の data に関数を渡し、押されたときに作成する機能（Streamlit 1.52 以降）
+DEFERRED_DOWNLOAD_AVAILABLE = tuple(int(part) for part in st.__version__.split('.')[:2]) >= (1, 52)
+
 
 class DataManagementPage:
     """データ管理ページクラス"""
@@ -148,13 +153,9 @@ class DataManagementPage:
                 'record_count': len(df)
             }
             
-            save_success = save_data_to_file(df, target_dict, metadata)
-            
-            if save_success:
-                st.success("✅ データを保存しました")
-                logger.info("手動データ保存完了")
-            else:
-                st.error("❌ 保存に失敗しました")
+            save_data_in_background(df, target_dict, metadata)
+            st.info("💾 バックグラウンドで保存しています（完了はサイドバーに表示されます）")
+            logger.info("手動データ保存を開始")
                 
         except Exception as e:
             st.error(f"❌ 保存エラー: {e}")
@@ -191,6 +192,9 @@ class DataManagementPage:
                 st.write(f"**サイズ**: {backup['size']}")
                 st.write(f"**作成日**: {backup['timestamp']}")
                 st.write(f"**経過日数**: {backup['age_days']}日")
+                if backup.get('kind') == 'snapshot':
+                    st.write(f"**レコード数**: {backup['rows']:,}")
+                    st.write(f"**年度パーティション**: {', '.join(backup['partitions'])}")
                 
                 if backup['has_metadata']:
                     st.write("✅ メタデータあり")
@@ -225,18 +229,51 @@ class DataManagementPage:
     
     @staticmethod
     def _download_backup(backup: dict) -> None:
-        """バックアップファイルをダウンロード"""
+        """バックアップをダウンロード（ファイルはボタンが押されたときに読み込む）"""
         try:
-            with open(backup['path'], 'rb') as f:
-                st.download_button(
-                    label="💾 ダウンロード開始",
-                    data=f.read(),
-                    file_name=backup['filename'],
-                    mime="application/octet-stream",
-                    key=f"download_btn_{backup['filename']}"
-                )
+            if backup['path']:
+                data = DataManagementPage._deferred_file(backup['path'])
+                file_name = backup['filename']
+                mime = "application/octet-stream"
+            else:
+                # 差分スナップショットはデータパッケージとして書き出してから渡す
+                data = DataManagementPage._deferred_package(backup['filename'])
+                file_name = f"data_export_{backup['filename']}.zip"
+                mime = "application/zip"
+            st.download_button(
+                label="💾 ダウンロード開始",
+                data=data,
+                file_name=file_name,
+                mime=mime,
+                key=f"download_btn_{backup['filename']}"
+            )
         except Exception as e:
             st.error(f"❌ ダウンロードエラー: {e}")
+
+    @staticmethod
+    def _deferred_file(path: str):
+        """download_button 用: 押されたときだけファイルを読み込む関数（古い Streamlit では読み込んだ内容）"""
+        def _read() -> bytes:
+            with open(path, 'rb') as f:
+                return f.read()
+        return _read if DEFERRED_DOWNLOAD_AVAILABLE else _read()
+
+    @staticmethod
+    def _deferred_package(snapshot_id: str):
+        """
+        download_button 用: 押されたときにスナップショットをパッケージに書き出して読み込む関数
+
+        古い Streamlit では表示時に書き出した内容を返す。
+        """
+        def _export() -> bytes:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                package_path = os.path.join(temp_dir, "package.zip")
+                success, result = export_data_package(package_path, snapshot_id=snapshot_id)
+                if not success:
+                    raise RuntimeError(result)
+                with open(package_path, 'rb') as f:
+                    return f.read()
+        return _export if DEFERRED_DOWNLOAD_AVAILABLE else _export()
     
     @staticmethod
     def _render_manual_backup_section() -> None:
@@ -283,7 +320,7 @@ class DataManagementPage:
         """エクスポートセクションを描画"""
         st.subheader("📤 データエクスポート")
         
-        st.info("全てのデータをZIPファイルとしてエクスポートします。")
+        st.info("全てのデータを年度ごとに分けたZIPファイル（チェックサム付き）としてエクスポートします。")
         
         if st.button("📦 データパッケージをエクスポート"):
             with st.spinner("エクスポート中..."):
@@ -293,14 +330,13 @@ class DataManagementPage:
                     if success:
                         st.success("✅ エクスポート完了")
                         
-                        # ダウンロードボタンを表示
-                        with open(result, 'rb') as f:
-                            st.download_button(
-                                label="💾 エクスポートファイルをダウンロード",
-                                data=f.read(),
-                                file_name=result,
-                                mime="application/zip"
-                            )
+                        # ダウンロードボタンを表示（ファイルは押されたときに読み込む）
+                        st.download_button(
+                            label="💾 エクスポートファイルをダウンロード",
+                            data=DataManagementPage._deferred_file(result),
+                            file_name=os.path.basename(result),
+                            mime="application/zip"
+                        )
                         logger.info(f"データエクスポート完了: {result}")
                     else:
                         st.error(f"❌ エクスポート失敗: {result}")
@@ -323,10 +359,16 @@ class DataManagementPage:
             help="以前エクスポートしたZIPファイルを選択してください"
         )
         
+        merge = st.checkbox(
+            "年度単位で統合する",
+            value=False,
+            help="パッケージに含まれる年度のデータだけを置き換え、それ以外の年度は現在のデータを残します"
+        )
+        
         if import_file and st.button("📥 インポート実行"):
             with st.spinner("インポート中..."):
                 try:
-                    success, message = import_data_package(import_file)
+                    success, message = import_data_package(import_file, merge=merge)
                     
                     if success:
                         st.success(f"✅ {message}")
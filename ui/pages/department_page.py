@@ -13,6 +13,7 @@ import logging
 from ui.session_manager import SessionManager
 from ui.error_handler import safe_streamlit_operation, safe_data_operation
 from ui.components.period_selector import PeriodSelector
+from ui.components.fragment import fragment
 
 # 既存の分析モジュールをインポート
 from analysis import weekly, ranking, surgeon
@@ -30,15 +31,19 @@ class DepartmentPage:
         """診療科別分析ページを描画"""
         st.title("🩺 診療科別分析")
         
-        # データ取得
-        df = SessionManager.get_processed_df()
-        target_dict = SessionManager.get_target_dict()
-        latest_date = SessionManager.get_latest_date()
-        
-        if df.empty:
+        if SessionManager.get_processed_df().empty:
             st.warning("⚠️ データが読み込まれていません")
             return
         
+        DepartmentPage._render_analysis_body()
+
+    @staticmethod
+    @fragment("診療科別分析本体")
+    def _render_analysis_body() -> None:
+        """診療科・期間選択以下の本体（選択を変えたときはこの部分だけ再実行）"""
+        df = SessionManager.get_processed_df()
+        target_dict = SessionManager.get_target_dict()
+        
         # 診療科選択
         selected_dept = DepartmentPage._render_department_selector(df)
         if not selected_dept:
@@ -53,8 +58,8 @@ class DepartmentPage:
             key_suffix=f"dept_{selected_dept}"
         )
         
-        # 期間に基づいてデータをフィルタリング
-        filtered_df = PeriodSelector.filter_data_by_period(df, start_date, end_date)
+        # 期間に基づいてデータをフィルタリング（期間ごとにセッション内でキャッシュ、診療科間で共有）
+        filtered_df = SessionManager.get_filtered_data("department_analysis", start_date, end_date)
         
         # 選択された診療科のデータを抽出
         dept_df = filtered_df[filtered_df['実施診療科'] == selected_dept]
@@ -219,6 +224,7 @@ class DepartmentPage:
             logger.error(f"診療科別KPI計算エラー ({dept_name}): {e}")
     
     @staticmethod
+    @fragment("診療科別週次推移")
     @safe_data_operation("診療科別週次推移表示")
     def _render_department_trend(filtered_df: pd.DataFrame, 
                                target_dict: Dict[str, Any], 
@@ -509,6 +515,7 @@ class DepartmentPage:
             logger.error(f"統計情報エラー ({dept_name}): {e}")
     
     @staticmethod
+    @fragment("診療科別期間比較")
     def _render_period_comparison_tab(dept_name: str, current_period_name: str) -> None:
         """期間比較タブ"""
         st.subheader(f"{dept_name} 期間比較分析")
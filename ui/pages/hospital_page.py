@@ -6,24 +6,22 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
+import importlib.util
 from typing import Dict, Any, Optional
 import logging
 
 from ui.session_manager import SessionManager
 from ui.error_handler import safe_streamlit_operation, safe_data_operation
 from ui.components.period_selector import PeriodSelector
+from ui.components.fragment import fragment
 
 # 既存の分析モジュールをインポート
 from analysis import weekly, ranking
 from plotting import trend_plots, generic_plots
 
-# 追加の統計分析用ライブラリ（オプション）
-try:
-    from sklearn.linear_model import LinearRegression
-    import numpy as np
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+# 追加の統計分析用ライブラリ（オプション、読み込みは使用時）
+SKLEARN_AVAILABLE = importlib.util.find_spec("sklearn") is not None
 
 logger = logging.getLogger(__name__)
 
@@ -37,15 +35,19 @@ class HospitalPage:
         """病院全体分析ページを描画"""
         st.title("🏥 病院全体分析 - 詳細分析")
         
-        # データ取得
-        df = SessionManager.get_processed_df()
-        target_dict = SessionManager.get_target_dict()
-        latest_date = SessionManager.get_latest_date()
-        
-        if df.empty:
+        if SessionManager.get_processed_df().empty:
             st.warning("⚠️ データが読み込まれていません")
             return
         
+        HospitalPage._render_analysis_body()
+
+    @staticmethod
+    @fragment("病院全体分析本体")
+    def _render_analysis_body() -> None:
+        """期間選択以下の本体（期間を変えたときはこの部分だけ再実行）"""
+        df = SessionManager.get_processed_df()
+        target_dict = SessionManager.get_target_dict()
+        
         # 期間選択セクション
         st.markdown("---")
         period_name, start_date, end_date = PeriodSelector.render(
@@ -54,8 +56,8 @@ class HospitalPage:
             key_suffix="hospital"
         )
         
-        # 期間に基づいてデータをフィルタリング
-        filtered_df = PeriodSelector.filter_data_by_period(df, start_date, end_date)
+        # 期間に基づいてデータをフィルタリング（期間ごとにセッション内でキャッシュ）
+        filtered_df = SessionManager.get_filtered_data("hospital_analysis", start_date, end_date)
         
         # 期間サマリー表示
         if start_date and end_date:
@@ -335,6 +337,8 @@ class HospitalPage:
     def _render_advanced_statistics(df: pd.DataFrame) -> None:
         """高度統計分析（機械学習を使用）"""
         try:
+            from sklearn.linear_model import LinearRegression
+
             st.markdown("**🔬 高度統計分析**")
             
             # 日次件数の時系列データ準備
@@ -13,7 +13,8 @@ from ui.session_manager import SessionManager
 from ui.error_handler import safe_streamlit_operation, safe_data_operation
 
 # 既存の分析モジュールをインポート
-from analysis import forecasting
+from analysis import forecasting, backtesting, weekly_forecast
+from data_processing import precomputed
 from plotting import generic_plots
 
 logger = logging.getLogger(__name__)
@@ -37,7 +38,9 @@ class PredictionPage:
         PredictionPage._render_prediction_info()
         
         # タブで機能を分割
-        tab1, tab2, tab3 = st.tabs(["将来予測", "モデル検証", "パラメータ最適化"])
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(
+            ["将来予測", "モデル検証", "パラメータ最適化", "全診療科一括予測", "週次予測"]
+        )
         
         with tab1:
             PredictionPage._render_prediction_tab(df, target_dict, latest_date)
@@ -47,6 +50,12 @@ class PredictionPage:
         
         with tab3:
             PredictionPage._render_optimization_tab(df)
+        
+        with tab4:
+            PredictionPage._render_batch_prediction_tab(df, target_dict, latest_date)
+        
+        with tab5:
+            PredictionPage._render_weekly_forecast_tab(df, target_dict)
     
     @staticmethod
     def _render_prediction_info() -> None:
@@ -98,12 +107,8 @@ class PredictionPage:
         with col1:
             model_type = st.selectbox(
                 "予測モデル", 
-                ["hwes", "arima", "moving_avg"], 
-                format_func=lambda x: {
-                    "hwes": "Holt-Winters", 
-                    "arima": "ARIMA", 
-                    "moving_avg": "移動平均"
-                }[x]
+                ["hwes", "snaive", "arima", "moving_avg"], 
+                format_func=lambda x: forecasting.MODEL_NAMES[x]
             )
         
         with col2:
@@ -117,17 +122,20 @@ class PredictionPage:
                 }[x]
             )
         
+        engine = PredictionPage._render_engine_selector("pred_engine")
+        
         # 予測実行
         if st.button("🔮 予測を実行", type="primary", key="run_prediction"):
             PredictionPage._execute_prediction(
-                df, latest_date, department, model_type, pred_period, target_dict
+                df, latest_date, department, model_type, pred_period, target_dict, engine
             )
     
     @staticmethod
     @safe_data_operation("予測実行")
     def _execute_prediction(df: pd.DataFrame, latest_date: Optional[pd.Timestamp],
                           department: Optional[str], model_type: str, 
-                          pred_period: str, target_dict: Dict[str, Any]) -> None:
+                          pred_period: str, target_dict: Dict[str, Any],
+                          engine: Optional[str] = None) -> None:
         """予測を実行"""
         with st.spinner("予測計算中..."):
             try:
@@ -135,7 +143,9 @@ class PredictionPage:
                     df, latest_date, 
                     department=department, 
                     model_type=model_type, 
-                    prediction_period=pred_period
+                    prediction_period=pred_period,
+                    engine=engine,
+                    target_dict=target_dict
                 )
                 
                 if metrics.get("message"):
@@ -146,6 +156,13 @@ class PredictionPage:
                     # グラフ表示
                     fig = generic_plots.create_forecast_chart(result_df, title)
                     st.plotly_chart(fig, use_container_width=True)
+                    st.caption("※網掛けは標本経路のシミュレーションによる95%予測区間です。")
+                    
+                    if "年度目標達成確率(%)" in metrics:
+                        col1, col2, col3 = st.columns(3)
+                        col1.metric("年度目標", f"{metrics['年度目標']:,.1f}")
+                        col2.metric("年度予測（中央値）", f"{metrics['年度予測中央値']:,.1f}")
+                        col3.metric("年度目標達成確率", f"{metrics['年度目標達成確率(%)']:.1f}%")
                     
                     # 予測入力データの詳細分析
                     PredictionPage._render_prediction_data_analysis(
@@ -165,6 +182,18 @@ class PredictionPage:
                 st.error(f"予測実行エラー: {e}")
                 logger.error(f"予測実行エラー: {e}")
     
+    @staticmethod
+    def _render_engine_selector(key: str) -> str:
+        """計算エンジンの選択を表示"""
+        return st.radio(
+            "計算モード",
+            list(forecasting.FORECAST_ENGINES),
+            format_func=lambda x: forecasting.FORECAST_ENGINES[x],
+            horizontal=True,
+            key=key,
+            help="高速: NumPy実装のHolt-Winters・季節ナイーブ。精密: statsmodels によるBox-Cox変換付きHolt-Winters（ARIMAは常に statsmodels）"
+        )
+    
     @staticmethod
     def _render_prediction_data_analysis(df: pd.DataFrame, department: Optional[str], 
                                        result_df: pd.DataFrame) -> None:
@@ -320,19 +349,30 @@ class PredictionPage:
                 )
         
         val_period = st.slider("検証期間（月数）", 3, 12, 6)
+        rolling = st.checkbox(
+            "ローリング・オリジン検証",
+            value=False,
+            key="val_rolling",
+            help="予測起点を1ヶ月ずつずらしながら全モデルを評価し、予測月数（ホライズン）別の誤差分布を表示します"
+        )
+        
+        engine = PredictionPage._render_engine_selector("val_engine")
         
         if st.button("🔍 検証実行", key="run_validation"):
-            PredictionPage._execute_validation(df, val_dept, val_period)
+            if rolling:
+                PredictionPage._execute_rolling_validation(df, val_dept, val_period, engine)
+            else:
+                PredictionPage._execute_validation(df, val_dept, val_period, engine)
     
     @staticmethod
     @safe_data_operation("検証実行")
     def _execute_validation(df: pd.DataFrame, department: Optional[str], 
-                          validation_period: int) -> None:
+                          validation_period: int, engine: Optional[str] = None) -> None:
         """モデル検証を実行"""
         with st.spinner("モデル検証中..."):
             try:
                 metrics_df, train, test, preds, rec = forecasting.validate_model(
-                    df, department=department, validation_period=validation_period
+                    df, department=department, validation_period=validation_period, engine=engine
                 )
                 
                 if not metrics_df.empty:
@@ -363,6 +403,33 @@ class PredictionPage:
                 st.error(f"モデル検証エラー: {e}")
                 logger.error(f"モデル検証エラー: {e}")
     
+    @staticmethod
+    @safe_data_operation("ローリング検証実行")
+    def _execute_rolling_validation(df: pd.DataFrame, department: Optional[str],
+                                    horizon: int, engine: Optional[str] = None) -> None:
+        """ローリング・オリジン検証を実行"""
+        with st.spinner("ローリング検証中..."):
+            try:
+                result = backtesting.run_backtest(df, department=department, horizon=horizon, engine=engine)
+                summary_df = result['summary']
+                
+                if summary_df.empty:
+                    st.error(f"❌ ローリング検証には最低{backtesting.MIN_TRAIN_MONTHS + horizon}ヶ月分のデータが必要です。")
+                    return
+                
+                st.success(result['recommendation'])
+                
+                rmse_by_horizon = summary_df.pivot(index='ホライズン', columns='モデル', values='RMSE')
+                st.subheader("予測月数別 RMSE")
+                st.line_chart(rmse_by_horizon)
+                
+                st.dataframe(summary_df.drop(columns='対象').round(2), hide_index=True, use_container_width=True)
+                st.caption(f"起点数: {int(summary_df['起点数'].max())}（拡張ウィンドウ、各起点から{horizon}ヶ月先まで予測）")
+                
+            except Exception as e:
+                st.error(f"ローリング検証エラー: {e}")
+                logger.error(f"ローリング検証エラー: {e}")
+    
     @staticmethod
     @safe_data_operation("パラメータ最適化")
     def _render_optimization_tab(df: pd.DataFrame) -> None:
@@ -426,6 +493,143 @@ class PredictionPage:
                 st.error(f"パラメータ最適化エラー: {e}")
                 logger.error(f"パラメータ最適化エラー: {e}")
 
+    
+    @staticmethod
+    @safe_data_operation("一括予測")
+    def _render_batch_prediction_tab(df: pd.DataFrame, target_dict: Dict[str, Any],
+                                     latest_date: Optional[pd.Timestamp]) -> None:
+        """全診療科一括予測タブを表示"""
+        st.header("🗂️ 全診療科一括予測")
+        st.info("病院全体と目標設定済みの全診療科について複数モデルで予測し、"
+                "直近6ヶ月の検証RMSEが最小のモデルを採用します。"
+                "（高速: Holt-Winters・季節ナイーブ・移動平均、精密: Holt-Winters・ARIMA・移動平均）")
+        
+        pred_period = st.selectbox(
+            "予測期間", 
+            ["fiscal_year", "calendar_year", "six_months"], 
+            format_func=lambda x: {
+                "fiscal_year": "年度末まで", 
+                "calendar_year": "年末まで", 
+                "six_months": "6ヶ月先まで"
+            }[x],
+            key="batch_pred_period"
+        )
+        engine = PredictionPage._render_engine_selector("batch_engine")
+        
+        # 夜間事前計算の結果（年度末まで）があれば、実行前から表示する
+        precomputed_batch = None
+        if pred_period == "fiscal_year":
+            precomputed_batch = SessionManager.get_precomputed(f"batch_forecast_fiscal_year_{engine}", target_dict)
+        
+        if st.button("🗂️ 一括予測を実行", type="primary", key="run_batch_prediction"):
+            with st.spinner("全診療科の予測計算中..."):
+                try:
+                    batch_df = forecasting.predict_future_batch(
+                        df, latest_date, target_dict, prediction_period=pred_period, engine=engine
+                    )
+                    probabilities = forecasting.calculate_target_probabilities(df, latest_date, target_dict, engine=engine)
+                    PredictionPage._display_batch_results(df, batch_df, probabilities, pred_period, engine)
+                    
+                except Exception as e:
+                    st.error(f"一括予測エラー: {e}")
+                    logger.error(f"一括予測エラー: {e}")
+        elif precomputed_batch is not None:
+            info = precomputed.get_active_info()
+            st.caption(f"🌙 夜間事前計算の結果を表示しています（作成: {info['created_at'][:16].replace('T', ' ')}）")
+            probabilities = SessionManager.get_precomputed(f"target_probabilities_{engine}", target_dict)
+            PredictionPage._display_batch_results(
+                df, precomputed_batch, probabilities if probabilities is not None else pd.DataFrame(), pred_period,
+                engine
+            )
+
+    @staticmethod
+    def _display_batch_results(df: pd.DataFrame, batch_df: pd.DataFrame, probabilities: pd.DataFrame,
+                               pred_period: str, engine: str) -> None:
+        """一括予測の結果（採用モデル別サマリー・詳細・年度目標達成確率・CSV）を表示"""
+        if batch_df.empty:
+            st.warning("予測可能な対象がありません（各対象に最低12ヶ月分のデータが必要です）")
+            return
+        
+        st.subheader("採用モデル別 予測サマリー")
+        st.dataframe(forecasting.summarize_batch_forecast(batch_df, df, engine),
+                     hide_index=True, use_container_width=True)
+        st.caption("※病院全体は平日1日平均件数、診療科は月合計件数の予測です（病院全体の予測合計は空欄）。"
+                   "予測合計の下限・上限は標本経路による予測期間合計の95%予測区間。")
+        
+        with st.expander("📋 月別・モデル別の予測詳細"):
+            st.dataframe(batch_df.round(2), hide_index=True, use_container_width=True)
+        
+        if not probabilities.empty:
+            st.subheader("🎯 年度目標達成確率")
+            st.dataframe(probabilities.round(1), hide_index=True, use_container_width=True)
+            st.caption(f"※Holt-Wintersモデルの標本経路{forecasting.N_SIMULATION_PATHS:,}本による推定。"
+                       "診療科は年度合計件数（目標は週目標×52）、病院全体は平日1日平均件数で評価。")
+        
+        st.download_button(
+            "📥 予測結果をCSVでダウンロード",
+            batch_df.to_csv(index=False).encode('utf-8-sig'),
+            file_name=f"batch_forecast_{pred_period}.csv",
+            mime="text/csv",
+            key="download_batch_forecast"
+        )
+
+    
+    @staticmethod
+    @safe_data_operation("週次予測")
+    def _render_weekly_forecast_tab(df: pd.DataFrame, target_dict: Dict[str, Any]) -> None:
+        """週次予測タブを表示（営業日数で正規化した週合計件数の予測と目標未達見込み）"""
+        st.header("📅 週次予測・目標未達見込み")
+        st.info("週合計件数を営業日数（土日祝・年末年始を除く）で正規化して予測し、"
+                "将来週の営業日数で週合計に戻します。祝日を含む週の件数減少を織り込んだ上で、"
+                "週目標（目標（週合計））の達成確率を診療科ごとに求めます。")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            horizon_weeks = st.slider("予測週数", 4, 26, weekly_forecast.DEFAULT_HORIZON_WEEKS, key="weekly_horizon")
+        with col2:
+            threshold = st.slider("未達見込みとする達成確率（%未満）", 10, 90, 50, step=5, key="weekly_threshold")
+        
+        if not target_dict:
+            st.warning("目標データが設定されていないため、週次予測のみ表示します（達成確率は算出されません）")
+        
+        # 夜間事前計算の結果（既定の予測週数）があれば、実行前から表示する
+        precomputed_forecast = None
+        if horizon_weeks == weekly_forecast.DEFAULT_HORIZON_WEEKS and target_dict:
+            precomputed_forecast = SessionManager.get_precomputed('weekly_forecast', target_dict)
+        
+        if st.button("📅 週次予測を実行", type="primary", key="run_weekly_forecast"):
+            with st.spinner("週次予測計算中..."):
+                try:
+                    forecast_df = weekly_forecast.forecast_weekly(df, target_dict, horizon_weeks=horizon_weeks)
+                    PredictionPage._display_weekly_results(forecast_df, threshold)
+                    
+                except Exception as e:
+                    st.error(f"週次予測エラー: {e}")
+                    logger.error(f"週次予測エラー: {e}")
+        elif precomputed_forecast is not None:
+            info = precomputed.get_active_info()
+            st.caption(f"🌙 夜間事前計算の結果を表示しています（作成: {info['created_at'][:16].replace('T', ' ')}）")
+            PredictionPage._display_weekly_results(precomputed_forecast, threshold)
+
+    @staticmethod
+    def _display_weekly_results(forecast_df: pd.DataFrame, threshold: int) -> None:
+        """週次予測の結果（未達見込み・週別予測件数・予測詳細）を表示"""
+        if forecast_df.empty:
+            st.warning(f"週次予測には最低{weekly_forecast.MIN_HISTORY_WEEKS}週分のデータが必要です")
+            return
+        
+        shortfall_df = weekly_forecast.summarize_weekly_shortfalls(forecast_df, threshold)
+        if not shortfall_df.empty:
+            st.subheader("🚨 目標未達見込み（診療科別）")
+            st.dataframe(shortfall_df, hide_index=True, use_container_width=True)
+        
+        st.subheader("週別予測件数")
+        pivot_df = forecast_df.pivot(index='週', columns='対象', values='予測件数').round(1)
+        st.dataframe(pivot_df, use_container_width=True)
+        
+        with st.expander("📋 予測詳細（予測区間・達成確率）"):
+            st.dataframe(forecast_df.round(2), hide_index=True, use_container_width=True)
+
 
 # ページルーター用の関数
 def render():
@@ -14,6 +14,7 @@ import logging
 from ui.session_manager import SessionManager
 from ui.error_handler import safe_streamlit_operation, safe_data_operation
 from ui.components.period_selector import PeriodSelector
+from ui.components.fragment import fragment
 
 # 既存の分析モジュールをインポート
 from analysis import surgeon, weekly, ranking
@@ -31,13 +32,16 @@ class SurgeonPage:
         """術者分析ページを描画"""
         st.title("👨‍⚕️ 術者分析")
         
-        # データ取得
-        df = SessionManager.get_processed_df()
-        
-        if df.empty:
+        if SessionManager.get_processed_df().empty:
             st.warning("⚠️ データが読み込まれていません")
             return
         
+        SurgeonPage._render_analysis_body()
+
+    @staticmethod
+    @fragment("術者分析本体")
+    def _render_analysis_body() -> None:
+        """期間選択以下の本体（期間を変えたときはこの部分だけ再実行）"""
         # 期間選択セクション
         st.markdown("---")
         period_name, start_date, end_date = PeriodSelector.render(
@@ -46,8 +50,8 @@ class SurgeonPage:
             key_suffix="surgeon"
         )
         
-        # 期間に基づいてデータをフィルタリング
-        filtered_df = PeriodSelector.filter_data_by_period(df, start_date, end_date)
+        # 期間に基づいてデータをフィルタリング（期間ごとにセッション内でキャッシュ）
+        filtered_df = SessionManager.get_filtered_data("surgeon_analysis", start_date, end_date)
         
         if filtered_df.empty:
             st.warning(f"⚠️ 選択期間（{period_name}）にデータがありません")
@@ -106,6 +110,7 @@ class SurgeonPage:
             SurgeonPage._render_period_comparison_tab(period_name)
     
     @staticmethod
+    @fragment("術者ランキング")
     @safe_data_operation("全体ランキング表示")
     def _render_overall_ranking_tab(surgeon_summary: pd.DataFrame, 
                                   expanded_df: pd.DataFrame,
@@ -277,6 +282,7 @@ class SurgeonPage:
             logger.error(f"TOP3術者詳細表示エラー: {e}", exc_info=True)
     
     @staticmethod
+    @fragment("術者診療科別分析")
     @safe_data_operation("診療科別分析表示")
     def _render_department_analysis_tab(expanded_df: pd.DataFrame, period_name: str) -> None:
         """診療科別分析タブ"""
@@ -583,6 +589,7 @@ class SurgeonPage:
             logger.error(f"パフォーマンス指標表示エラー: {e}", exc_info=True)
     
     @staticmethod
+    @fragment("術者期間比較")
     def _render_period_comparison_tab(current_period_name: str) -> None:
         """期間比較タブ"""
         st.subheader("📅 術者分析期間比較")
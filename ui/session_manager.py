@@ -10,7 +10,10 @@ from datetime import datetime
 from typing import Optional, Dict, Any, Tuple
 import logging
 
-from data_persistence import auto_load_data
+from data_persistence import auto_load_data, load_data_from_file
+from analysis.surgery_high_score import get_data_fingerprint, prime_high_score_cache
+from data_processing import precomputed
+from utils.cache import derive_data_version, get_data_version, set_data_version
 
 logger = logging.getLogger(__name__)
 
@@ -90,7 +93,8 @@ class SessionManager:
                     
                     if '手術実施日_dt' in df.columns:
                         st.session_state[SessionManager.SESSION_KEYS['latest_date']] = df['手術実施日_dt'].max()
-                        
+                
+                SessionManager._activate_precomputed()
                 logger.info("自動データ読み込み完了")
             else:
                 logger.info("自動データ読み込み: 利用可能なデータなし")
@@ -98,6 +102,47 @@ class SessionManager:
         except Exception as e:
             logger.error(f"自動データ読み込みエラー: {e}")
 
+    @staticmethod
+    def get_precomputed(name: str, target_dict: Optional[Dict[str, Any]] = None) -> Any:
+        """表示中のデータに対応する夜間事前計算の成果物を取得（ない・データが異なる場合は None）"""
+        df = SessionManager.get_processed_df()
+        if df.empty:
+            return None
+        return precomputed.get_active(name, target_dict, data_fingerprint=get_data_fingerprint(df))
+
+    @staticmethod
+    def _activate_precomputed() -> None:
+        """夜間事前計算の成果物が読み込んだデータと一致すれば使用する（ハイスコアはキャッシュに登録）"""
+        try:
+            df = SessionManager.get_processed_df()
+            if df.empty or not precomputed.activate_latest(get_data_fingerprint(df)):
+                return
+            high_score_cache = precomputed.get_active('high_score_cache')
+            if high_score_cache:
+                prime_high_score_cache(high_score_cache)
+        except Exception as e:
+            logger.error(f"事前計算結果の読み込みエラー: {e}")
+
+    @staticmethod
+    def reload_saved_data() -> bool:
+        """他の端末で更新された保存データを読み込み直す"""
+        try:
+            df, target_data, metadata = load_data_from_file()
+            if df is None or df.empty:
+                return False
+
+            SessionManager.set_processed_df(df)
+            SessionManager.set_target_dict(target_data or {})
+            SessionManager.set_data_source('auto_loaded')
+            st.session_state['data_metadata'] = metadata
+            SessionManager._activate_precomputed()
+            logger.info("保存データを再読み込みしました")
+            return True
+
+        except Exception as e:
+            logger.error(f"保存データ再読み込みエラー: {e}")
+            return False
+
     # === 基本データ管理メソッド ===
     @staticmethod
     def get_processed_df() -> pd.DataFrame:
@@ -108,12 +153,17 @@ class SessionManager:
     def set_processed_df(df: pd.DataFrame) -> None:
         """処理済みデータフレームを設定"""
         st.session_state[SessionManager.SESSION_KEYS['processed_df']] = df
+
+        # 読み込み経路で未登録ならここでデータバージョンを登録
+        if get_data_version(df) is None:
+            set_data_version(df)
         
         # 最新日付も更新
         if not df.empty and '手術実施日_dt' in df.columns:
             st.session_state[SessionManager.SESSION_KEYS['latest_date']] = df['手術実施日_dt'].max()
         
-        # データが更新されたらキャッシュをクリア
+        # データが更新されたら期間キャッシュを破棄（ハイスコア・事前計算結果はデータ指紋で照合するため、
+        # 他のセッションが使っているものは破棄しない）
         SessionManager.clear_period_cache()
 
     @staticmethod
@@ -198,6 +248,7 @@ class SessionManager:
                     (df['手術実施日_dt'] >= start_date) & 
                     (df['手術実施日_dt'] <= end_date)
                 ]
+                derive_data_version(filtered_df, df, 'period', start_date, end_date)
             
             # キャッシュに保存
             period_cache[cache_key] = filtered_df
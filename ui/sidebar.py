@@ -5,13 +5,16 @@
 """
 
 import streamlit as st
+import pandas as pd
 import pytz
 from datetime import datetime
 from typing import List, Optional
 
 from ui.session_manager import SessionManager
 from ui.error_handler import safe_streamlit_operation, ErrorReporting
-from data_persistence import get_data_info
+from data_persistence import get_data_info, get_save_status, is_saved_data_newer
+from utils import page_profiler, perf_metrics
+from utils.import_profiler import get_load_times
 
 
 class SidebarManager:
@@ -58,6 +61,9 @@ class SidebarManager:
             
             # 目標データの状態
             SidebarManager._render_target_status()
+
+            # バックグラウンド保存の状態
+            SidebarManager._render_save_status()
             
             st.markdown("---")
             
@@ -101,6 +107,15 @@ class SidebarManager:
                 except:
                     st.caption("💾 保存済み")
 
+        # 他の端末・プロセスが保存データを更新した場合（自分の保存中は除く）
+        if get_save_status()['state'] not in ('queued', 'running') and is_saved_data_newer(df):
+            st.warning("🔄 保存データが他の端末で更新されています")
+            if st.button("最新の保存データを読み込む", key="reload_saved_data"):
+                if SessionManager.reload_saved_data():
+                    st.rerun()
+                else:
+                    st.error("保存データの読み込みに失敗しました")
+
     @staticmethod
     def _render_no_data_status(data_info: dict) -> None:
         """データ未読み込み状態を表示"""
@@ -111,6 +126,18 @@ class SidebarManager:
         else:
             st.info("📤 データアップロードから開始")
 
+    @staticmethod
+    def _render_save_status() -> None:
+        """バックグラウンド保存の進捗・結果を表示（完了は1回だけ通知）"""
+        status = get_save_status()
+        if status['state'] in ('queued', 'running'):
+            st.caption(f"⏳ データ保存中... ({status['rows']:,}件)")
+        elif status['state'] == 'failed':
+            st.error(f"❌ データ保存失敗: {status['error']}")
+        elif status['state'] == 'done' and st.session_state.get('notified_save_job') != status['job_id']:
+            st.session_state['notified_save_job'] = status['job_id']
+            st.toast(f"💾 データ保存完了 ({status['finished_at']:%H:%M:%S})")
+
     @staticmethod
     def _render_target_status() -> None:
         """目標データの状態を表示"""
@@ -173,24 +200,64 @@ class SidebarManager:
         # エラー統計（デバッグ情報）
         SidebarManager._render_debug_info()
 
+        # 描画時間の計測結果
+        SidebarManager._render_performance_panel()
+
     @staticmethod
     def _render_debug_info() -> None:
         """デバッグ情報を表示"""
         try:
             error_stats = ErrorReporting.get_error_stats()
+            load_times = get_load_times()
             
-            if error_stats.get('total_errors', 0) > 0:
+            if error_stats.get('total_errors', 0) > 0 or load_times:
                 with st.expander("🐛 デバッグ情報", expanded=False):
                     st.write(f"エラー数: {error_stats.get('total_errors', 0)}")
                     st.write(f"警告数: {error_stats.get('warnings', 0)}")
                     
                     if error_stats.get('critical', 0) > 0:
                         st.error(f"重大エラー: {error_stats['critical']}")
+
+                    # ページを初めて表示したときのモジュール読み込み時間
+                    for module_name, seconds in load_times.items():
+                        st.caption(f"⏱️ {module_name.rsplit('.', 1)[-1]}: {seconds * 1000:.0f}ms")
             
         except Exception as e:
             # デバッグ情報でエラーが起きても本体に影響しないよう無視
             pass
 
+    @staticmethod
+    def _render_performance_panel() -> None:
+        """描画時間を表示（このセッションの前回の再実行の内訳と、全セッションの区間ごとの p50 / p95）"""
+        try:
+            summary = perf_metrics.summarize()
+            if not summary:
+                return
+
+            with st.expander("⏱️ 描画時間", expanded=False):
+                last_run = perf_metrics.get_last_run(session_id=perf_metrics.current_session_id())
+                if last_run:
+                    page = next(s for s in last_run if s['kind'] == 'page')
+                    st.caption(f"前回の描画: {page['name']} {page['duration_ms']:.0f}ms")
+                    breakdown = pd.DataFrame(last_run[:10])[['name', 'kind', 'duration_ms']].round(1)
+                    st.dataframe(breakdown, hide_index=True, use_container_width=True)
+
+                st.caption(f"区間別（全セッション・直近{perf_metrics.SPAN_LOG_SIZE}件）")
+                stats = pd.DataFrame(summary)[['name', 'count', 'p50_ms', 'p95_ms']]
+                st.dataframe(stats, hide_index=True, use_container_width=True)
+
+                if st.button("JSONに書き出し", key="export_performance_metrics"):
+                    path = perf_metrics.export_json()
+                    st.success(f"書き出しました: {path}")
+
+                # ボタンを押した再実行のページ描画を cProfile で計測（URLに ?profile=1 でも可）
+                if st.button("🔬 次の描画をプロファイル", key="profile_next_render_button"):
+                    page_profiler.request_next_render()
+
+        except Exception:
+            # 計測表示でエラーが起きても本体に影響しないよう無視
+            pass
+
     @staticmethod
     def get_current_view() -> str:
         """現在選択されているビューを取得"""
@@ -0,0 +1,385 @@
+# utils/cache.py
+"""
+キャッシュ抽象化モジュール
+
+分析・データ処理層の関数を Streamlit に依存せずにメモ化する。
+バックエンドは以下から選択でき、既定では Streamlit の実行中は Streamlit、
+それ以外（バッチ・CLI・プロセスプールのワーカー）はメモリ上のLRUを使う。
+
+- 'memory'    : プロセス内のLRU（件数上限・有効期限つき）
+- 'disk'      : saved_data/cache/ への pickle 保存（プロセス間・再起動後も共有）
+- 'streamlit' : st.cache_data（Streamlit 実行中のみ）
+
+環境変数 SURGERY_DASHBOARD_CACHE_BACKEND または configure_cache() で切り替える。
+
+キャッシュキーには、読み込み・結合時に一度だけ計算したデータバージョン
+（set_data_version）を使い、DataFrame全体を毎回ハッシュしない。
+"""
+
+import pandas as pd
+import numpy as np
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Streamlit は任意（インストールされていなくても分析層は動作する）
+try:
+    import streamlit as st
+    STREAMLIT_AVAILABLE = True
+except ImportError:
+    STREAMLIT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKENDS = ('memory', 'disk', 'streamlit')
+CACHE_BACKEND_ENV = "SURGERY_DASHBOARD_CACHE_BACKEND"
+DISK_CACHE_DIR = os.path.join("saved_data", "cache")
+DISK_CACHE_MAX_FILES = 500
+MEMORY_CACHE_SIZE = 32
+
+# configure_cache() で指定されたバックエンド（None は自動選択）
+_configured_backend: Optional[str] = None
+
+# 登録済みのキャッシュ関数（clear_all_caches 用）
+_REGISTRY: Dict[str, "CachedFunction"] = {}
+
+# DataFrameオブジェクトごとのデータバージョン {id: (弱参照, バージョン)}
+_DATA_VERSIONS: Dict[int, Tuple[weakref.ref, str]] = {}
+
+
+def streamlit_runtime_active() -> bool:
+    """Streamlit のスクリプト実行中か（bare モードやバッチ実行では False）"""
+    if not STREAMLIT_AVAILABLE:
+        return False
+    try:
+        from streamlit import runtime
+        return runtime.exists()
+    except Exception:
+        return False
+
+
+def configure_cache(backend: Optional[str] = None) -> None:
+    """
+    既定のキャッシュバックエンドを設定する
+
+    Args:
+        backend: 'memory' / 'disk' / 'streamlit'（None で自動選択に戻す）
+    """
+    global _configured_backend
+    if backend is not None and backend not in CACHE_BACKENDS:
+        raise ValueError(f"不明なキャッシュバックエンドです: {backend}")
+    _configured_backend = backend
+
+
+def get_backend_name() -> str:
+    """現在使うバックエンド名（設定 → 環境変数 → 自動選択の順に決める）"""
+    backend = _configured_backend or os.environ.get(CACHE_BACKEND_ENV)
+    if backend == 'streamlit' and not streamlit_runtime_active():
+        backend = 'memory'
+    if backend in CACHE_BACKENDS:
+        return backend
+    return 'streamlit' if streamlit_runtime_active() else 'memory'
+
+
+def compute_data_version(df: pd.DataFrame) -> str:
+    """DataFrameの内容（列名・型・値・インデックス）からデータバージョンを計算"""
+    digest = hashlib.blake2b(digest_size=16)
+    _hash_frame(digest, df)
+    return f"{len(df)}-{digest.hexdigest()}"
+
+
+def set_data_version(df: pd.DataFrame, version: Optional[str] = None) -> str:
+    """
+    DataFrameオブジェクトにデータバージョンを登録する（読み込み・結合の直後に一度だけ呼ぶ）
+
+    登録はオブジェクト単位で、フィルタ結果などの派生DataFrameには引き継がない
+    （派生データは derive_data_version で親のバージョンから作る）。
+    オブジェクトをその場で書き換えた場合は再登録すること。
+
+    Args:
+        version: 保存済みのバージョン（省略時は内容から計算）
+
+    Returns:
+        登録したバージョン
+    """
+    version = version or compute_data_version(df)
+    key = id(df)
+
+    def _discard(ref: weakref.ref, key: int = key) -> None:
+        if _DATA_VERSIONS.get(key, (None,))[0] is ref:
+            del _DATA_VERSIONS[key]
+
+    _DATA_VERSIONS[key] = (weakref.ref(df, _discard), version)
+    return version
+
+
+def get_data_version(df: pd.DataFrame) -> Optional[str]:
+    """登録済みのデータバージョンを取得（未登録は None）"""
+    entry = _DATA_VERSIONS.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    return None
+
+
+def derive_data_version(df: pd.DataFrame, parent: pd.DataFrame, *params: Any) -> Optional[str]:
+    """
+    親DataFrameのバージョンと抽出条件から派生DataFrameのバージョンを登録する
+
+    親が未登録の場合は登録しない（キャッシュキーは内容のハッシュになる）。
+    """
+    parent_version = get_data_version(parent)
+    if parent_version is None:
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(parent_version.encode('utf-8'))
+    digest.update(pickle.dumps(params, protocol=pickle.HIGHEST_PROTOCOL))
+    return set_data_version(df, f"{len(df)}-{digest.hexdigest()}")
+
+
+def cached(func: Optional[Callable] = None, *, ttl: Optional[float] = None,
+           maxsize: int = MEMORY_CACHE_SIZE) -> Callable:
+    """
+    関数の結果をキャッシュするデコレータ（st.cache_data の置き換え）
+
+    引数のDataFrameは登録済みのデータバージョン（未登録なら内容のハッシュ）、
+    その他は pickle した値をキーにする。
+    呼び出し側の変更がキャッシュに波及しないよう、DataFrame・Seriesの結果は複製を返す。
+
+    Args:
+        ttl: 有効期限（秒）
+        maxsize: メモリバックエンドの保持件数
+    """
+    def decorator(target: Callable) -> "CachedFunction":
+        wrapper = CachedFunction(target, ttl, maxsize)
+        _REGISTRY[wrapper.name] = wrapper
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+def clear_all_caches() -> None:
+    """登録済みの全キャッシュ関数の結果を破棄"""
+    for wrapper in _REGISTRY.values():
+        wrapper.clear()
+
+
+class CachedFunction:
+    """バックエンドを呼び出し時に選ぶキャッシュ付き関数"""
+
+    def __init__(self, func: Callable, ttl: Optional[float], maxsize: int):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self._backends: Dict[str, "CacheBackend"] = {}
+        self._st_func: Optional[Callable] = None
+
+    def __call__(self, *args, **kwargs):
+        key = make_cache_key(self.name, args, kwargs)
+        backend_name = get_backend_name()
+        if backend_name == 'streamlit':
+            # st.cache_data には計算済みのキーだけをハッシュさせる（引数は _ 始まりでハッシュ対象外）
+            result = self._streamlit_function()(key, args, kwargs)
+        else:
+            backend = self._get_backend(backend_name)
+            hit, value = backend.get(key)
+            if not hit:
+                value = self.func(*args, **kwargs)
+                backend.set(key, value)
+            result = _copy_result(value)
+
+        # 結果のDataFrameにもバージョンを付け、後続のキャッシュ関数でハッシュしないようにする
+        if isinstance(result, pd.DataFrame):
+            set_data_version(result, f"{len(result)}-{key}")
+        return result
+
+    def clear(self) -> None:
+        """このキャッシュ関数の全バックエンドの結果を破棄"""
+        for backend in self._backends.values():
+            backend.clear()
+        if self._st_func is not None:
+            self._st_func.clear()
+
+    def _get_backend(self, backend_name: str) -> "CacheBackend":
+        if backend_name not in self._backends:
+            if backend_name == 'disk':
+                self._backends[backend_name] = DiskCacheBackend(os.path.join(DISK_CACHE_DIR, self.name), self.ttl)
+            else:
+                self._backends[backend_name] = MemoryLRUBackend(self.maxsize, self.ttl)
+        return self._backends[backend_name]
+
+    def _streamlit_function(self) -> Callable:
+        if self._st_func is None:
+            func = self.func
+
+            def _compute(cache_key: str, _args: tuple, _kwargs: dict):
+                return func(*_args, **_kwargs)
+
+            # Streamlit は関数名で保存領域を分けるため、元の関数ごとに名前を付ける
+            _compute.__module__ = func.__module__
+            _compute.__qualname__ = func.__qualname__
+            self._st_func = st.cache_data(ttl=self.ttl, show_spinner=False)(_compute)
+        return self._st_func
+
+
+class CacheBackend(ABC):
+    """キャッシュバックエンドの共通インターフェース（未実装のメソッドがあるとインスタンス化で失敗する）"""
+
+    @abstractmethod
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(ヒットしたか, 値) を返す"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """値を保存する"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """保存した値をすべて破棄する"""
+
+
+class MemoryLRUBackend(CacheBackend):
+    """プロセス内のLRUキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, maxsize: int = MEMORY_CACHE_SIZE, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            stored_at, value = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCacheBackend(CacheBackend):
+    """ディレクトリに pickle で保存するキャッシュ（一時ファイル経由で置き換え）"""
+
+    def __init__(self, directory: str, ttl: Optional[float] = None, max_files: int = DISK_CACHE_MAX_FILES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_files = max_files
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        path = os.path.join(self.directory, f"{key}.pkl")
+        try:
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                return False, None
+            with open(path, 'rb') as f:
+                return True, pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except Exception as e:
+            logger.warning(f"ディスクキャッシュの読み込みに失敗しました: {e}")
+            return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{key}.pkl")
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+            self._prune()
+        except Exception as e:
+            logger.warning(f"ディスクキャッシュの保存に失敗しました: {e}")
+
+    def clear(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _prune(self) -> None:
+        """上限を超えたら古いものから削除"""
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def make_cache_key(name: str, args: tuple, kwargs: dict) -> str:
+    """関数名と引数からキャッシュキーを作成"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(name.encode('utf-8'))
+    for value in args:
+        _update_digest(digest, value)
+    for key in sorted(kwargs):
+        digest.update(key.encode('utf-8'))
+        _update_digest(digest, kwargs[key])
+    return digest.hexdigest()
+
+
+def _update_digest(digest, value: Any) -> None:
+    """引数の値をハッシュに加える（DataFrameはデータバージョン、Seriesは内容のハッシュ）"""
+    if isinstance(value, pd.DataFrame):
+        version = get_data_version(value)
+        if version is not None:
+            digest.update(f"version:{version}".encode('utf-8'))
+        else:
+            _hash_frame(digest, value)
+    elif isinstance(value, pd.Series):
+        digest.update(repr(value.dtype).encode('utf-8'))
+        _hash_frame(digest, value)
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype, value.shape)).encode('utf-8'))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _hash_frame(digest, value) -> None:
+    """DataFrame・Seriesの列名・型・値・インデックスをハッシュに加える"""
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode('utf-8'))
+        digest.update(repr(value.dtypes.tolist()).encode('utf-8'))
+    try:
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    except TypeError:
+        # リストなどハッシュできない値を含む列
+        digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _copy_result(value: Any) -> Any:
+    """キャッシュ内の結果が呼び出し側で書き換えられないよう複製する"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    return value
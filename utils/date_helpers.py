@@ -1,5 +1,6 @@
 # utils/date_helpers.py (jpholidayフォールバック対応版)
 import pandas as pd
+import numpy as np
 from datetime import datetime, date
 import warnings
 
@@ -113,6 +114,44 @@ def is_major_holiday(date_obj):
     
     return False
 
+def is_year_end_holiday(date_obj):
+    """
+    年末年始の休診日（12/29〜1/3）かどうかを判定する
+    
+    Args:
+        date_obj: date object
+        
+    Returns:
+        bool: 年末年始の場合True
+    """
+    return (date_obj.month == 12 and date_obj.day >= 29) or (date_obj.month == 1 and date_obj.day <= 3)
+
+def count_business_days_per_week(week_starts, exclude_year_end=True):
+    """
+    各週（開始日から7日間）の営業日数（土日祝・年末年始を除く）を返す
+    
+    日ごとの平日判定は対象期間の日数分だけ行い、週ごとの日数は累積和から求める。
+    
+    Args:
+        week_starts: 週の開始日の配列
+        exclude_year_end: 年末年始（12/29〜1/3）を営業日から除くか
+        
+    Returns:
+        numpy.ndarray: 各週の営業日数
+    """
+    week_starts = pd.DatetimeIndex(pd.to_datetime(week_starts)).normalize()
+    if len(week_starts) == 0:
+        return np.zeros(0, dtype=int)
+    
+    all_days = pd.date_range(week_starts.min(), week_starts.max() + pd.Timedelta(days=6), freq='D')
+    flags = np.array([
+        is_weekday(day) and not (exclude_year_end and is_year_end_holiday(day))
+        for day in all_days.date
+    ], dtype=int)
+    cumulative = np.concatenate([[0], np.cumsum(flags)])
+    offsets = (week_starts - all_days[0]).days.to_numpy()
+    return cumulative[offsets + 7] - cumulative[offsets]
+
 def get_fiscal_year(date_input):
     """
     会計年度を取得する（4月始まり）
@@ -0,0 +1,145 @@
+# utils/file_utils.py
+"""
+ファイル書き込みの共通処理
+
+保存データ・バックアップは一時ファイルに書き込んで fsync してから置き換え、
+書き込み途中で異常終了しても既存ファイルを壊さないようにする。
+複数のプロセス（複数のアプリ・夜間バッチ）からの書き込みはロックファイルで排他する。
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, IO, Iterator, Optional
+
+# ファイルロックはOSごとの実装を使う（Windows は共有ロックがないため排他ロックで代用）
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+COPY_BUFFER_SIZE = 1024 * 1024
+LOCK_POLL_INTERVAL = 0.05
+
+# 新規ファイルの権限に使う umask（os.umask は設定と同時にしか取得できないため起動時に一度だけ読む）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write(path: str, write_func: Callable[[IO[bytes]], None]) -> None:
+    """同じディレクトリの一時ファイルに書き込み、fsync後に置き換える（書き込み途中の状態を残さない）"""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_func(f)
+            f.flush()
+            os.fsync(f.fileno())
+        match_file_mode(temp_path, path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+
+
+def match_file_mode(temp_path: str, path: str) -> None:
+    """
+    一時ファイルの権限を置き換え先に合わせる
+
+    mkstemp の一時ファイルは所有者のみ読み書き可（0600）のため、そのまま置き換えると
+    他のユーザー（夜間バッチ・Webサーバー）から読めなくなる。既存ファイルがあればその権限、
+    なければ通常の新規ファイルと同じ権限（0666 から umask を除いたもの）にする。
+    """
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(temp_path, mode)
+
+
+def atomic_copy(src: str, dst: str) -> None:
+    """ファイルを一時ファイル経由でコピー（コピー先を書き込み途中の状態にしない）"""
+    def _copy(f):
+        with open(src, 'rb') as source:
+            shutil.copyfileobj(source, f, COPY_BUFFER_SIZE)
+    atomic_write(dst, _copy)
+    shutil.copystat(src, dst)
+
+
+def fsync_directory(directory: str) -> None:
+    """置き換え（rename）をディスクに確定させる（対応しないOSでは何もしない）"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False, timeout: Optional[float] = None) -> Iterator[None]:
+    """
+    ロックファイルによるプロセス間の勧告ロック
+
+    同じプロセス内でも別のファイル記述子どうしは排他されるため、入れ子で取得しないこと。
+
+    Args:
+        path: ロックファイルのパス（なければ作成）
+        shared: True で共有ロック（読み込み用）、False で排他ロック（書き込み用）
+        timeout: 待機する最大秒数（None は無制限）
+
+    Raises:
+        TimeoutError: 待機時間内にロックを取得できなかった
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while not _try_lock(fd, shared):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"ロックを取得できません: {path}")
+            time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def _try_lock(fd: int, shared: bool) -> bool:
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+    if msvcrt is not None:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+    return True
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,152 @@
+# utils/import_profiler.py
+"""
+モジュール読み込み時間の計測
+
+起動時に読み込むモジュールと各ページのモジュールについて、読み込みにかかる時間を一覧にする。
+別プロセスで `python -X importtime` を実行するため、計測値は他のモジュールが未読み込みの
+状態（コールドスタート）の時間になる。アプリ内では、ページを初めて表示したときの
+読み込み時間も記録する。
+
+使い方:
+    python -m utils.import_profiler
+    python -m utils.import_profiler ui.pages.prediction_page --top 20
+"""
+
+import argparse
+import logging
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 起動時に読み込むモジュール
+STARTUP_MODULES = [
+    "streamlit",
+    "pandas",
+    "data_persistence",
+    "ui.session_manager",
+    "ui.sidebar",
+    "ui.page_router",
+]
+
+# 初回表示時に読み込むページモジュール
+PAGE_MODULES = [
+    "ui.pages.dashboard_page",
+    "ui.pages.data_management_page",
+    "ui.pages.hospital_page",
+    "ui.pages.department_page",
+    "ui.pages.surgeon_page",
+    "ui.pages.prediction_page",
+]
+
+# アプリ内で記録したページモジュールの読み込み時間（秒）
+_LOAD_TIMES: "OrderedDict[str, float]" = OrderedDict()
+
+
+def record_load_time(module_name: str, seconds: float) -> None:
+    """アプリ内でのモジュール読み込み時間を記録"""
+    _LOAD_TIMES[module_name] = seconds
+    logger.info(f"モジュール読み込み: {module_name} {seconds * 1000:.0f}ms")
+
+
+def get_load_times() -> Dict[str, float]:
+    """アプリ内で記録したモジュール読み込み時間 {モジュール名: 秒}"""
+    return dict(_LOAD_TIMES)
+
+
+def measure_import_cost(module_name: str, preload: Optional[List[str]] = None) -> Dict:
+    """
+    別プロセスでモジュールを読み込み、読み込み時間を計測する
+
+    Args:
+        module_name: 計測するモジュール
+        preload: 先に読み込んでおくモジュール（その分は計測値に含めない）
+
+    Returns:
+        {'module': モジュール名, 'cumulative_ms': 読み込み時間, 'modules': 新たに読み込んだモジュール数,
+         'top': [(モジュール名, 自身の読み込み時間ms), ...]}
+    """
+    statements = [f"import {name}" for name in (preload or [])]
+    statements.append("import sys; sys.stderr.write('--- measure ---\\n')")
+    statements.append(f"import {module_name}")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(statements)],
+        capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else module_name)
+
+    lines = result.stderr.split("--- measure ---", 1)[-1].splitlines()
+    entries = []
+    cumulative_ms = 0.0
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not self_us.isdigit():
+            continue
+        entries.append((name, int(self_us) / 1000))
+        if name == module_name:
+            cumulative_ms = int(cumulative_us) / 1000
+
+    return {
+        'module': module_name,
+        'cumulative_ms': cumulative_ms,
+        'modules': len(entries),
+        'top': sorted(entries, key=lambda entry: entry[1], reverse=True),
+    }
+
+
+def build_report(modules: Optional[List[str]] = None, top: int = 10) -> List[Dict]:
+    """
+    起動時モジュールとページモジュールの読み込み時間の一覧を作成
+
+    ページモジュールは起動時モジュールを読み込んだ後の追加時間（初回表示時の待ち時間）を計測する。
+    """
+    report = []
+    for module_name in (modules or STARTUP_MODULES + PAGE_MODULES):
+        preload = STARTUP_MODULES if module_name in PAGE_MODULES else None
+        try:
+            cost = measure_import_cost(module_name, preload)
+            cost['top'] = cost['top'][:top]
+        except (ImportError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"読み込み時間の計測に失敗: {module_name} ({e})")
+            cost = {'module': module_name, 'cumulative_ms': None, 'modules': 0, 'top': [], 'error': str(e)}
+        if module_name in PAGE_MODULES:
+            cost['phase'] = 'page'
+        else:
+            cost['phase'] = 'startup' if module_name in STARTUP_MODULES else 'module'
+        report.append(cost)
+    return report
+
+
+def format_report(report: List[Dict]) -> str:
+    """読み込み時間の一覧を表形式の文字列にする"""
+    lines = [f"{'区分':<8}{'モジュール':<36}{'時間(ms)':>10}{'モジュール数':>12}"]
+    for cost in report:
+        elapsed = "失敗" if cost['cumulative_ms'] is None else f"{cost['cumulative_ms']:.0f}"
+        lines.append(f"{cost['phase']:<8}{cost['module']:<36}{elapsed:>10}{cost['modules']:>12}")
+        for name, self_ms in cost['top']:
+            lines.append(f"{'':<10}- {name:<40}{self_ms:>8.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="モジュール読み込み時間の計測")
+    parser.add_argument("modules", nargs="*", help="計測するモジュール（省略時は起動時モジュールと全ページ）")
+    parser.add_argument("--top", type=int, default=5, help="モジュールごとに表示する時間の長い依存モジュール数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    started = time.perf_counter()
+    report = build_report(args.modules or None, args.top)
+    print(format_report(report))
+    print(f"\n計測時間: {time.perf_counter() - started:.1f}秒")
+    return 0 if all(cost['cumulative_ms'] is not None for cost in report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# utils/page_profiler.py
+"""
+ページ描画のプロファイル（デバッグ用）
+
+URLに `?profile=1` を付けている間、またはサイドバーの「次の描画をプロファイル」を押した直後の
+ページ描画を cProfile で計測し、saved_data/profiles/ に保存する（snakeviz などで開ける .prof 形式）。
+累積時間の上位を画面に表示する。スイッチがオフの間は計測処理を一切行わない。
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.path.join("saved_data", "profiles")
+MAX_PROFILES = 20
+TOP_N = 25
+
+# 次の描画を1回だけ計測するフラグ / 直近の計測結果（セッション状態のキー）
+REQUEST_KEY = 'profile_next_render'
+RESULT_KEY = 'last_profile'
+
+
+def is_requested() -> bool:
+    """このページ描画を計測するか（URLパラメータ、またはサイドバーからの1回限りの指定）"""
+    return st.session_state.get(REQUEST_KEY, False) or st.query_params.get('profile') in ('1', 'true')
+
+
+def request_next_render() -> None:
+    """次のページ描画を1回だけ計測する"""
+    st.session_state[REQUEST_KEY] = True
+
+
+@contextmanager
+def profile(page_name: str) -> Iterator[None]:
+    """ブロック内の処理を計測し、結果を保存してセッション状態に記録する"""
+    st.session_state[REQUEST_KEY] = False
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # 他のセッションが計測中（Python 3.12 以降はプロセス内で同時に1つまで）
+        logger.warning(f"プロファイルを開始できません: {e}")
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        try:
+            stats = pstats.Stats(profiler)
+            path = _save_profile(stats, page_name)
+            st.session_state[RESULT_KEY] = {
+                'page': page_name,
+                'path': path,
+                'created_at': datetime.now().isoformat(),
+                'total_seconds': stats.total_tt,
+                'rows': top_functions(stats),
+            }
+        except Exception as e:
+            logger.error(f"プロファイル保存エラー: {e}")
+
+
+def top_functions(stats: pstats.Stats, limit: int = TOP_N) -> List[Dict[str, Any]]:
+    """累積時間の長い関数の一覧"""
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            '関数': name,
+            '場所': f"{_short_path(filename)}:{line}",
+            '呼び出し回数': ncalls,
+            '自身の時間(s)': round(tottime, 4),
+            '累積時間(s)': round(cumtime, 4),
+        })
+    rows.sort(key=lambda row: row['累積時間(s)'], reverse=True)
+    return rows[:limit]
+
+
+def render_result() -> None:
+    """直近の計測結果（累積時間の上位）を表示"""
+    result = st.session_state.get(RESULT_KEY)
+    if not result:
+        return
+
+    with st.expander(f"🔬 プロファイル結果: {result['page']} ({result['total_seconds']:.2f}秒)", expanded=True):
+        st.caption(f"保存先: {result['path']}")
+        st.dataframe(result['rows'], hide_index=True, use_container_width=True)
+        if st.button("閉じる", key="close_profile_result"):
+            del st.session_state[RESULT_KEY]
+            st.rerun()
+
+
+def _save_profile(stats: pstats.Stats, page_name: str) -> str:
+    """プロファイルを保存し、古いものを削除する"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_name = re.sub(r'[^\w]+', '_', page_name)
+    path = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d_%H%M%S_%f}_{safe_name}.prof")
+    stats.dump_stats(path)
+
+    profiles = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith('.prof'))
+    for old in profiles[:-MAX_PROFILES]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, old))
+        except OSError:
+            pass
+    logger.info(f"プロファイルを保存しました: {path}")
+    return path
+
+
+def _short_path(filename: str) -> str:
+    """site-packages 以下やカレントディレクトリ以下は相対パスで表示"""
+    for marker in ('site-packages' + os.sep, os.getcwd() + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
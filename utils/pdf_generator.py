@@ -7,13 +7,14 @@ PDF レポート生成モジュール
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.io as pio
 from typing import Dict, Any, Optional, List
 import logging
 from datetime import datetime
 import base64
 from io import BytesIO
 
+from reporting import chart_images, pdf_jobs
+
 # PDF生成ライブラリ
 try:
     from reportlab.lib import colors
@@ -310,10 +311,13 @@ class PDFReportGenerator:
         # セクションタイトル
         story.append(Paragraph("📊 グラフ・チャート", self.styles['CustomHeading']))
         
-        for chart_name, fig in charts.items():
+        # Plotlyグラフを並列で画像に変換（変更のないグラフはキャッシュを使う）
+        images = chart_images.render_figures(charts, width=800, height=400)
+        
+        for chart_name, img_bytes in images.items():
             try:
-                # Plotlyグラフを画像に変換
-                img_bytes = pio.to_image(fig, format="png", width=800, height=400)
+                if img_bytes is None:
+                    raise ValueError("画像に変換できませんでした")
                 img_buffer = BytesIO(img_bytes)
                 
                 # レポートラブImage作成
@@ -361,44 +365,35 @@ class StreamlitPDFExporter:
                                performance_data: pd.DataFrame,
                                period_info: Dict[str, Any],
                                charts: Dict[str, go.Figure] = None,
-                               button_label: str = "📄 PDFレポートをダウンロード"):
-        """PDFダウンロードボタンを追加"""
+                               button_label: str = "📄 PDFレポート生成",
+                               cache_key: Optional[tuple] = None):
+        """PDFの生成ボタン・ダウンロードボタンを追加
+
+        PDFはボタンが押されたときに生成スレッドで作成し、同じキーでは生成結果を再利用する。
+
+        Args:
+            cache_key: レポートのキャッシュキー（省略時は表示データと期間から作成）
+        """
         
         if not REPORTLAB_AVAILABLE:
             st.error("📋 PDF出力機能を使用するには以下のライブラリのインストールが必要です:")
             st.code("pip install reportlab")
             return
         
-        try:
-            # PDF生成
-            generator = PDFReportGenerator()
-            pdf_buffer = generator.generate_dashboard_report(
+        if cache_key is None:
+            period = (period_info.get('period_name'), period_info.get('start_date'), period_info.get('end_date'))
+            cache_key = pdf_jobs.report_key('dashboard', performance_data, period)
+
+        def build_pdf() -> Optional[bytes]:
+            pdf_buffer = PDFReportGenerator().generate_dashboard_report(
                 kpi_data, performance_data, period_info, charts
             )
-            
-            if pdf_buffer:
-                # ファイル名生成
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"手術分析レポート_{period_info.get('period_name', 'report')}_{timestamp}.pdf"
-                
-                # ダウンロードボタン
-                st.download_button(
-                    label=button_label,
-                    data=pdf_buffer.getvalue(),
-                    file_name=filename,
-                    mime="application/pdf",
-                    type="primary",
-                    use_container_width=True
-                )
-                
-                st.success(f"✅ PDFレポートの準備が完了しました。ボタンをクリックしてダウンロードしてください。")
-                
-            else:
-                st.error("PDFの生成に失敗しました")
-                
-        except Exception as e:
-            st.error(f"PDF生成エラー: {e}")
-            logger.error(f"PDF生成エラー: {e}")
+            return pdf_buffer.getvalue() if pdf_buffer else None
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"手術分析レポート_{period_info.get('period_name', 'report')}_{timestamp}.pdf"
+        pdf_jobs.render_report_download(cache_key, build_pdf, filename,
+                                        button_label=button_label, widget_key="dashboard_pdf")
     
     @staticmethod
     def create_period_info(period_name: str, start_date, end_date, total_days: int, weekdays: int) -> Dict[str, Any]:
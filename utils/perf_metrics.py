@@ -0,0 +1,195 @@
+# utils/perf_metrics.py
+"""
+描画時間の計測モジュール
+
+ページ描画・画面セクション・主要な分析関数の処理時間を「スパン」として記録する。
+スパンはプロセス内の直近 SPAN_LOG_SIZE 件を保持し、区間ごとの中央値 (p50)・95パーセンタイル (p95)
+を集計できる。ページ描画の内側で記録したスパンはその描画（1回の再実行）に紐づくため、
+どのセクションが再実行の時間を占めているかを確認できる。スパンはプロセス内の全セッションで
+共有するため、描画したセッションのIDを付けて記録し、セッションごとに絞り込めるようにする。
+
+    with span("KPI計算"):
+        ...
+
+    @timed()
+    def get_summary(df): ...
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from utils.cache import streamlit_runtime_active
+from utils.file_utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+SPAN_LOG_SIZE = 2000
+EXPORT_DIR = os.path.join("saved_data", "performance")
+
+# 記録済みスパン {'name', 'kind', 'run', 'session', 'depth', 'started_at', 'duration_ms'}
+_SPANS: deque = deque(maxlen=SPAN_LOG_SIZE)
+_SPANS_LOCK = threading.Lock()
+
+# スレッドごとの実行中スパン（入れ子の深さと、属するページ描画・セッションを求める）
+_ACTIVE = threading.local()
+_RUN_COUNTER = [0]
+
+
+@contextmanager
+def span(name: str, kind: str = 'section') -> Iterator[None]:
+    """
+    処理時間をスパンとして記録する
+
+    Args:
+        name: 区間名（同じ名前のスパンが集計の単位になる）
+        kind: 'page'（ページ描画）/ 'section'（画面セクション）/ 'fragment'（部分再実行）/ 'analysis'（分析関数）
+    """
+    stack = getattr(_ACTIVE, 'stack', None)
+    if stack is None:
+        stack = _ACTIVE.stack = []
+
+    if kind == 'page' or not stack:
+        with _SPANS_LOCK:
+            _RUN_COUNTER[0] += 1
+            run = _RUN_COUNTER[0]
+        session = current_session_id()
+    else:
+        run, session = stack[0]
+    stack.append((run, session))
+
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        stack.pop()
+        with _SPANS_LOCK:
+            _SPANS.append({
+                'name': name,
+                'kind': kind,
+                'run': run,
+                'session': session,
+                'depth': len(stack),
+                'started_at': started_at,
+                'duration_ms': duration_ms,
+            })
+
+
+def timed(name: Optional[str] = None, kind: str = 'analysis') -> Callable:
+    """関数の処理時間をスパンとして記録するデコレータ（name 省略時は モジュール.関数名）"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            with span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_session_id() -> Optional[str]:
+    """描画中の Streamlit セッションのID（Streamlit 外・生成スレッドなどでは None）"""
+    if not streamlit_runtime_active():
+        return None
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+def get_spans(limit: Optional[int] = None, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """記録済みスパンを古い順に取得（limit 指定時は直近の件数のみ、session_id 指定時はそのセッションのみ）"""
+    with _SPANS_LOCK:
+        spans = list(_SPANS)
+    if session_id is not None:
+        spans = [s for s in spans if s['session'] == session_id]
+    return spans[-limit:] if limit else spans
+
+
+def get_last_run(page_name: Optional[str] = None, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """直近のページ描画（1回の再実行）に属するスパンを処理時間の長い順に取得（session_id 指定時はそのセッションのみ）"""
+    spans = get_spans(session_id=session_id)
+    pages = [s for s in spans if s['kind'] == 'page' and (page_name is None or s['name'] == page_name)]
+    if not pages:
+        return []
+    run = pages[-1]['run']
+    return sorted((s for s in spans if s['run'] == run), key=lambda s: s['duration_ms'], reverse=True)
+
+
+def summarize(spans: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    区間ごとの処理時間を集計（p95 の大きい順）
+
+    Returns:
+        [{'name', 'kind', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms'}, ...]
+    """
+    durations: Dict[tuple, List[float]] = {}
+    for s in (get_spans() if spans is None else spans):
+        durations.setdefault((s['name'], s['kind']), []).append(s['duration_ms'])
+
+    summary = []
+    for (name, kind), values in durations.items():
+        values = np.asarray(values)
+        p50, p95 = np.percentile(values, [50, 95])
+        summary.append({
+            'name': name,
+            'kind': kind,
+            'count': int(values.size),
+            'p50_ms': round(float(p50), 1),
+            'p95_ms': round(float(p95), 1),
+            'max_ms': round(float(values.max()), 1),
+            'total_ms': round(float(values.sum()), 1),
+        })
+    return sorted(summary, key=lambda row: row['p95_ms'], reverse=True)
+
+
+def update_session_metrics() -> None:
+    """このセッションの集計結果を st.session_state['performance_metrics'] に反映（データ保存時にセッション情報として保存される）"""
+    session_id = current_session_id()
+    if session_id is None:
+        return
+    import streamlit as st
+
+    spans = get_spans(session_id=session_id)
+    st.session_state['performance_metrics'] = {
+        'updated_at': datetime.now().isoformat(),
+        'span_count': len(spans),
+        'sections': summarize(spans),
+    }
+
+
+def export_json(path: Optional[str] = None) -> str:
+    """スパンと集計結果をJSONファイルに書き出し、書き出したパスを返す"""
+    if path is None:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = os.path.join(EXPORT_DIR, f"performance_{datetime.now():%Y%m%d_%H%M%S}.json")
+
+    spans = get_spans()
+    payload = {
+        'exported_at': datetime.now().isoformat(),
+        'pid': os.getpid(),
+        'summary': summarize(spans),
+        'spans': spans,
+    }
+    data = json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+    atomic_write(path, lambda f: f.write(data))
+    logger.info(f"描画時間の計測結果を書き出しました: {path}")
+    return path
+
+
+def clear() -> None:
+    """記録済みスパンを消去"""
+    with _SPANS_LOCK:
+        _SPANS.clear()